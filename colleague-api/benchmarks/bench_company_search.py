@@ -0,0 +1,56 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Latency of the company search backends against the configured database.
+
+    psql ... < organizations.sql && psql ... < change.sql
+    python benchmarks/bench_company_search.py [rounds]
+
+Every keystroke of a few company names is searched `rounds` times with
+`like` (the original `name LIKE '%kw%'`), `trgm` (pg_trgm) and `ngram`
+(the in-process index, loading it is reported separately).
+"""
+import sys
+import time
+
+from colleague.app import create_app
+from colleague.config import settings
+from colleague.service import company_search
+from colleague.models.work import Organization
+
+NAMES = [u"阿里巴巴", u"腾讯", u"百度在线", u"华为技术", u"tencent", u"alibaba"]
+
+
+def keystrokes():
+    for name in NAMES:
+        for i in range(1, len(name) + 1):
+            yield name[:i]
+
+
+def measure(name, fn, rounds):
+    keywords = list(keystrokes())
+    start = time.time()
+    for _ in range(rounds):
+        for keyword in keywords:
+            fn(keyword)
+    cost = (time.time() - start) / (rounds * len(keywords)) * 1000
+    print "{:<12} {:>8.2f} ms/search".format(name, cost)
+
+
+def main():
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    app = create_app(settings=settings)
+    with app.app_context():
+        start = time.time()
+        index = company_search.NgramIndex(settings['COMPANY_SEARCH_SIMILARITY'])
+        company_search._load(index)
+        print "ngram index of {} companies loaded in {:.2f} s".format(len(index), time.time() - start)
+
+        measure("like", lambda kw: Organization.like(kw, 10), rounds)
+        measure("trgm", lambda kw: Organization.similar(kw, 10, settings['COMPANY_SEARCH_SIMILARITY']), rounds)
+        measure("ngram", lambda kw: Organization.find_by_ids(index.search(kw, 10)), rounds)
+        measure("ngram index", lambda kw: index.search(kw, 10), rounds)
+
+
+if __name__ == '__main__':
+    main()
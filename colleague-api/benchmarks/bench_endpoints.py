@@ -0,0 +1,328 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Latency percentiles and query counts of the main endpoints, on seeded data.
+
+    createdb colleague_bench
+    python benchmarks/bench_endpoints.py --db postgresql://.../colleague_bench \
+        [--users 2000] [--requests 300] [--output bench_endpoints.json]
+
+The tables of the `--db` database are dropped and seeded with `--users`
+users and their companies, work experiences, contacts, endorsements,
+comments, feeds and images, with a fixed random seed so two runs seed the
+same rows. Redis is a fakeredis. The app from `create_app` is called
+in-process through the flask test client, so the numbers are the server
+side cost without the network and the http server.
+Each endpoint is called once per viewer to warm the caches and timelines,
+then `--requests` times over the viewers. The statements per request come
+from the `X-Sql-Stats` header, @see colleague.sql_stats.
+The report is json with sorted keys, diff two of them across commits.
+
+The models use BIGINT primary keys, GREATEST and postgres only indexes,
+so it needs postgres, SQLite is not supported.
+"""
+import argparse
+import datetime
+import json
+import logging
+import math
+import random
+import subprocess
+import time
+
+import fakeredis
+
+from colleague import extensions
+from colleague.app import create_app
+from colleague.config import Config, settings
+from colleague.extensions import db
+from colleague.models.contact import Contact, ContactEdge, ContactRequestType, ContactStatus
+from colleague.models.endorsement import (EndorseComment, Endorsement, EndorseStatus,
+                                          EndorseType, UserEndorse)
+from colleague.models.feed import Feed
+from colleague.models.meida import Image, MediaLocation
+from colleague.models.user import User, UserStatus
+from colleague.models.work import Organization, WorkExperience
+from colleague.sql_stats import HEADER as SQL_STATS_HEADER
+from colleague.utils import encode_id
+
+PASSWORD = "123456"
+DEVICE_ID = "bench-device"
+COMPANY_WORDS = [u"阿里巴巴", u"腾讯", u"百度", u"华为", u"字节跳动", u"美团", u"京东", u"网易",
+                 u"小米", u"滴滴", u"tencent", u"alibaba", u"bytedance", u"huawei"]
+COMPANY_SUFFIXES = [u"科技", u"网络", u"信息技术", u"软件", u"数据", u"云计算", u"金融", u"电子"]
+CHUNK = 1000
+
+
+def _insert(model, rows):
+    for i in range(0, len(rows), CHUNK):
+        db.session.execute(model.__table__.insert(), rows[i:i + CHUNK])
+
+
+def _reset_sequence(model):
+    table = model.__tablename__
+    db.session.execute("SELECT setval(pg_get_serial_sequence('{0}', 'id'), "
+                       "COALESCE((SELECT max(id) FROM {0}), 1))".format(table))
+
+
+def seed(users, contacts_per_user, feeds_per_user):
+    """
+    :return: The row counts per table
+    """
+    rng = random.Random(42)
+    now = datetime.datetime.utcnow()
+    counts = {}
+
+    companies = [{'id': i + 1, 'name': u"{}{}{}".format(word, suffix, i),
+                  'verified': i % 3 == 0, 'created_at': now}
+                 for i, (word, suffix) in enumerate((word, suffix) for suffix in COMPANY_SUFFIXES
+                                                    for word in COMPANY_WORDS)]
+    _insert(Organization, companies)
+    counts['organizations'] = len(companies)
+
+    # one hash for everybody, computing thousands of them is the slow part
+    user = User()
+    user.hash_password(PASSWORD)
+    rows = []
+    work_experiences = []
+    for uid in range(1, users + 1):
+        company_ids = rng.sample(range(1, len(companies) + 1), rng.randint(1, 3))
+        for i, company_id in enumerate(company_ids):
+            current = i == len(company_ids) - 1
+            work_experiences.append({'uid': uid, 'company_id': company_id, 'title': u"工程师",
+                                     'start_year': 2010 + i * 3, 'start_month': 1,
+                                     'end_year': 2999 if current else 2012 + i * 3,
+                                     'end_month': None if current else 12,
+                                     'status': 0, 'create_date': now, 'update_date': now,
+                                     'delete_date': now})
+        rows.append({'id': uid, 'mobile': "138{:08d}".format(uid), 'password_hash': user.password_hash,
+                     'user_name': u"user{}".format(uid), 'gender': uid % 2, 'avatar': None,
+                     'colleague_id': "colleague{}".format(uid), 'status': UserStatus.Confirmed,
+                     'title': u"工程师", 'company_id': company_ids[-1],
+                     'created_at': now, 'last_login_at': now})
+    _insert(User, rows)
+    _insert(WorkExperience, work_experiences)
+    counts['users'] = len(rows)
+    counts['work_experience'] = len(work_experiences)
+
+    pairs = set()
+    for uid in range(1, users + 1):
+        for _ in range(rng.randint(0, contacts_per_user)):
+            other = rng.randint(1, users)
+            if other != uid:
+                pairs.add((min(uid, other), max(uid, other)))
+    pairs = sorted(pairs)
+    contact_rows = []
+    edges = []
+    total_contacts = dict((uid, 0) for uid in range(1, users + 1))
+    for id, (uid_a, uid_b) in enumerate(pairs, 1):
+        updated_at = now - datetime.timedelta(seconds=rng.randint(0, 365 * 24 * 3600))
+        # the insert takes the column names
+        contact_rows.append({'id': id, 'uid_a': uid_a, 'uid_b': uid_b, 'status': ContactStatus.Connected,
+                             'type': ContactRequestType.Added, 'created_at': updated_at,
+                             'updated_at': updated_at})
+        for owner, other in ((uid_a, uid_b), (uid_b, uid_a)):
+            edges.append({'owner_uid': owner, 'contact_uid': other, 'contact_id': id,
+                          'status': ContactStatus.Connected, 'type': ContactRequestType.Added,
+                          'updated_at': updated_at})
+            total_contacts[owner] += 1
+    _insert(Contact, contact_rows)
+    _insert(ContactEdge, edges)
+    counts['contact'] = len(contact_rows)
+    counts['contact_edge'] = len(edges)
+
+    endorses = []
+    comments = []
+    endorse_counts = dict((uid, {EndorseType.Niubility: 0, EndorseType.Reliability: 0})
+                          for uid in range(1, users + 1))
+    for uid_a, uid_b in pairs:
+        for uid, from_uid in ((uid_a, uid_b), (uid_b, uid_a)):
+            if rng.random() < 0.25:
+                type = rng.choice((EndorseType.Niubility, EndorseType.Reliability))
+                endorses.append({'uid': uid, 'from_uid': from_uid, 'type': type,
+                                 'status': EndorseStatus.Supported, 'create_at': now, 'update_at': now})
+                endorse_counts[uid][type] += 1
+            if rng.random() < 0.1:
+                comments.append({'uid': uid, 'from_uid': from_uid, 'text': u"靠谱的同事",
+                                 'status': EndorseStatus.Supported, 'create_at': now,
+                                 'update_at': now})
+    _insert(UserEndorse, endorses)
+    _insert(EndorseComment, comments)
+    _insert(Endorsement, [{'uid': uid, 'total_contacts': total_contacts[uid],
+                           'niubility': endorse_counts[uid][EndorseType.Niubility],
+                           'reliability': endorse_counts[uid][EndorseType.Reliability]}
+                          for uid in range(1, users + 1)])
+    counts['user_endorse'] = len(endorses)
+    counts['endorse_comment'] = len(comments)
+    counts['endorsement'] = users
+
+    images = []
+    feeds = []
+    for uid in range(1, users + 1):
+        for _ in range(rng.randint(0, feeds_per_user * 2)):
+            image_ids = []
+            for _ in range(rng.choice((0, 0, 1, 3))):
+                images.append({'id': len(images) + 1, 'uid': uid,
+                               'path': "bench/{}.png".format(len(images) + 1),
+                               'width': 640, 'height': 480, 'size': 50000,
+                               'location': MediaLocation.AliyunOSS, 'created_at': now})
+                image_ids.append(len(images))
+            feeds.append({'id': len(feeds) + 1, 'uid': uid, 'type': 0, 'images': image_ids,
+                          'text': u"动态 {}".format(len(feeds) + 1), 'like_count': 0,
+                          'comment_count': 0, 'create_at': now})
+    _insert(Image, images)
+    _insert(Feed, feeds)
+    counts['image'] = len(images)
+    counts['feed'] = len(feeds)
+
+    for model in (Organization, User, WorkExperience, Contact, ContactEdge, UserEndorse,
+                  EndorseComment, Endorsement, Image, Feed):
+        _reset_sequence(model)
+    db.session.commit()
+    return counts
+
+
+def percentile(values, p):
+    """
+    Nearest-rank percentile of sorted values
+    """
+    index = int(math.ceil(p / 100.0 * len(values))) - 1
+    return values[min(max(index, 0), len(values) - 1)]
+
+
+def _query_count(response):
+    header = response.headers.get(SQL_STATS_HEADER)
+    return int(header.split(';', 1)[0].split('=', 1)[1])
+
+
+def measure(client, requests, viewers, make_request):
+    """
+    :param make_request: make_request(client, viewer) returns the response
+    :return: The report of the endpoint
+    """
+    # warm the caches, timelines and the company index
+    for viewer in viewers:
+        make_request(client, viewer)
+    latencies = []
+    queries = []
+    for i in range(requests):
+        viewer = viewers[i % len(viewers)]
+        start = time.time()
+        response = make_request(client, viewer)
+        latencies.append((time.time() - start) * 1000)
+        assert response.status_code == 200, response.data
+        assert json.loads(response.data).get('status') == 200, response.data
+        queries.append(_query_count(response))
+    latencies.sort()
+    return {
+        'requests': requests,
+        'latency_ms': {
+            'p50': round(percentile(latencies, 50), 3),
+            'p90': round(percentile(latencies, 90), 3),
+            'p99': round(percentile(latencies, 99), 3),
+            'max': round(latencies[-1], 3),
+            'mean': round(sum(latencies) / len(latencies), 3)
+        },
+        'queries': {
+            'mean': round(float(sum(queries)) / len(queries), 2),
+            'max': max(queries)
+        }
+    }
+
+
+def _login(client, viewer):
+    return client.post('/login', headers={'device-id': DEVICE_ID},
+                       data=json.dumps({'mobile': viewer['mobile'], 'password': PASSWORD}),
+                       content_type='application/json')
+
+
+def _get(path, query=None):
+    def make_request(client, viewer):
+        return client.get(path, query_string=query(viewer) if query else None,
+                          headers={'device-id': DEVICE_ID,
+                                   'Authorization': 'Bearer {}'.format(viewer['token'])})
+    return make_request
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD']).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--db', required=True, help="postgres uri of a throwaway database")
+    parser.add_argument('--users', type=int, default=2000)
+    parser.add_argument('--contacts', type=int, default=80, help="max contacts added per user")
+    parser.add_argument('--feeds', type=int, default=5, help="mean feeds per user")
+    parser.add_argument('--viewers', type=int, default=50)
+    parser.add_argument('--requests', type=int, default=300, help="per endpoint")
+    parser.add_argument('--output', default='bench_endpoints.json')
+    args = parser.parse_args()
+    if args.db == Config.sqlalchemy_database_uri:
+        parser.error("--db is the configured database, its tables would be dropped")
+
+    settings.sqlalchemy_database_uri = args.db
+    settings.sql_stats = True
+    settings.sql_stats_header = True
+    settings.profiler_sample_rate = 0
+    # an access log line and maybe a warning per request
+    logging.getLogger('colleague.access').setLevel(logging.WARNING)
+    logging.getLogger('colleague.sql_stats').setLevel(logging.ERROR)
+    # every client shares the pool, fakeredis >= 1.0 connections plug into it
+    extensions.redis_conn.connection_pool = fakeredis.FakeStrictRedis().connection_pool
+
+    app = create_app(settings=settings)
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        start = time.time()
+        counts = seed(args.users, args.contacts, args.feeds)
+        print "seeded {} in {:.1f} s".format(
+                ", ".join("{} {}".format(v, k) for k, v in sorted(counts.items())), time.time() - start)
+
+    rng = random.Random(7)
+    viewers = [{'uid': uid, 'mobile': "138{:08d}".format(uid)}
+               for uid in rng.sample(range(1, args.users + 1), min(args.viewers, args.users))]
+    for viewer in viewers:
+        viewer['other'] = encode_id(rng.randint(1, args.users))
+    keywords = [word[:i] for word in COMPANY_WORDS for i in range(1, len(word) + 1)]
+    client = app.test_client()
+    for viewer in viewers:
+        viewer['token'] = json.loads(_login(client, viewer).data)['result']['access_token']
+
+    endpoints = [
+        ('GET /contacts', _get('/contacts')),
+        ('GET /feed', _get('/feed')),
+        ('GET /user/profile', _get('/user/profile', lambda viewer: {'uid': viewer['other']})),
+        ('GET /search/company', _get('/search/company',
+                                     lambda viewer: {'keyword': rng.choice(keywords)})),
+        # the last one, a login makes the previous tokens of the user invalid
+        ('POST /login', _login),
+    ]
+    report = {
+        'commit': _git_commit(),
+        'created_at': datetime.datetime.utcnow().isoformat(),
+        'settings': dict((key, settings[key]) for key in
+                         ('UNIT_OF_WORK', 'ID_CODEC', 'COMPANY_SEARCH_BACKEND', 'METRICS')),
+        'seed': counts,
+        'endpoints': {}
+    }
+    print "{:<22} {:>9} {:>9} {:>9} {:>9}".format("", "p50 ms", "p90 ms", "p99 ms", "queries")
+    for name, make_request in endpoints:
+        result = measure(client, args.requests, viewers, make_request)
+        report['endpoints'][name] = result
+        print "{:<22} {:>9.2f} {:>9.2f} {:>9.2f} {:>9.2f}".format(
+                name, result['latency_ms']['p50'], result['latency_ms']['p90'],
+                result['latency_ms']['p99'], result['queries']['mean'])
+
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+        f.write('\n')
+    print "report written to {}".format(args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Per-id cost of the public id codecs.
+
+    python benchmarks/bench_idcodec.py [count]
+
+`legacy` is the original encode_id/decode_id which built a new AES cipher for
+every call, the others are the codecs in `colleague.idcodec`. The memoized
+numbers encode the same page of ids twice, like a page rendering the same
+users in several places.
+"""
+import base64
+import sys
+import time
+
+from Crypto.Cipher import AES
+
+from colleague.idcodec import AESCodec, FeistelCodec, IdCodec
+
+KEY = "0123456789abcdef"
+IV = "fedcba9876543210"
+
+
+def legacy_encode(cursor):
+    cursor = str(cursor)
+    data = cursor + '\t' * (-len(cursor) % 16)
+    obj = AES.new(KEY, AES.MODE_CBC, IV)
+    return base64.urlsafe_b64encode(obj.encrypt(data)).rstrip('==')
+
+
+def legacy_decode(cursor):
+    cursor += '=' * (-len(cursor) % 4)
+    obj = AES.new(KEY, AES.MODE_CBC, IV)
+    return obj.decrypt(base64.urlsafe_b64decode(cursor)).rstrip('\t')
+
+
+def measure(name, fn, count):
+    start = time.time()
+    fn()
+    cost = (time.time() - start) / count * 1000000
+    print "{:<28} {:>8.2f} us/id".format(name, cost)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    ids = range(1000000, 1000000 + count)
+    aes = AESCodec(KEY, IV)
+    feistel = FeistelCodec(KEY)
+
+    legacy_tokens = [legacy_encode(i) for i in ids]
+    assert aes.encode_many([str(i) for i in ids]) == legacy_tokens
+    feistel_tokens = feistel.encode_many(ids)
+
+    measure("legacy encode", lambda: [legacy_encode(i) for i in ids], count)
+    measure("legacy decode", lambda: [legacy_decode(t) for t in legacy_tokens], count)
+    measure("aes encode", lambda: [aes.encode(str(i)) for i in ids], count)
+    measure("aes decode", lambda: [aes.decode(t) for t in legacy_tokens], count)
+    measure("aes encode_many", lambda: aes.encode_many([str(i) for i in ids]), count)
+    measure("aes decode_many", lambda: aes.decode_many(legacy_tokens), count)
+    measure("feistel encode", lambda: [feistel.encode(i) for i in ids], count)
+    measure("feistel decode", lambda: [feistel.decode(t) for t in feistel_tokens], count)
+
+    for default in ('aes', 'feistel'):
+        codec = IdCodec(aes, feistel, default=default, memo_size=count)
+
+        def encode_twice():
+            codec.encode_many(ids)
+            codec.encode_many(ids)
+
+        measure("memoized {} encode x2".format(default), encode_twice, count * 2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,45 @@
+-- contact_edge: one row per direction of `contact`, @see ContactEdge
+CREATE TABLE IF NOT EXISTS contact_edge (
+    id BIGSERIAL PRIMARY KEY,
+    owner_uid BIGINT NOT NULL,
+    contact_uid BIGINT NOT NULL,
+    contact_id BIGINT NOT NULL REFERENCES contact (id),
+    status INTEGER NOT NULL,
+    type INTEGER NOT NULL,
+    updated_at TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+    UNIQUE (owner_uid, contact_uid)
+);
+CREATE INDEX IF NOT EXISTS ix_contact_edge_contact_id ON contact_edge (contact_id);
+CREATE INDEX IF NOT EXISTS ix_contact_edge_owner_cursor ON contact_edge (owner_uid, status, updated_at, id);
+
+INSERT INTO contact_edge (owner_uid, contact_uid, contact_id, status, type, updated_at)
+SELECT uid_a, uid_b, id, status, type, updated_at FROM contact
+UNION ALL
+SELECT uid_b, uid_a, id, status, type, updated_at FROM contact
+ON CONFLICT (owner_uid, contact_uid) DO NOTHING;
+
+-- timeline backfill reads the latest feeds of a set of authors
+CREATE INDEX IF NOT EXISTS ix_feed_uid_id ON feed (uid, id);
+
+-- notification_outbox, @see Notification
+CREATE TABLE IF NOT EXISTS notification_outbox (
+    id BIGSERIAL PRIMARY KEY,
+    type SMALLINT NOT NULL,
+    from_uid VARCHAR(64) NOT NULL,
+    to_uid VARCHAR(64) NOT NULL,
+    message TEXT NOT NULL,
+    extra VARCHAR(64),
+    status SMALLINT NOT NULL DEFAULT 0,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+    error TEXT,
+    created_at TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+    sent_at TIMESTAMP WITHOUT TIME ZONE
+);
+CREATE INDEX IF NOT EXISTS ix_notification_outbox_pending
+    ON notification_outbox (next_attempt_at, id) WHERE status = 0;
+
+-- company search with pg_trgm, @see Organization.similar
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+CREATE INDEX IF NOT EXISTS ix_organizations_name_trgm ON organizations USING gin (name gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS ix_organizations_alias_trgm ON organizations USING gin (alias gin_trgm_ops);
@@ -7,28 +7,27 @@ from flask_jwt_extended import verify_jwt_refresh_token_in_request
 from flask_jwt_extended.exceptions import NoAuthorizationError
 
 from colleague.extensions import jwt
-from colleague.models.user import User
+from colleague.service import session_service
 from colleague.utils import decode_id
 
 
 class UserObject(object):
-    def __init__(self, **kwargs):
-        self.user = User.find(decode_id(kwargs.get('user_id')))
-        self.device_id = kwargs.get("device_id")
+    def __init__(self, user, device_id):
+        # user is a `SessionUser` backed by the cached session record
+        self.user = user
+        self.device_id = device_id
         # TODO: other attributes
 
 
 @jwt.user_loader_callback_loader
 def user_loader_callback(identity):
-    user_object = UserObject(**identity)
-
+    device_id = identity.get("device_id")
+    uid = int(decode_id(identity.get('user_id')))
     # TODO: raise different error
-    if user_object.user is None \
-            or user_object.user.is_logged_out() \
-            or not user_object.user.is_available() \
-            or not user_object.user.verify_token_metadata(identity, user_object.device_id):
+    user = session_service.load_user(uid, identity, device_id)
+    if user is None:
         return None
-    return user_object
+    return UserObject(user, device_id)
 
 
 def login_required(fn):
@@ -3,11 +3,12 @@
 from flask import current_app, Flask
 from flask_jwt_extended.exceptions import JWTExtendedException
 from flask_restful import Api
-from werkzeug.exceptions import NotFound
+from werkzeug.exceptions import HTTPException, NotFound
 
 from colleague.models.user import db
+from . import metrics, profiler, sql_stats, unit_of_work
 from .config import settings
-from .extensions import jwt
+from .extensions import jwt, redis_conn
 from .utils import ApiException
 
 
@@ -19,12 +20,17 @@ class ColleagueApi(Api):
         return False
 
     def handle_error(self, e):
+        # nothing the handler staged is committed
+        unit_of_work.fail()
         if isinstance(e, ApiException):
+            metrics.record_error(e.status_code)
             current_app.logger.warning("{} %s".format(e.status_code), e.message)
             return self.make_response(e.to_dict(), e.http_status_code)
         if isinstance(e, JWTExtendedException):
+            metrics.record_error(401)
             return self.make_response({"error": e.message}, 401)
 
+        metrics.record_error(e.code if isinstance(e, HTTPException) else 500)
         self.record_exception(e)
         return super(ColleagueApi, self).handle_error(e)
 
@@ -52,6 +58,15 @@ def create_app(config_object=None, settings=None):
     register_extensions(app)
     register_blueprints(app)
     register_errorhandlers(app)
+    # the hooks registered first run their after_request last
+    if settings and (settings.get('PROFILER_SAMPLE_RATE') or settings.get('PROFILER_SECRET')):
+        profiler.init_app(app)
+    if settings and settings.get('METRICS'):
+        metrics.init_app(app, redis_conn)
+    if settings and settings.get('SQL_STATS'):
+        sql_stats.init_app(app)
+    if settings and settings.get('UNIT_OF_WORK'):
+        unit_of_work.init_app(app)
 
     return app
 
@@ -66,7 +81,7 @@ def register_extensions(app):
 
 def register_blueprints(app):
     from .resources.api_user import (
-        Register, Verification, Login, RefreshToken, Logout,
+        Register, Verification, VerificationStatus, Login, RefreshToken, Logout,
         UserDetail, UploadAvatar, SearchUsers, UserProfile, RongCloud,
         MeProfile)
     from .resources.api_work import (ApiWorkExperience, ApiCompanySearch)
@@ -80,6 +95,7 @@ def register_blueprints(app):
 
     api.add_resource(Register, '/register')
     api.add_resource(Verification, '/send_verification')
+    api.add_resource(VerificationStatus, '/send_verification/status')
     api.add_resource(Login, '/login')
     api.add_resource(RefreshToken, '/refresh_token')
     api.add_resource(Logout, '/logout')
@@ -0,0 +1,151 @@
+# -*- coding:utf-8 -*-
+
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from colleague.config import settings
+from colleague.extensions import redis_conn
+
+
+class LRUCache(object):
+    """
+    A small thread-safe LRU map kept in the worker process.
+    Entries expire `ttl` seconds after they were set, `ttl=None` keeps them
+    until they are evicted.
+    """
+
+    def __init__(self, maxsize=1024, ttl=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.pop(key, None)
+            if item is None:
+                return default
+            value, expire_at = item
+            if expire_at is not None and expire_at < time.time():
+                return default
+            # re-insert to mark it as the most recently used
+            self._data[key] = item
+            return value
+
+    def set(self, key, value):
+        expire_at = time.time() + self.ttl if self.ttl else None
+        with self._lock:
+            self._data.pop(key, None)
+            self._data[key] = (value, expire_at)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class UserSessionCache(object):
+    """
+    Compact per-user session record used by the jwt user loader.
+    Records live in redis and a short lived LRU sits in front of it. The LRU
+    of other workers can't be invalidated, so keep its ttl small.
+    Like `ProfileCache`, invalidating bumps the user's version, a record
+    built from a row read before a logout is never served.
+    """
+
+    KEY = "user_session:{}"
+    VERSION_KEY = "user_session_version:{}"
+
+    def __init__(self, redis, ttl, local_size, local_ttl):
+        self.redis = redis
+        self.ttl = ttl
+        self.local = LRUCache(local_size, local_ttl)
+
+    def get(self, uid, local=True):
+        """
+        :param uid: User id
+        :param local: Whether the in-process LRU can be used
+        :return: (record dict or None when missed, version), pass the
+        version to `set`
+        """
+        if local:
+            item = self.local.get(uid)
+            if item is not None:
+                return item
+        version, raw = self.redis.mget(self.VERSION_KEY.format(uid), self.KEY.format(uid))
+        version = int(version or 0)
+        if raw is None:
+            return None, version
+        blob = json.loads(raw)
+        if blob['version'] != version:
+            return None, version
+        self.local.set(uid, (blob['record'], version))
+        return blob['record'], version
+
+    def set(self, uid, version, record):
+        """
+        :param version: The version returned by `get` before the record was built
+        """
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.set(self.KEY.format(uid), json.dumps({'version': version, 'record': record}), ex=self.ttl)
+        pipe.get(self.VERSION_KEY.format(uid))
+        current = int(pipe.execute()[1] or 0)
+        if current == version:
+            self.local.set(uid, (record, version))
+
+    def invalidate(self, uid):
+        self.local.delete(uid)
+        self.redis.incr(self.VERSION_KEY.format(uid))
+
+
+class ProfileCache(object):
+    """
+    The viewer independent part of the user profiles, one json blob per user.
+    Writes bump the user's version instead of deleting the blob, so a blob
+    built from data read before the bump is never served.
+    """
+
+    KEY = "profile:{}"
+    VERSION_KEY = "profile_version:{}"
+
+    def __init__(self, redis, ttl):
+        self.redis = redis
+        self.ttl = ttl
+
+    def get(self, uid):
+        """
+        :param uid: User id
+        :return: (profile or None, version), pass the version to `set`
+        """
+        version, raw = self.redis.mget(self.VERSION_KEY.format(uid), self.KEY.format(uid))
+        version = int(version or 0)
+        if raw is not None:
+            blob = json.loads(raw)
+            if blob['version'] == version:
+                return blob['profile'], version
+        return None, version
+
+    def set(self, uid, version, profile):
+        self.redis.set(self.KEY.format(uid),
+                       json.dumps({'version': version, 'profile': profile}),
+                       ex=self.ttl)
+
+    def invalidate(self, uid):
+        self.redis.incr(self.VERSION_KEY.format(uid))
+
+
+user_session_cache = UserSessionCache(redis_conn,
+                                      ttl=settings['USER_SESSION_CACHE_TTL'],
+                                      local_size=settings['USER_SESSION_LRU_SIZE'],
+                                      local_ttl=settings['USER_SESSION_LRU_TTL'])
+profile_cache = ProfileCache(redis_conn, ttl=settings['PROFILE_CACHE_TTL'])
@@ -16,6 +16,11 @@ class Config(Configuration):
 
     aes_key = os.getenv("AES_KEY")
     aes_iv = os.getenv("AES_IV")
+    # How integer ids are encoded: 'aes' keeps the original public ids,
+    # 'feistel' is much cheaper but changes every public id (including the
+    # RongCloud user ids), both formats are always accepted by `decode_id`
+    id_codec = os.getenv("ID_CODEC", "aes")
+    id_codec_memo_size = 10000
 
     db_host = os.getenv("DB_HOST")
     db_port = os.getenv("DB_PORT")
@@ -26,6 +31,36 @@ class Config(Configuration):
             db_user, db_pass, db_host, db_port, db_name
     )
 
+    # commit once per request instead of in every model helper,
+    # @see colleague.unit_of_work
+    unit_of_work = os.getenv("UNIT_OF_WORK", "true").lower() == "true"
+
+    # per request sql statistics, @see colleague.sql_stats
+    sql_stats = os.getenv("SQL_STATS", "true").lower() == "true"
+    # add the X-Sql-Stats response header
+    sql_stats_header = os.getenv("SQL_STATS_HEADER", "false").lower() == "true"
+    # warn when a request runs more statements
+    sql_stats_warn_queries = 20
+    # or runs a statement this many times (suspected N+1)
+    sql_stats_repeat_threshold = 5
+
+    # prometheus metrics at /metrics, @see colleague.metrics
+    metrics = os.getenv("METRICS", "true").lower() == "true"
+    # seconds, how often a process adds its samples to redis
+    metrics_flush_interval = 1
+    # bearer token of GET /metrics, without it /metrics answers 404
+    metrics_token = os.getenv("METRICS_TOKEN", "")
+
+    # sampling profiler, @see colleague.profiler
+    # share of the requests profiled, 0 to profile only the signed ones
+    profiler_sample_rate = float(os.getenv("PROFILER_SAMPLE_RATE", 0))
+    # key of the X-Profile header, empty to disable it
+    profiler_secret = os.getenv("PROFILER_SECRET", "")
+    # seconds between two samples
+    profiler_interval = 0.005
+    profiler_dir = os.getenv("PROFILER_DIR", "/tmp/colleague-profiles")
+    profiler_max_files = 1000
+
     redis_host = os.getenv('REDIS_HOST')
     redis_port = int(os.getenv('REDIS_PORT'))
     redis_db = int(os.getenv('REDIS_DB'))
@@ -33,7 +68,62 @@ class Config(Configuration):
     jwt_access_token_expires = int(os.getenv("JWT_ACCESS_TOKEN_EXPIRES"))
     jwt_refresh_token_expires = int(os.getenv("JWT_REFRESH_TOKEN_EXPIRES"))
 
+    # verification codes, seconds @see colleague.utils.VerificationCode
+    verification_code_ttl = 10 * 60
+    verification_code_window = 24 * 60 * 60
+    # max codes per mobile/device within the window
     max_verification_code_request_count = 5
+    max_verification_code_device_count = 10
+    # the code is dropped after too many wrong ones
+    verification_code_max_attempts = 5
+
+    # verification code messages, @see colleague.service.sms_service
+    # 'aliyun' or 'fake'
+    sms_provider = os.getenv("SMS_PROVIDER", "aliyun")
+    sms_workers = 4
+    # max messages being sent at a time per provider
+    sms_provider_concurrency = {'aliyun': 4, 'fake': 4}
+    sms_max_attempts = 4
+    # seconds
+    sms_retry_base = 2
+    sms_retry_max = 60
+    sms_job_ttl = 24 * 60 * 60
+    # a job taken longer ago by a dispatcher which crashed is queued again
+    sms_processing_timeout = 5 * 60
+    # latest dead jobs kept, without their codes, for sms_job_ttl
+    sms_dead_letter_size = 1000
+
+    # session record of the login user, @see colleague.cache.UserSessionCache
+    user_session_cache_ttl = 60 * 60
+    user_session_lru_size = 1024
+    user_session_lru_ttl = 5
+    # @see colleague.cache.ProfileCache
+    profile_cache_ttl = 60 * 60
+
+    # feed timelines, @see colleague.service.timeline_service
+    timeline_size = 800
+    timeline_ttl = 7 * 24 * 60 * 60
+    # authors with more contacts are merged when reading instead
+    timeline_fanout_limit = 1000
+
+    # notification outbox, @see colleague.service.notification_service
+    notification_batch_size = 500
+    notification_max_attempts = 8
+    # seconds
+    notification_poll_interval = 1
+    notification_retry_base = 5
+    notification_retry_max = 10 * 60
+
+    # RongCloud im tokens, seconds
+    rc_token_ttl = 7 * 24 * 60 * 60
+    rc_token_lock_timeout = 5
+
+    # company search, @see colleague.service.company_search
+    # 'ngram': in-process index, 'trgm': postgres pg_trgm, 'like': name LIKE
+    company_search_backend = os.getenv("COMPANY_SEARCH_BACKEND", "ngram")
+    company_search_similarity = 0.3
+    # seconds, how often a worker picks up the companies added by the others
+    company_search_refresh_interval = 60
 
     server_name = os.getenv("SERVER_NAME")
     upload_folder = os.getenv("UPLOAD_FOLDER")
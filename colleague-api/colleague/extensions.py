@@ -7,7 +7,11 @@ from .config import settings
 db = SQLAlchemy()
 
 import redis
-redis_conn = redis.client.StrictRedis(host=settings['REDIS_HOST'], port=int(settings['REDIS_PORT']), db=settings['REDIS_DB'])
+from .metrics import TimedConnection
+# the connections add their time to the current request, @see colleague.metrics
+redis_conn = redis.client.StrictRedis(connection_pool=redis.ConnectionPool(
+        connection_class=TimedConnection,
+        host=settings['REDIS_HOST'], port=int(settings['REDIS_PORT']), db=settings['REDIS_DB']))
 
 
 from flask_jwt_extended import JWTManager
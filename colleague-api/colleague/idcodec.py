@@ -0,0 +1,249 @@
+# -*- coding:utf-8 -*-
+
+import base64
+import hashlib
+import struct
+
+from Crypto.Cipher import AES
+
+from colleague.cache import LRUCache
+from colleague.config import settings
+
+MASK32 = 0xffffffff
+MAX_ID = 1 << 64
+
+
+def _b64encode(data):
+    return base64.urlsafe_b64encode(data).rstrip('=')
+
+
+def _b64decode(token):
+    token += '=' * (-len(token) % 4)
+    return base64.urlsafe_b64decode(token)
+
+
+class AESCodec(object):
+    """
+    The original public id format: AES-CBC with a fixed iv over the value
+    padded with '\\t', then urlsafe base64 without '='.
+
+    CBC is done by hand on top of a single ECB cipher, the key schedule is
+    computed once instead of building a new cipher for every id.
+    """
+
+    BLOCK_SIZE = 16
+
+    def __init__(self, key, iv):
+        self._ecb = AES.new(key, AES.MODE_ECB)
+        self._iv = struct.unpack('>QQ', iv)
+
+    @staticmethod
+    def _xor(block, prev):
+        a, b = struct.unpack('>QQ', block)
+        return struct.pack('>QQ', a ^ prev[0], b ^ prev[1])
+
+    @staticmethod
+    def _pad(value):
+        return value + '\t' * (-len(value) % AESCodec.BLOCK_SIZE)
+
+    def _encrypt(self, data):
+        blocks = []
+        prev = self._iv
+        for i in range(0, len(data), self.BLOCK_SIZE):
+            block = self._ecb.encrypt(self._xor(data[i:i + self.BLOCK_SIZE], prev))
+            blocks.append(block)
+            prev = struct.unpack('>QQ', block)
+        return ''.join(blocks)
+
+    def _decrypt(self, raw):
+        blocks = []
+        prev = self._iv
+        for i in range(0, len(raw), self.BLOCK_SIZE):
+            block = raw[i:i + self.BLOCK_SIZE]
+            blocks.append(self._xor(self._ecb.decrypt(block), prev))
+            prev = struct.unpack('>QQ', block)
+        return ''.join(blocks)
+
+    def encode(self, value):
+        return _b64encode(self._encrypt(self._pad(value)))
+
+    def decode(self, token):
+        return self._decrypt(_b64decode(token)).rstrip('\t')
+
+    def encode_many(self, values):
+        """
+        Ids fit in a single block, so all of them are encrypted by one ECB
+        call. Longer values fall back to `encode`.
+        """
+        padded = [self._pad(value) for value in values]
+        single = [data for data in padded if len(data) == self.BLOCK_SIZE]
+        encrypted = self._ecb.encrypt(''.join(self._xor(data, self._iv) for data in single)) \
+            if single else ''
+        tokens = []
+        offset = 0
+        for data in padded:
+            if len(data) == self.BLOCK_SIZE:
+                tokens.append(_b64encode(encrypted[offset:offset + self.BLOCK_SIZE]))
+                offset += self.BLOCK_SIZE
+            else:
+                tokens.append(_b64encode(self._encrypt(data)))
+        return tokens
+
+    def decode_many(self, tokens):
+        raws = [_b64decode(token) for token in tokens]
+        single = [raw for raw in raws if len(raw) == self.BLOCK_SIZE]
+        decrypted = self._ecb.decrypt(''.join(single)) if single else ''
+        values = []
+        offset = 0
+        for raw in raws:
+            if len(raw) == self.BLOCK_SIZE:
+                block = decrypted[offset:offset + self.BLOCK_SIZE]
+                values.append(self._xor(block, self._iv).rstrip('\t'))
+                offset += self.BLOCK_SIZE
+            else:
+                values.append(self._decrypt(raw).rstrip('\t'))
+        return values
+
+
+class FeistelCodec(object):
+    """
+    A keyed Feistel permutation over unsigned 64 bit integers. The result is
+    packed to 8 bytes, so every token is 11 chars long, which can never be
+    mistaken for an AES token (22 chars or more).
+    """
+
+    ROUNDS = 6
+    TOKEN_LENGTH = 11
+
+    def __init__(self, key):
+        digest = hashlib.sha256(key).digest()
+        self._keys = struct.unpack('>8I', digest)[:self.ROUNDS]
+
+    @staticmethod
+    def accepts(value):
+        return isinstance(value, (int, long)) and 0 <= value < MAX_ID
+
+    @staticmethod
+    def _round(x, k):
+        x = ((x ^ k) * 0x85ebca6b) & MASK32
+        x ^= x >> 13
+        x = (x * 0xc2b2ae35) & MASK32
+        return x ^ (x >> 16)
+
+    def permute(self, n):
+        left, right = n >> 32, n & MASK32
+        for k in self._keys:
+            left, right = right, left ^ self._round(right, k)
+        return (left << 32) | right
+
+    def invert(self, n):
+        left, right = n >> 32, n & MASK32
+        for k in reversed(self._keys):
+            left, right = right ^ self._round(left, k), left
+        return (left << 32) | right
+
+    def encode(self, value):
+        return _b64encode(struct.pack('>Q', self.permute(value)))
+
+    def decode(self, token):
+        return str(self.invert(struct.unpack('>Q', _b64decode(token))[0]))
+
+    def encode_many(self, values):
+        return [self.encode(value) for value in values]
+
+    def decode_many(self, tokens):
+        return [self.decode(token) for token in tokens]
+
+
+class IdCodec(object):
+    """
+    Encodes/decodes the public ids.
+    Integers are encoded by the `default` codec, other values (e.g. the
+    contact cursor or image ids) always use AES. Both formats can be decoded
+    whatever the default is, recent results are memoized.
+    """
+
+    def __init__(self, aes, feistel, default='aes', memo_size=10000):
+        self.aes = aes
+        self.feistel = feistel
+        self.default = default
+        self._encoded = LRUCache(memo_size)
+        self._decoded = LRUCache(memo_size)
+
+    @staticmethod
+    def from_settings(settings):
+        key = settings['AES_KEY'].encode("utf8")
+        iv = settings['AES_IV'].encode("utf8")
+        return IdCodec(AESCodec(key, iv), FeistelCodec(key),
+                       default=settings['ID_CODEC'],
+                       memo_size=settings['ID_CODEC_MEMO_SIZE'])
+
+    @staticmethod
+    def _normalize(value):
+        if isinstance(value, unicode):
+            return value.encode('utf-8')
+        return value
+
+    def _encoder(self, value):
+        if self.default == 'feistel' and self.feistel.accepts(value):
+            return self.feistel
+        return self.aes
+
+    def _decoder(self, token):
+        if len(token) == FeistelCodec.TOKEN_LENGTH:
+            return self.feistel
+        return self.aes
+
+    def encode(self, value):
+        if value is None:
+            return None
+        return self.encode_many([value])[0]
+
+    def decode(self, token):
+        if token is None:
+            return None
+        return self.decode_many([token])[0]
+
+    def encode_many(self, values):
+        return self._run_many(values, self._encoded, self._encoder,
+                              lambda codec, keys: codec.encode_many(
+                                      [k if codec is self.feistel else str(k) for k in keys]))
+
+    def decode_many(self, tokens):
+        return self._run_many(tokens, self._decoded, self._decoder,
+                              lambda codec, keys: codec.decode_many(keys))
+
+    def _run_many(self, items, memo, select, convert):
+        """
+        Look every item up in the memo and convert the missed ones in one
+        batch per codec.
+        """
+        results = [None] * len(items)
+        missed = {}
+        for i, item in enumerate(items):
+            if item is None:
+                continue
+            key = self._normalize(item)
+            result = memo.get(key)
+            if result is not None:
+                results[i] = result
+            else:
+                missed.setdefault(select(key), []).append((i, key))
+        for codec, pairs in missed.iteritems():
+            keys = [key for _, key in pairs]
+            for (i, key), result in zip(pairs, convert(codec, keys)):
+                memo.set(key, result)
+                results[i] = result
+        return results
+
+
+_id_codec = None
+
+
+def get_id_codec():
+    # Built on first use, AES_KEY may be missing for commands which never
+    # touch the public ids
+    global _id_codec
+    if _id_codec is None:
+        _id_codec = IdCodec.from_settings(settings)
+    return _id_codec
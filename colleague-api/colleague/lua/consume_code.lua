@@ -0,0 +1,22 @@
+-- Check a verification code, a matched code can only be used once and the
+-- code is dropped after too many failed attempts.
+--
+-- KEYS: code, failed attempts
+-- ARGV: code, max failed attempts, failed attempts ttl (s)
+-- return: 1 matched, 0 mismatched, -1 expired
+
+local expected = redis.call('GET', KEYS[1])
+if not expected then
+    return -1
+end
+if expected == ARGV[1] then
+    redis.call('DEL', KEYS[1], KEYS[2])
+    return 1
+end
+
+local attempts = redis.call('INCR', KEYS[2])
+redis.call('EXPIRE', KEYS[2], ARGV[3])
+if attempts >= tonumber(ARGV[2]) then
+    redis.call('DEL', KEYS[1], KEYS[2])
+end
+return 0
@@ -0,0 +1,38 @@
+-- Issue a verification code if the mobile and the device are under their
+-- sliding window limits, optionally enqueue the sms job along with it.
+--
+-- KEYS: code, failed attempts, mobile window, device window,
+--       [job queue, job status]
+-- ARGV: code, code ttl (s), now (ms), window (ms), mobile limit,
+--       device limit (0: no limit), window member,
+--       [job, job status, job status ttl (s)]
+-- return: 0 issued, 1 the mobile is limited, 2 the device is limited
+
+local now = tonumber(ARGV[3])
+local window = tonumber(ARGV[4])
+local limits = {tonumber(ARGV[5]), tonumber(ARGV[6])}
+
+for i = 1, 2 do
+    if limits[i] > 0 then
+        redis.call('ZREMRANGEBYSCORE', KEYS[i + 2], '-inf', now - window)
+        if redis.call('ZCARD', KEYS[i + 2]) >= limits[i] then
+            return i
+        end
+    end
+end
+
+for i = 1, 2 do
+    if limits[i] > 0 then
+        redis.call('ZADD', KEYS[i + 2], now, ARGV[7])
+        redis.call('PEXPIRE', KEYS[i + 2], window)
+    end
+end
+
+redis.call('SET', KEYS[1], ARGV[1], 'EX', ARGV[2])
+redis.call('DEL', KEYS[2])
+
+if #KEYS > 4 then
+    redis.call('SET', KEYS[6], ARGV[9], 'EX', ARGV[10])
+    redis.call('LPUSH', KEYS[5], ARGV[8])
+end
+return 0
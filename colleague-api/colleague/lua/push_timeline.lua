@@ -0,0 +1,20 @@
+-- Push feeds to the timelines which are loaded, a missing timeline is left
+-- to be loaded from the db by the next read. The sentinel (score 0) is kept
+-- by the trim so the timeline still reads as loaded.
+--
+-- KEYS: timelines
+-- ARGV: timeline size, feed ids
+-- return: count of the timelines pushed to
+
+local size = tonumber(ARGV[1])
+local pushed = 0
+for _, key in ipairs(KEYS) do
+    if redis.call('EXISTS', key) == 1 then
+        for i = 2, #ARGV do
+            redis.call('ZADD', key, ARGV[i], ARGV[i])
+        end
+        redis.call('ZREMRANGEBYRANK', key, 1, -(size + 1))
+        pushed = pushed + 1
+    end
+end
+return pushed
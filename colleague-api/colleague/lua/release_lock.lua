@@ -0,0 +1,11 @@
+-- Release a lock only if it's still held with our token, a holder which ran
+-- past the timeout doesn't release the lock of the next one.
+--
+-- KEYS: lock
+-- ARGV: token
+-- return: 1 released, 0 not held
+
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
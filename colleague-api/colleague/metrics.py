@@ -0,0 +1,259 @@
+# -*- coding:utf-8 -*-
+
+"""
+Prometheus metrics, aggregated over the workers in redis.
+
+Every process observes into its own registry and merges it into the
+`metrics` redis hash with one pipeline at most every
+`METRICS_FLUSH_INTERVAL` seconds, so whichever gunicorn worker answers
+`GET /metrics` renders the totals of all the workers and dispatchers.
+Each field of the hash is one sample of the text exposition format, e.g.
+`http_request_duration_seconds_bucket{resource="Login.post",le="0.1"}`,
+the histogram buckets are kept cumulative.
+
+- http_request_duration_seconds{resource}: latency per resource and method
+- http_request_{db,redis,outbound}_seconds{resource}: the part of it spent
+  in postgres, redis and the calls to oss/rongcloud/sms
+- outbound_request_duration_seconds{service}: each call to oss, rongcloud
+  and sms, the dispatchers included
+- api_errors_total{code}: errors answered, by `ErrorCode` code, the http
+  status for the other errors
+
+`GET /metrics` needs "Authorization: Bearer <METRICS_TOKEN>", it answers
+404 when no token is configured.
+"""
+
+import hmac
+import logging
+import re
+import threading
+import time
+from collections import Counter, defaultdict, OrderedDict
+from contextlib import contextmanager
+
+import redis
+from flask import abort, g, has_app_context, request, Response
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from colleague.config import settings
+
+KEY = "metrics"
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+METRICS = OrderedDict([
+    ('http_request_duration_seconds', ('histogram', 'Request latency by resource')),
+    ('http_request_db_seconds', ('histogram', 'Time of a request spent in the database')),
+    ('http_request_redis_seconds', ('histogram', 'Time of a request spent in redis')),
+    ('http_request_outbound_seconds', ('histogram', 'Time of a request spent calling oss, rongcloud and sms')),
+    ('outbound_request_duration_seconds', ('histogram', 'Latency of the calls to oss, rongcloud and sms')),
+    ('api_errors_total', ('counter', 'Errors answered by code')),
+])
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+logger = logging.getLogger(__name__)
+
+_LE = re.compile(r',?le="([^"]*)"')
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value))
+
+
+def _sample(name, labels):
+    """
+    :param labels: ((name, value), )
+    :return: e.g. `api_errors_total{code="2003"}`
+    """
+    return '{}{{{}}}'.format(name, ','.join(
+            '{}="{}"'.format(key, str(value).replace('\\', r'\\').replace('"', r'\"'))
+            for key, value in labels))
+
+
+class Registry(object):
+    """
+    Samples observed since the last flush, thread-safe
+    """
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = tuple(buckets) + (float('inf'),)
+        self.redis = None
+        self._samples = defaultdict(float)
+        self._flushed_at = time.time()
+        self._lock = threading.Lock()
+
+    def inc(self, name, labels, value=1):
+        with self._lock:
+            self._samples[_sample(name, labels)] += value
+
+    def observe(self, name, labels, value):
+        with self._lock:
+            for le in self.buckets:
+                # every bucket is written, histogram_quantile needs all of them
+                self._samples[_sample(name + '_bucket', labels + (('le', _format_value(le)),))] += \
+                    1 if value <= le else 0
+            self._samples[_sample(name + '_sum', labels)] += value
+            self._samples[_sample(name + '_count', labels)] += 1
+
+    def flush(self):
+        """
+        Add the samples to the redis hash and start over
+        """
+        with self._lock:
+            samples, self._samples = self._samples, defaultdict(float)
+            self._flushed_at = time.time()
+        if not samples or self.redis is None:
+            return
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            for sample, value in samples.iteritems():
+                pipe.hincrbyfloat(KEY, sample, value)
+            pipe.execute()
+        except Exception as e:
+            logger.exception(e)
+
+    def flush_if_due(self):
+        if time.time() - self._flushed_at >= settings['METRICS_FLUSH_INTERVAL']:
+            self.flush()
+
+
+registry = Registry()
+
+
+def _sort_key(item):
+    sample = item[0]
+    match = _LE.search(sample)
+    if match is None:
+        return sample, 0
+    return _LE.sub('', sample), float(match.group(1))
+
+
+def render(redis):
+    """
+    :return: The samples of all the processes in the text exposition format
+    """
+    samples = defaultdict(list)
+    for sample, value in redis.hgetall(KEY).iteritems():
+        name = sample.split('{', 1)[0]
+        for suffix in ('_bucket', '_sum', '_count'):
+            if name.endswith(suffix) and name[:-len(suffix)] in METRICS:
+                name = name[:-len(suffix)]
+                break
+        samples[name].append((sample, value))
+    lines = []
+    for name, (type, help) in METRICS.iteritems():
+        if name not in samples:
+            continue
+        lines.append('# HELP {} {}'.format(name, help))
+        lines.append('# TYPE {} {}'.format(name, type))
+        for sample, value in sorted(samples[name], key=_sort_key):
+            lines.append('{} {}'.format(sample, value))
+    return '\n'.join(lines) + '\n'
+
+
+def _request_times():
+    if not has_app_context():
+        return None
+    return g.get('metrics_times')
+
+
+def add_request_time(kind, seconds):
+    """
+    Add to the time of the current request spent in `kind`, 'db', 'redis'
+    or 'outbound'
+    """
+    times = _request_times()
+    if times is not None:
+        times[kind] += seconds
+
+
+@contextmanager
+def outbound(service):
+    """
+    Time a call to 'oss', 'rongcloud' or 'sms'
+    """
+    started_at = time.time()
+    try:
+        yield
+    finally:
+        elapsed = time.time() - started_at
+        registry.observe('outbound_request_duration_seconds', (('service', service),), elapsed)
+        add_request_time('outbound', elapsed)
+        registry.flush_if_due()
+
+
+def record_error(code):
+    registry.inc('api_errors_total', (('code', code),))
+
+
+class TimedConnection(redis.Connection):
+    """
+    Adds the time waiting for the replies to the current request
+    """
+
+    def read_response(self, *args, **kwargs):
+        started_at = time.time()
+        try:
+            return super(TimedConnection, self).read_response(*args, **kwargs)
+        finally:
+            add_request_time('redis', time.time() - started_at)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _request_times() is not None:
+        conn.info['metrics_started_at'] = time.time()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started_at = conn.info.pop('metrics_started_at', None)
+    if started_at is not None:
+        add_request_time('db', time.time() - started_at)
+
+
+def _authorized():
+    token = settings['METRICS_TOKEN']
+    if not token:
+        return False
+    return hmac.compare_digest(str(request.headers.get('Authorization', '')), str('Bearer ' + token))
+
+
+def begin():
+    g.metrics_started_at = time.time()
+    g.metrics_times = Counter()
+
+
+def end(response):
+    # utils imports the extensions, which import this module
+    from colleague.utils import resource_name
+
+    times = g.pop('metrics_times', None)
+    if times is None:
+        return response
+    labels = (('resource', resource_name()),)
+    registry.observe('http_request_duration_seconds', labels,
+                     time.time() - g.pop('metrics_started_at'))
+    for kind in ('db', 'redis', 'outbound'):
+        registry.observe('http_request_{}_seconds'.format(kind), labels, times[kind])
+    registry.flush_if_due()
+    return response
+
+
+def init_app(app, redis):
+    registry.redis = redis
+    if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+    app.before_request(begin)
+    app.after_request(end)
+
+    def view():
+        if not _authorized():
+            abort(404)
+        registry.flush()
+        return Response(render(registry.redis), content_type=CONTENT_TYPE)
+
+    app.add_url_rule('/metrics', 'metrics', view)
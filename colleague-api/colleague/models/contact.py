@@ -4,10 +4,11 @@ from datetime import datetime
 
 import arrow
 
+from colleague import unit_of_work
 from colleague.extensions import db
 from colleague.models.work import WorkExperience
 from colleague.utils import (st_raise_error, ErrorCode, datetime_to_timestamp,
-                             encode_id)
+                             encode_id, list_to_dict)
 
 
 class ContactStatus(object):
@@ -41,21 +42,6 @@ class Contact(db.Model):
     updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, comment=u'更新时间')
     removed_at = db.Column(db.DateTime, nullable=True)
 
-    @staticmethod
-    def find_by_cursor(from_uid, last_update_date, size):
-        if last_update_date:
-            contacts = Contact.query \
-                .filter((Contact.uidA == from_uid) | (Contact.uidB == from_uid),
-                        Contact.status == ContactStatus.Connected,
-                        Contact.updated_at < last_update_date) \
-                .order_by(db.desc(Contact.updated_at)).offset(0).limit(size).all()
-        else:
-            contacts = Contact.query \
-                .filter((Contact.uidA == from_uid) | (Contact.uidB == from_uid),
-                        Contact.status == ContactStatus.Connected) \
-                .order_by(db.desc(Contact.updated_at)).offset(0).limit(size).all()
-        return contacts
-
     @staticmethod
     def add(uidA, uidB, type):
         result = False
@@ -71,7 +57,8 @@ class Contact(db.Model):
             contact.type = ContactRequestType.Added
         contact.status = ContactStatus.Connected
         contact.updated_at = arrow.utcnow().naive
-        db.session.commit()
+        ContactEdge.sync(contact)
+        unit_of_work.commit()
         return result
 
     @staticmethod
@@ -85,6 +72,83 @@ class Contact(db.Model):
         return (a, b) if a < b else (b, a)
 
 
+class ContactEdge(db.Model):
+    """
+    Denormalized `contact`, one row per direction (owner -> contact).
+    A user's contacts are then a single range scan of
+    (owner_uid, status, updated_at, id) instead of an OR over uid_a/uid_b.
+    It's kept in sync by `Contact.add` and `Contact.remove`.
+    """
+    __tablename__ = 'contact_edge'
+    id = db.Column(db.BigInteger, nullable=False, unique=True, autoincrement=True, primary_key=True)
+    owner_uid = db.Column(db.BigInteger, nullable=False)
+    contact_uid = db.Column(db.BigInteger, nullable=False)
+    contact_id = db.Column(db.BigInteger, db.ForeignKey('contact.id'), nullable=False, index=True)
+    status = db.Column(db.Integer, nullable=False, comment=u'@see ContactStatus')
+    type = db.Column(db.Integer, nullable=False, comment=u'1: 自己添加, 2: 熟人推荐')
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    __table_args__ = (
+        db.UniqueConstraint(owner_uid, contact_uid),
+        db.Index('ix_contact_edge_owner_cursor', owner_uid, status, updated_at, id),
+    )
+
+    @staticmethod
+    def sync(contact):
+        """
+        Copy the state of `contact` to both directions, the caller commits.
+        """
+        if contact.id is None:
+            db.session.flush()
+        edges = list_to_dict(ContactEdge.query.filter(ContactEdge.contact_id == contact.id).all(),
+                             "owner_uid")
+        for owner_uid, contact_uid in ((contact.uidA, contact.uidB), (contact.uidB, contact.uidA)):
+            edge = edges.get(owner_uid)
+            if edge is None:
+                edge = ContactEdge(owner_uid=owner_uid, contact_uid=contact_uid, contact_id=contact.id)
+                db.session.add(edge)
+            edge.status = contact.status
+            edge.type = contact.type
+            edge.updated_at = contact.updated_at
+
+    @staticmethod
+    def find_contact_uids(owner_uid, among=None, limit=None):
+        """
+        :param owner_uid: Whose contacts
+        :param among: Only check these uids if given
+        :param limit: Max count
+        :return: [uid]
+        """
+        query = ContactEdge.query.with_entities(ContactEdge.contact_uid) \
+            .filter(ContactEdge.owner_uid == owner_uid,
+                    ContactEdge.status == ContactStatus.Connected)
+        if among is not None:
+            query = query.filter(ContactEdge.contact_uid.in_(among))
+        if limit:
+            query = query.limit(limit)
+        return [_[0] for _ in query.all()]
+
+    @staticmethod
+    def find_by_cursor(owner_uid, last_update_date, last_id, size):
+        """
+        Keyset pagination ordered by (updated_at, id) desc
+        :param owner_uid: Whose contacts
+        :param last_update_date: updated_at of the last fetched edge
+        :param last_id: id of the last fetched edge, the cursors issued before
+        the id was added only have `last_update_date`
+        :param size: records count
+        :return: [ContactEdge]
+        """
+        query = ContactEdge.query.filter(ContactEdge.owner_uid == owner_uid,
+                                         ContactEdge.status == ContactStatus.Connected)
+        if last_update_date and last_id:
+            query = query.filter(db.tuple_(ContactEdge.updated_at, ContactEdge.id)
+                                 < db.tuple_(last_update_date, last_id))
+        elif last_update_date:
+            query = query.filter(ContactEdge.updated_at < last_update_date)
+        return query.order_by(db.desc(ContactEdge.updated_at), db.desc(ContactEdge.id)) \
+            .limit(size).all()
+
+
 class ContactRequest(db.Model):
     """
     关系请求。
@@ -166,5 +230,5 @@ class ContactRequest(db.Model):
                                      comment=comment, status=ContactRequestStatus.Pending)
             db.session.add(request)
             result = True
-        db.session.commit()
+        unit_of_work.commit()
         return result
@@ -0,0 +1,29 @@
+# -*- coding:utf-8 -*-
+
+from colleague.extensions import db
+
+
+def incr(column, where, delta):
+    """
+    Atomically add `delta` to a counter column with a single
+    `UPDATE ... SET x = GREATEST(x + :delta, 0)`, so concurrent updates
+    can't overwrite each other and the counter never goes below 0.
+    The caller commits. The counter of the rows already loaded in the session
+    is expired, so they read the new value (the unit of work doesn't commit,
+    which used to expire them, before the response is built).
+    :param column: Counter column, e.g. `Feed.like_count`
+    :param where: Criterion of the counted row, e.g. `Feed.id == id`
+    :param delta: Usually 1 or -1
+    :return: True if the row exists
+    """
+    model = column.class_
+    updated = model.query \
+        .filter(where) \
+        .update({column: db.func.greatest(column + delta, 0)},
+                synchronize_session=False)
+    # `where` can't be evaluated in python, expire the column of every loaded
+    # row of the model, only the ones read again are reloaded
+    for obj in db.session.identity_map.values():
+        if isinstance(obj, model):
+            db.session.expire(obj, [column.key])
+    return updated > 0
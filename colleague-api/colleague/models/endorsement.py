@@ -4,7 +4,10 @@ from datetime import datetime
 
 import arrow
 
+from colleague import unit_of_work
+from colleague.cache import profile_cache, user_session_cache
 from colleague.extensions import db
+from colleague.models import counter
 from colleague.utils import (encode_id, datetime_to_timestamp, ErrorCode, st_raise_error)
 
 
@@ -38,7 +41,7 @@ class Endorsement(db.Model):
         # When create a new user, must create a endorsement accordingly
         endorsement = Endorsement(uid=uid)
         db.session.add(endorsement)
-        db.session.commit()
+        unit_of_work.commit()
 
     @staticmethod
     def find_by_uid(uid):
@@ -58,15 +61,11 @@ class Endorsement(db.Model):
 
     @staticmethod
     def _update_count(uid, attr, cnt):
-        if abs(cnt) != 1:
-            # cnt must be 1 or -1
-            return
-        endorsement = Endorsement.query.filter(Endorsement.uid == uid).one_or_none()
-        if endorsement:
-            count = getattr(endorsement, attr) + cnt
-            if count >= 0:
-                setattr(endorsement, attr, count)
-                db.session.commit()
+        if counter.incr(getattr(Endorsement, attr), Endorsement.uid == uid, cnt):
+            unit_of_work.commit()
+            # the counts are part of the cached session record and profile
+            unit_of_work.after_commit(user_session_cache.invalidate, uid)
+            unit_of_work.after_commit(profile_cache.invalidate, uid)
 
     def to_dict(self):
         return {
@@ -145,7 +144,7 @@ class UserEndorse(db.Model):
             Endorsement.update_niubility_count(uid, cnt)
         elif type == EndorseType.Reliability:
             Endorsement.update_reliability_count(uid, cnt)
-        db.session.commit()
+        unit_of_work.commit()
 
 
 class EndorseComment(db.Model):
@@ -182,7 +181,9 @@ class EndorseComment(db.Model):
             text = text.strip()
         comment.text = text
         comment.status = EndorseStatus.Supported if len(text) > 0 else EndorseStatus.Removed
-        db.session.commit()
+        unit_of_work.commit()
+        # it may be the latest comment of the profile
+        unit_of_work.after_commit(profile_cache.invalidate, uid)
 
     @staticmethod
     def find_by_from_uid(uid, from_uid):
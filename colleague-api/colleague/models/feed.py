@@ -3,8 +3,11 @@
 from datetime import datetime
 import os
 
+from colleague import unit_of_work
 from colleague.extensions import db
-from colleague.utils import encode_id, datetime_to_timestamp
+from colleague.models import counter
+from colleague.models.user import User
+from colleague.utils import encode_id, datetime_to_timestamp, list_to_dict
 
 
 class FeedType(object):
@@ -22,26 +25,48 @@ class Feed(db.Model):
     like_count = db.Column(db.Integer, nullable=False, default=0)
     comment_count = db.Column(db.Integer, nullable=False, default=0)
     create_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    __table_args__ = (db.Index('ix_feed_uid_id', uid, id),)
 
     @staticmethod
-    def find_by_cursor(last_id, size):
+    def _query_with_user():
+        # `user.to_dict` needs the company and endorsement, load them in the
+        # same query as the users instead of one lazy load per author
+        return Feed.query.options(db.selectinload(Feed.user).joinedload(User.company),
+                                  db.selectinload(Feed.user).joinedload(User.endorsement))
+
+    @staticmethod
+    def find_by_ids(ids):
+        """
+        :return: [Feed] in the order of `ids`
+        """
+        if not ids:
+            return []
+        feeds = list_to_dict(Feed._query_with_user().filter(Feed.id.in_(ids)).all(), "id")
+        return [feeds[id] for id in ids if id in feeds]
+
+    @staticmethod
+    def find_ids_by_uids(uids, last_id, size):
+        """
+        Ids of the latest feeds posted by `uids`, served by ix_feed_uid_id
+        """
+        query = Feed.query.with_entities(Feed.id).filter(Feed.uid.in_(uids))
         if last_id:
-            feeds = Feed.query \
-                .filter(Feed.id < last_id) \
-                .order_by(db.desc(Feed.id)).offset(0).limit(size).all()
-        else:
-            feeds = Feed.query \
-                .order_by(db.desc(Feed.id)).offset(0).limit(size).all()
-        return feeds
+            query = query.filter(Feed.id < last_id)
+        return [_[0] for _ in query.order_by(db.desc(Feed.id)).limit(size).all()]
 
     @staticmethod
     def find(id):
-        return Feed.query.filter(Feed.id == id).one_or_none()
+        return Feed._query_with_user().filter(Feed.id == id).one_or_none()
 
     @staticmethod
     def add(obj):
         db.session.add(obj)
-        db.session.commit()
+        db.session.flush()
+        unit_of_work.commit()
+
+    @staticmethod
+    def update_like_count(id, cnt):
+        counter.incr(Feed.like_count, Feed.id == id, cnt)
 
     def to_dict(self):
         return {
@@ -77,7 +102,7 @@ class FeedLike(db.Model):
     db.UniqueConstraint(uid, feed_id)
 
     def update(self):
-        db.session.commit()
+        unit_of_work.commit()
 
     @staticmethod
     def find_by_uid(uid, feed_id):
@@ -85,7 +110,17 @@ class FeedLike(db.Model):
             .filter(FeedLike.uid == uid, FeedLike.feed_id == feed_id) \
             .one_or_none()
 
+    @staticmethod
+    def find_liked_feed_ids(uid, feed_ids):
+        if not feed_ids:
+            return set()
+        return set(_[0] for _ in
+                   FeedLike.query.with_entities(FeedLike.feed_id).filter(
+                           FeedLike.uid == uid,
+                           FeedLike.feed_id.in_(feed_ids),
+                           FeedLike.status == FeedLikeStatus.Liked).all())
+
     @staticmethod
     def add(obj):
         db.session.add(obj)
-        db.session.commit()
+        unit_of_work.commit()
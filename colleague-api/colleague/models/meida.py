@@ -3,6 +3,7 @@
 import os
 from datetime import datetime
 
+from colleague import unit_of_work
 from colleague.extensions import db
 from colleague.utils import list_to_dict, encode_id, decode_id
 
@@ -26,7 +27,8 @@ class Image(db.Model):
     @staticmethod
     def add(obj):
         db.session.add(obj)
-        db.session.commit()
+        db.session.flush()
+        unit_of_work.commit()
 
     @staticmethod
     def find(id):
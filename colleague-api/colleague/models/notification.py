@@ -0,0 +1,84 @@
+# -*- coding:utf-8 -*-
+
+from datetime import datetime
+
+import arrow
+
+from colleague.extensions import db
+
+
+class NotificationType(object):
+    # RongCloud system message
+    System = 1
+    # RongCloud private message
+    Private = 2
+
+
+class NotificationStatus(object):
+    Pending = 0
+    Sent = 1
+    # Gave up after too many attempts
+    Failed = 2
+
+
+class Notification(db.Model):
+    """
+    Outbox of the RongCloud notifications. Handlers only add the records,
+    they are delivered by the dispatcher, @see notification_service
+    """
+    __tablename__ = 'notification_outbox'
+    id = db.Column(db.BigInteger, nullable=False, unique=True, autoincrement=True, primary_key=True)
+    type = db.Column(db.SMALLINT, nullable=False, comment=u'1: system, 2: private')
+    # RongCloud user ids
+    from_uid = db.Column(db.String(64), nullable=False)
+    to_uid = db.Column(db.String(64), nullable=False)
+    message = db.Column(db.Text, nullable=False)
+    extra = db.Column(db.String(64), nullable=True)
+    status = db.Column(db.SMALLINT, nullable=False, default=0, comment=u'0: pending, 1: sent, 2: failed')
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime, nullable=True)
+    __table_args__ = (
+        db.Index('ix_notification_outbox_pending', next_attempt_at, id,
+                 postgresql_where=(status == NotificationStatus.Pending)),
+    )
+
+    @staticmethod
+    def add(type, from_uid, to_uid, message, extra=None):
+        """
+        Stage a notification, it's committed along with the caller's changes
+        """
+        notification = Notification(type=type, from_uid=from_uid, to_uid=to_uid,
+                                    message=message, extra=extra,
+                                    status=NotificationStatus.Pending)
+        db.session.add(notification)
+        return notification
+
+    @staticmethod
+    def claim_pending(size):
+        """
+        Lock the due notifications, rows locked by another dispatcher are
+        skipped. The locks are released by the next commit.
+        """
+        return Notification.query \
+            .filter(Notification.status == NotificationStatus.Pending,
+                    Notification.next_attempt_at <= arrow.utcnow().naive) \
+            .order_by(Notification.next_attempt_at, Notification.id) \
+            .limit(size) \
+            .with_for_update(skip_locked=True) \
+            .all()
+
+    def sent(self):
+        self.status = NotificationStatus.Sent
+        self.sent_at = arrow.utcnow().naive
+        self.error = None
+
+    def failed(self, error, retry_after, max_attempts):
+        self.attempts += 1
+        self.error = error
+        if self.attempts >= max_attempts:
+            self.status = NotificationStatus.Failed
+        else:
+            self.next_attempt_at = arrow.utcnow().shift(seconds=retry_after).naive
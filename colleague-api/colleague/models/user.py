@@ -7,6 +7,8 @@ import arrow
 from flask_jwt_extended import create_access_token, create_refresh_token
 from passlib.context import CryptContext
 
+from colleague import unit_of_work
+from colleague.cache import profile_cache, user_session_cache
 from colleague.config import settings
 from colleague.extensions import db
 from colleague.utils import ErrorCode, encode_id, st_raise_error
@@ -65,14 +67,21 @@ class User(db.Model):
 
     @staticmethod
     def find_by_ids(ids):
-        return User.query.filter(User.id.in_(ids)).all()
+        """
+        The company and endorsement `to_dict` needs are loaded in the same query
+        """
+        if not ids:
+            return []
+        return User.query.options(db.joinedload(User.company), db.joinedload(User.endorsement)) \
+            .filter(User.id.in_(ids)).all()
 
     @staticmethod
     def add(mobile, password):
         user = User(mobile=mobile, status=UserStatus.Confirmed)
         user.hash_password(password)
         db.session.add(user)
-        db.session.commit()
+        db.session.flush()
+        unit_of_work.commit()
         return user
 
     def update_user(self, **kwargs):
@@ -93,13 +102,17 @@ class User(db.Model):
                 else:
                     setattr(self, key, value)
 
-        db.session.commit()
+        unit_of_work.commit()
+        unit_of_work.after_commit(user_session_cache.invalidate, self.id)
+        unit_of_work.after_commit(profile_cache.invalidate, self.id)
         return self.to_dict()
 
     def update_title(self, company_id, title):
         self.company_id = company_id
         self.title = title
-        db.session.commit()
+        unit_of_work.commit()
+        unit_of_work.after_commit(user_session_cache.invalidate, self.id)
+        unit_of_work.after_commit(profile_cache.invalidate, self.id)
 
     def hash_password(self, password):
         self.password_hash = pwd_context.encrypt(password)
@@ -110,7 +123,8 @@ class User(db.Model):
     def login_on(self, device_id):
         self.last_login_at = arrow.utcnow().naive
         self.status = UserStatus.Confirmed
-        db.session.commit()
+        unit_of_work.commit()
+        unit_of_work.after_commit(user_session_cache.invalidate, self.id)
 
         payload = self._generate_token_metadata(device_id)
         access_token = create_access_token(identity=payload)
@@ -139,7 +153,8 @@ class User(db.Model):
 
     def logout(self):
         self.status = UserStatus.Logout
-        db.session.commit()
+        unit_of_work.commit()
+        unit_of_work.after_commit(user_session_cache.invalidate, self.id)
 
     @property
     def avatar_url(self):
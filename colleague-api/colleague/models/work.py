@@ -2,6 +2,8 @@
 
 from datetime import datetime
 
+from colleague import unit_of_work
+from colleague.cache import profile_cache
 from colleague.extensions import db
 from colleague.utils import encode_id
 
@@ -20,11 +22,12 @@ class Organization(db.Model):
     @staticmethod
     def add(new_one):
         db.session.add(new_one)
-        db.session.commit()
+        db.session.flush()
+        unit_of_work.commit()
 
     @staticmethod
     def update():
-        db.session.commit()
+        unit_of_work.commit()
 
     @staticmethod
     def find(id):
@@ -34,6 +37,23 @@ class Organization(db.Model):
     def find_by_name(name):
         return Organization.query.filter(Organization.name == name).one_or_none()
 
+    @staticmethod
+    def find_by_ids(ids):
+        """
+        :return: Organizations in the order of `ids`
+        """
+        if not ids:
+            return []
+        organizations = dict((_.id, _) for _ in Organization.query.filter(Organization.id.in_(ids)).all())
+        return [organizations[_] for _ in ids if _ in organizations]
+
+    @staticmethod
+    def find_after(last_id, size):
+        return Organization.query \
+            .filter(Organization.id > last_id) \
+            .order_by(Organization.id) \
+            .limit(size).all()
+
     @staticmethod
     def like(keyword, count):
         like_query = "%{}%".format(keyword)
@@ -41,6 +61,35 @@ class Organization(db.Model):
             .filter(Organization.name.like(like_query)) \
             .offset(0).limit(count).all()
 
+    @staticmethod
+    def similar(keyword, count, similarity=0.3):
+        """
+        Fuzzy search over name and alias with pg_trgm, it needs the trigram
+        gin indexes in change.sql.
+        Ranked by prefix match, then similarity, then verified.
+        :param similarity: The threshold of the `%` operator
+        """
+        # set_limit is per connection, set it every time for the pooled ones
+        db.session.execute("SELECT set_limit(:limit)", {'limit': similarity})
+        escaped = keyword.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+        contains = u"%{}%".format(escaped)
+        prefix = u"{}%".format(escaped)
+        # greatest() ignores the null similarity of a missing alias
+        similarity = db.func.greatest(db.func.similarity(Organization.name, keyword),
+                                      db.func.similarity(Organization.alias, keyword))
+        is_prefix = db.func.coalesce(db.or_(Organization.name.ilike(prefix),
+                                            Organization.alias.ilike(prefix)), False)
+        return Organization.query \
+            .filter(db.or_(Organization.name.op('%')(keyword),
+                           Organization.alias.op('%')(keyword),
+                           Organization.name.ilike(contains),
+                           Organization.alias.ilike(contains))) \
+            .order_by(db.desc(is_prefix),
+                      db.desc(similarity),
+                      db.desc(db.func.coalesce(Organization.verified, False)),
+                      Organization.id) \
+            .limit(count).all()
+
     def to_dict(self):
         return {
             "id": encode_id(self.id),
@@ -74,10 +123,12 @@ class WorkExperience(db.Model):
     @staticmethod
     def add(new_one):
         db.session.add(new_one)
-        db.session.commit()
+        unit_of_work.commit()
+        unit_of_work.after_commit(profile_cache.invalidate, new_one.uid)
 
     def update(self):
-        db.session.commit()
+        unit_of_work.commit()
+        unit_of_work.after_commit(profile_cache.invalidate, self.uid)
 
     @staticmethod
     def find_by_uid_id(uid, id):
@@ -86,8 +137,16 @@ class WorkExperience(db.Model):
 
     @staticmethod
     def find_all_for_user(uid):
-        return WorkExperience.query.filter(WorkExperience.uid == uid,
-                                           WorkExperience.status == WorkExperienceStatus.Normal).all()
+        """
+        :return: The latest first, sorted by the end date then update date
+        """
+        return WorkExperience.query \
+            .filter(WorkExperience.uid == uid,
+                    WorkExperience.status == WorkExperienceStatus.Normal) \
+            .order_by(db.desc(WorkExperience.end_year * 100
+                              + db.func.coalesce(WorkExperience.end_month, 1)),
+                      db.desc(WorkExperience.update_date)) \
+            .all()
 
     @staticmethod
     def get_company_ids(uid):
@@ -102,7 +161,8 @@ class WorkExperience(db.Model):
         if we:
             we.status = WorkExperienceStatus.Deleted
             we.delete_date = datetime.utcnow()
-            db.session.commit()
+            unit_of_work.commit()
+            unit_of_work.after_commit(profile_cache.invalidate, uid)
 
     def to_dict(self):
         return {
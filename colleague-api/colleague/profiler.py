@@ -0,0 +1,182 @@
+# -*- coding:utf-8 -*-
+
+"""
+Sampling profiler for single requests.
+
+A profiled request gets a thread reading the stack of the handling thread
+every `PROFILER_INTERVAL` seconds. The counts of the collapsed stacks
+(`outer;inner;leaf count`, the input of flamegraph.pl and speedscope) are
+written to `PROFILER_DIR` when the request ends, one file per request named
+after the resource, only the latest `PROFILER_MAX_FILES` files are kept.
+`python manage.py aggregate_profiles` merges them per resource.
+
+A request is profiled when it's picked by `PROFILER_SAMPLE_RATE` or it has
+a valid `X-Profile` header signed with `PROFILER_SECRET`, @see
+`make_header`. With no rate and no secret the hooks aren't registered.
+"""
+
+import hashlib
+import hmac
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+
+from flask import g, request
+
+from colleague.config import settings
+from colleague.utils import resource_name
+
+HEADER = 'X-Profile'
+SUFFIX = '.folded'
+
+
+def _sign(expires):
+    return hmac.new(settings['PROFILER_SECRET'], str(expires), hashlib.sha256).hexdigest()
+
+
+def make_header(ttl=300):
+    """
+    :param ttl: Seconds the header is valid
+    :return: Value of the `X-Profile` header, "<expires>:<signature>"
+    """
+    expires = int(time.time()) + ttl
+    return "{}:{}".format(expires, _sign(expires))
+
+
+def verify_header(value):
+    if not value or not settings['PROFILER_SECRET']:
+        return False
+    try:
+        expires, signature = value.split(':', 1)
+        expires = int(expires)
+    except ValueError:
+        return False
+    return expires >= time.time() and hmac.compare_digest(str(signature), _sign(expires))
+
+
+def _frame_name(code):
+    return "{} ({}:{})".format(code.co_name, code.co_filename, code.co_firstlineno).replace(';', ',')
+
+
+def collapse(frame):
+    """
+    :return: "outer;inner;leaf" of the stack ending with `frame`
+    """
+    names = []
+    while frame is not None:
+        names.append(_frame_name(frame.f_code))
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+class Sampler(object):
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopped.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.stacks[collapse(frame)] += 1
+
+
+def write_folded(path, stacks):
+    with open(path, 'w') as f:
+        for stack, count in stacks.iteritems():
+            f.write("{} {}\n".format(stack, count))
+
+
+def read_folded(path):
+    stacks = Counter()
+    with open(path) as f:
+        for line in f:
+            stack, count = line.rstrip('\n').rsplit(' ', 1)
+            stacks[stack] += int(count)
+    return stacks
+
+
+def _profile_files(directory):
+    """
+    :return: Names of the profile files, the oldest first
+    """
+    return sorted(_ for _ in os.listdir(directory) if _.endswith(SUFFIX))
+
+
+def _save(resource, stacks):
+    directory = settings['PROFILER_DIR']
+    try:
+        os.makedirs(directory)
+    except OSError:
+        if not os.path.isdir(directory):
+            raise
+    # "<time>-<pid>-<resource>.folded", the names sort by time
+    name = "{:.6f}-{}-{}{}".format(time.time(), os.getpid(),
+                                   resource.replace(os.sep, '_'), SUFFIX)
+    write_folded(os.path.join(directory, name), stacks)
+    files = _profile_files(directory)
+    for old in files[:max(len(files) - settings['PROFILER_MAX_FILES'], 0)]:
+        try:
+            os.remove(os.path.join(directory, old))
+        except OSError:
+            # removed by another worker
+            pass
+
+
+def aggregate(directory):
+    """
+    :return: {resource: (request count, Counter of the stacks)}
+    """
+    resources = {}
+    for name in _profile_files(directory):
+        resource = name[:-len(SUFFIX)].split('-', 2)[2]
+        count, stacks = resources.get(resource, (0, Counter()))
+        stacks.update(read_folded(os.path.join(directory, name)))
+        resources[resource] = (count + 1, stacks)
+    return resources
+
+
+def top_functions(stacks, count=10):
+    """
+    :return: [(function, samples)] of the functions found on top of the
+    stacks the most (self time)
+    """
+    leaves = Counter()
+    for stack, samples in stacks.iteritems():
+        leaves[stack.rsplit(';', 1)[-1]] += samples
+    return leaves.most_common(count)
+
+
+def begin():
+    if random.random() < settings['PROFILER_SAMPLE_RATE'] or verify_header(request.headers.get(HEADER)):
+        g.profiler = Sampler(threading.current_thread().ident, settings['PROFILER_INTERVAL']).start()
+
+
+def end(response):
+    sampler = g.pop('profiler', None)
+    if sampler is None:
+        return response
+    sampler.stop()
+    if sampler.stacks:
+        _save(resource_name(), sampler.stacks)
+    return response
+
+
+def init_app(app):
+    app.before_request(begin)
+    app.after_request(end)
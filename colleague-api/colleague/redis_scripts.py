@@ -0,0 +1,47 @@
+# -*- coding:utf-8 -*-
+
+import hashlib
+import os
+import threading
+
+from redis.exceptions import NoScriptError
+
+from colleague.extensions import redis_conn
+
+SCRIPT_DIR = os.path.join(os.path.dirname(__file__), 'lua')
+
+
+class ScriptRegistry(object):
+    """
+    Lua scripts in `colleague/lua`, run by name with EVALSHA. A script is
+    read once, and loaded again when redis answers NOSCRIPT (after a restart
+    or a SCRIPT FLUSH).
+    """
+
+    def __init__(self, redis, directory=SCRIPT_DIR):
+        self.redis = redis
+        self.directory = directory
+        self._scripts = {}
+        self._lock = threading.Lock()
+
+    def _get(self, name):
+        script = self._scripts.get(name)
+        if script is None:
+            with self._lock:
+                with open(os.path.join(self.directory, name + '.lua')) as f:
+                    source = f.read()
+                script = (source, hashlib.sha1(source).hexdigest())
+                self._scripts[name] = script
+        return script
+
+    def run(self, name, keys=(), args=()):
+        source, sha = self._get(name)
+        params = list(keys) + list(args)
+        try:
+            return self.redis.evalsha(sha, len(keys), *params)
+        except NoScriptError:
+            self.redis.script_load(source)
+            return self.redis.evalsha(sha, len(keys), *params)
+
+
+scripts = ScriptRegistry(redis_conn)
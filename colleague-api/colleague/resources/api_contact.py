@@ -7,8 +7,8 @@ from flask_restful import Resource, reqparse
 from colleague.acl import login_required
 from colleague.models.contact import ContactRequest
 from colleague.models.user import User
-from colleague.service import contact_service, rc_service
-from colleague.utils import decode_id, st_raise_error, ErrorCode, timestamp_to_datetime
+from colleague.service import contact_service, notification_service, rc_service
+from colleague.utils import decode_id, st_raise_error, ErrorCode
 from . import compose_response
 
 
@@ -20,9 +20,8 @@ class ApiContacts(Resource):
         reqparser = reqparse.RequestParser()
         reqparser.add_argument('cursor', type=unicode, location='args', required=False)
         args = reqparser.parse_args()
-        last_timestamp = decode_id(args['cursor']) if args.get('cursor') else None
-        last_update_date = timestamp_to_datetime(last_timestamp)
-        contacts = contact_service.get_contacts(current_user.user.id, last_update_date, ApiContacts.SIZE)
+        cursor = decode_id(args['cursor']) if args.get('cursor') else None
+        contacts = contact_service.get_contacts(current_user.user.id, cursor, ApiContacts.SIZE)
         return compose_response(result=contacts)
 
 
@@ -56,8 +55,8 @@ class ApiContactRequest(Resource):
             else:
                 userA = User.find(uidA)
                 message = "{}给你推荐了{}".format(current_user.user.user_name, userA.user_name)
-            rc_service.send_system_notification(rc_service.RCSystemUser.T100001,
-                                                args['uidB'], message)
+            notification_service.send_system_notification(rc_service.RCSystemUser.T100001,
+                                                          args['uidB'], message)
         return compose_response(message="请求发送成功")
 
     @login_required
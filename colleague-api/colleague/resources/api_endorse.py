@@ -5,7 +5,7 @@ from flask_restful import Resource, reqparse
 
 from colleague.acl import login_required
 from colleague.models.endorsement import UserEndorse, EndorseType, EndorseComment
-from colleague.service import user_service, endorse_service, rc_service
+from colleague.service import user_service, endorse_service, notification_service, rc_service
 from colleague.utils import decode_id
 from . import compose_response
 
@@ -41,8 +41,8 @@ class ApiEndorseNiubility(Resource):
         UserEndorse.update(to_uid, current_user.user.id, EndorseType.Niubility, status)
         if status:
             message = "你的同事{}认为你是大牛".format(current_user.user.user_name)
-            rc_service.send_system_notification(rc_service.RCSystemUser.T100003,
-                                                args.get("uid"), message)
+            notification_service.send_system_notification(rc_service.RCSystemUser.T100003,
+                                                          args.get("uid"), message)
         profile = user_service.get_user_profile(to_uid, current_user.user.id)
         return compose_response(result=profile)
 
@@ -76,8 +76,8 @@ class ApiEndorseReliability(Resource):
         status = args.get('status')
         if status:
             message = "你的同事{}认为你很靠谱".format(current_user.user.user_name)
-            rc_service.send_system_notification(rc_service.RCSystemUser.T100004,
-                                                args.get("uid"), message)
+            notification_service.send_system_notification(rc_service.RCSystemUser.T100004,
+                                                          args.get("uid"), message)
         UserEndorse.update(to_uid, current_user.user.id, EndorseType.Reliability, status)
         profile = user_service.get_user_profile(to_uid, current_user.user.id)
         return compose_response(result=profile)
@@ -108,7 +108,7 @@ class ApiEndorseComment(Resource):
         text = args.get('text')
         if text and len(text.strip()) > 0:
             message = "你的同事{}给你做了评价".format(current_user.user.user_name)
-            rc_service.send_system_notification(rc_service.RCSystemUser.T100005,
-                                                args.get("uid"), message)
+            notification_service.send_system_notification(rc_service.RCSystemUser.T100005,
+                                                          args.get("uid"), message)
         profile = user_service.get_user_profile(to_uid, current_user.user.id)
         return compose_response(result=profile, message="评论成功")
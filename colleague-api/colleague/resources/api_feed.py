@@ -3,10 +3,11 @@
 from flask_jwt_extended import current_user
 from flask_restful import reqparse, Resource, request
 
+from colleague import unit_of_work
 from colleague.acl import login_required
 from colleague.models.feed import Feed, FeedLike, FeedLikeStatus
 from colleague.models.meida import Image
-from colleague.service import feed_service
+from colleague.service import feed_service, timeline_service
 from colleague.utils import decode_id, st_raise_error, ErrorCode
 from . import compose_response
 
@@ -24,6 +25,7 @@ class ApiFeed(Resource):
             image_ids = [Image.decode_id(id) for id in encoded_image_ids]
         feed = Feed(uid=current_user.user.id, images=image_ids, text=text)
         Feed.add(feed)
+        unit_of_work.after_commit(timeline_service.push, feed)
         new_feed = Feed.find(feed.id)
         return compose_response(result=new_feed.to_dict(), message="发布成功")
 
@@ -56,13 +58,7 @@ class ApiFeedLike(Resource):
             FeedLike.add(feed_like)
         else:
             feed_like.status = FeedLikeStatus.reverse(feed_like.status)
-        if feed_like.status == FeedLikeStatus.Liked:
-            feed.like_count += 1
-        else:
-            feed.like_count -= 1
-        if feed.like_count < 0:
-            # Ensure the count is >= 0
-            feed.like_count = 0
+        Feed.update_like_count(feed_id, 1 if feed_like.status == FeedLikeStatus.Liked else -1)
         feed_like.update()
         new_feed = feed_service.get_feed(current_user.user.id, feed_id)
         return compose_response(result=new_feed)
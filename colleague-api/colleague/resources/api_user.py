@@ -8,14 +8,12 @@ from flask_jwt_extended import current_user
 from flask_restful import Resource, reqparse
 from werkzeug.utils import secure_filename
 
+from colleague import unit_of_work
 from colleague.acl import login_required, refresh_token_required
-from colleague.service.aliyun.aliyun_sms_service import send_sms_code
 from colleague.config import settings
-from colleague.extensions import db
-from colleague.extensions import redis_conn
 from colleague.models.endorsement import Endorsement
 from colleague.models.user import User
-from colleague.service import user_service, rc_service
+from colleague.service import user_service, rc_service, sms_service
 from colleague.service.aliyun import aliyun_oss_service
 from colleague.utils import (ErrorCode, VerificationCode, md5,
                              st_raise_error, decode_id, generate_random_verification_code)
@@ -36,10 +34,10 @@ class Register(Resource):
         mobile = args["mobile"]
         password = args["password"]
 
-        verification_code = redis_conn.get("verification_code:{}".format(mobile))
-        if verification_code is None:
+        result = VerificationCode(mobile).consume(args["verification_code"])
+        if result < 0:
             raise st_raise_error(ErrorCode.VERIFICATION_CODE_EXPIRE)
-        if verification_code != args["verification_code"]:
+        if result == 0:
             raise st_raise_error(ErrorCode.VERIFICATION_CODE_NOT_MATCH)
 
         user = User.find_by_mobile(mobile)
@@ -50,7 +48,7 @@ class Register(Resource):
             message = "注册成功"
         else:
             user.hash_password(password)
-            db.session.commit()
+            unit_of_work.commit()
             message = "密码已重置"
         token = user.login_on(args["device-id"])
         json_user = user_service.get_login_user_profile(user.id)
@@ -63,26 +61,39 @@ class Verification(Resource):
     def get(self):
         reqparser = reqparse.RequestParser()
         reqparser.add_argument('mobile', type=str, location='args', required=True)
+        reqparser.add_argument('device-id', dest='device_id', type=str,
+                               location='headers', required=False)
         args = reqparser.parse_args()
 
         mobile = args["mobile"]
+        device_id = args["device_id"]
 
-        verification_code = VerificationCode(mobile)
-        if verification_code.request_count() >= settings["MAX_VERIFICATION_CODE_REQUEST_COUNT"]:
+        job_id = None
+        if os.getenv("API_ENV") == "dev" and mobile.startswith('190'):
+            issued = VerificationCode(mobile).issue(mobile[-6:], device_id)
+        else:
+            # delivered by the sms dispatcher, the status can be
+            # polled with the job id
+            job_id = sms_service.send_code(mobile, generate_random_verification_code(), device_id)
+            issued = job_id is not None
+        if not issued:
             raise st_raise_error(ErrorCode.VERIFICATION_CODE_MAX_REQUEST)
+        return compose_response(result={'job_id': job_id}, message="验证码已发送")
+
+
+class VerificationStatus(Resource):
+
+    def get(self):
+        reqparser = reqparse.RequestParser()
+        reqparser.add_argument('job_id', type=str, location='args', required=True)
+        args = reqparser.parse_args()
 
-        code = verification_code.get_code()
-        if not code:
-            # get and send sms code
-            if os.getenv("API_ENV") == "dev" and mobile.startswith('190'):
-                code = mobile[-6:]
-            else:
-                code = generate_random_verification_code()
-                result = send_sms_code(mobile, code)
-                if not result:
-                    st_raise_error(ErrorCode.VERIFICATION_CODE_SEND_FAILED)
-            verification_code.set_code(code)
-        return compose_response(message="验证码已发送")
+        status = sms_service.get_status(args['job_id'])
+        if status is None:
+            st_raise_error(ErrorCode.SMS_JOB_NOT_EXIST)
+        if status['status'] == sms_service.JobStatus.Dead:
+            st_raise_error(ErrorCode.VERIFICATION_CODE_SEND_FAILED)
+        return compose_response(result={'status': status['status']})
 
 
 class Login(Resource):
@@ -5,6 +5,8 @@ import logging
 
 import oss2
 
+from colleague import metrics
+
 def upload_file(path, file_stream):
     key = os.getenv("OSS_KEY")
     sec = os.getenv("OSS_SEC")
@@ -13,7 +15,8 @@ def upload_file(path, file_stream):
     auth = oss2.Auth(key, sec)
     bucket = oss2.Bucket(auth, endpoint, bucket_name)
     try:
-        result = bucket.put_object(path, file_stream,headers={"Content-Type":'image/png'})
+        with metrics.outbound('oss'):
+            result = bucket.put_object(path, file_stream,headers={"Content-Type":'image/png'})
         return result.status == 200, result.request_id
     except Exception, e:
         logging.error(str(e))
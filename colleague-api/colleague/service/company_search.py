@@ -0,0 +1,186 @@
+# -*- coding:utf-8 -*-
+
+"""
+Company search behind /search/company, the backend is picked by
+`COMPANY_SEARCH_BACKEND`:
+
+- 'ngram': an in-process inverted index of the name and alias bigrams,
+  loaded when the worker starts (`post_fork` in gunicorn.conf.py, the first
+  search without it), refreshed when this worker adds a company and every
+  `COMPANY_SEARCH_REFRESH_INTERVAL` seconds for the companies added by the
+  other workers.
+- 'trgm': `Organization.similar`, pg_trgm with the gin indexes in change.sql.
+- 'like': the original `name LIKE '%keyword%'`.
+
+Both fuzzy backends rank by prefix match, then similarity, then verified.
+"""
+
+import threading
+import time
+from collections import defaultdict
+
+from colleague.config import settings
+from colleague.models.work import Organization
+
+# Count of rows per query when loading the index
+LOAD_BATCH_SIZE = 1000
+# The refreshes read again the last ids loaded, the ids are taken when the
+# companies are inserted, a lower one can be committed after a higher one
+LOAD_OVERLAP = 100
+
+
+def _grams(text):
+    """
+    Bigrams of the lower cased text padded with a space on both sides, so a
+    single character has grams and a prefix shares the leading gram
+    """
+    text = u" {} ".format(text.lower())
+    return set(text[i:i + 2] for i in range(len(text) - 1))
+
+
+class NgramIndex(object):
+    """
+    Inverted index from bigrams to (company id, field), field 0 is the name
+    and 1 the alias. The similarity is pg_trgm's: shared grams / all grams.
+    `loaded_id` is the cursor of `_load`, adding a company doesn't move it.
+    """
+
+    def __init__(self, similarity=0.3):
+        self.similarity = similarity
+        self.loaded_id = 0
+        self._docs = {}
+        self._postings = defaultdict(set)
+        self._sizes = {}
+        self._lock = threading.Lock()
+
+    def add(self, id, name, alias=None, verified=False):
+        with self._lock:
+            self._remove(id)
+            fields = (name or u"", alias or u"")
+            self._docs[id] = (fields[0].lower(), fields[1].lower(), bool(verified))
+            for field, text in enumerate(fields):
+                if not text:
+                    continue
+                grams = _grams(text)
+                self._sizes[(id, field)] = len(grams)
+                for gram in grams:
+                    self._postings[gram].add((id, field))
+
+    def remove(self, id):
+        with self._lock:
+            self._remove(id)
+
+    def _remove(self, id):
+        doc = self._docs.pop(id, None)
+        if doc is None:
+            return
+        for field, text in enumerate(doc[:2]):
+            if not text:
+                continue
+            self._sizes.pop((id, field), None)
+            for gram in _grams(text):
+                postings = self._postings.get(gram)
+                if postings is not None:
+                    postings.discard((id, field))
+                    if not postings:
+                        del self._postings[gram]
+
+    def search(self, keyword, count):
+        """
+        :return: Ids of the best `count` companies
+        """
+        keyword = keyword.lower()
+        grams = _grams(keyword)
+        with self._lock:
+            shared = defaultdict(int)
+            for gram in grams:
+                for key in self._postings.get(gram, ()):
+                    shared[key] += 1
+            scores = {}
+            for key, cnt in shared.iteritems():
+                similarity = float(cnt) / (len(grams) + self._sizes[key] - cnt)
+                id = key[0]
+                if similarity > scores.get(id, -1):
+                    scores[id] = similarity
+            ranked = []
+            for id, similarity in scores.iteritems():
+                name, alias, verified = self._docs[id]
+                if similarity < self.similarity and keyword not in name and keyword not in alias:
+                    continue
+                is_prefix = name.startswith(keyword) or alias.startswith(keyword)
+                ranked.append((not is_prefix, -similarity, not verified, id))
+        ranked.sort()
+        return [_[-1] for _ in ranked[:count]]
+
+    def __len__(self):
+        return len(self._docs)
+
+
+_index = None
+_index_lock = threading.Lock()
+_refreshed_at = 0
+
+
+def load_index():
+    """
+    Load the index of the worker if the backend is 'ngram', call it in an
+    app context before the first search
+    """
+    global _index, _refreshed_at
+    if settings['COMPANY_SEARCH_BACKEND'] != 'ngram':
+        return
+    with _index_lock:
+        if _index is None:
+            index = NgramIndex(settings['COMPANY_SEARCH_SIMILARITY'])
+            _load(index)
+            _refreshed_at = time.time()
+            _index = index
+
+
+def _get_index():
+    global _refreshed_at
+    if _index is None:
+        load_index()
+    elif time.time() - _refreshed_at > settings['COMPANY_SEARCH_REFRESH_INTERVAL']:
+        _refreshed_at = time.time()
+        _load(_index)
+    return _index
+
+
+def _load(index):
+    """
+    Add the companies newer than the ones loaded before. The companies
+    edited in the db are updated when the workers restart.
+    """
+    last_id = max(index.loaded_id - LOAD_OVERLAP, 0)
+    while True:
+        companies = Organization.find_after(last_id, LOAD_BATCH_SIZE)
+        for company in companies:
+            index.add(company.id, company.name, company.alias, company.verified)
+        if companies:
+            last_id = companies[-1].id
+            index.loaded_id = max(index.loaded_id, last_id)
+        if len(companies) < LOAD_BATCH_SIZE:
+            break
+
+
+def on_company_added(company):
+    """
+    Called after a company is inserted, only the index of this worker is
+    updated, the others pick it up with their next refresh. The load cursor
+    isn't moved, a company with a lower id could still be uncommitted.
+    """
+    if _index is not None:
+        _index.add(company.id, company.name, company.alias, company.verified)
+
+
+def search(keyword, count):
+    """
+    :return: [Organization]
+    """
+    backend = settings['COMPANY_SEARCH_BACKEND']
+    if backend == 'ngram':
+        return Organization.find_by_ids(_get_index().search(keyword, count))
+    elif backend == 'trgm':
+        return Organization.similar(keyword, count, settings['COMPANY_SEARCH_SIMILARITY'])
+    return Organization.like(keyword, count)
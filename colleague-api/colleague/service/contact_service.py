@@ -2,39 +2,43 @@
 
 import arrow
 
-from colleague.extensions import db
-from colleague.models.contact import (ContactRequest, ContactRequestStatus, Contact)
+from colleague import unit_of_work
+from colleague.models.contact import (ContactRequest, ContactRequestStatus, Contact,
+                                      ContactEdge)
 from colleague.models.endorsement import Endorsement
 from colleague.models.user import User
 from colleague.utils import (list_to_dict, encode_id, datetime_to_timestamp,
-                             timestamp_to_str)
-from colleague.service import rc_service
+                             timestamp_to_datetime, datetime_to_microseconds,
+                             microseconds_to_datetime)
+from colleague.service import notification_service, timeline_service
 
 
-def get_contacts(uid, last_update_date, size):
-    contacts = Contact.find_by_cursor(uid, last_update_date, size)
+def get_contacts(uid, cursor, size):
+    """
+    :param uid: Whose contacts
+    :param cursor: Decoded cursor, "<updated_at microseconds>_<edge id>" or
+    the float timestamp issued by the old api
+    :param size: records count
+    """
+    last_update_date, last_id = _parse_contacts_cursor(cursor)
+    edges = ContactEdge.find_by_cursor(uid, last_update_date, last_id, size)
     next_cursor = None
     has_more = False
-    if len(contacts) == size:
+    if len(edges) == size:
         has_more = True
-        update_timestamp = datetime_to_timestamp(contacts[-1].updated_at)
-        next_cursor = encode_id(timestamp_to_str(update_timestamp))
-    uids = set()
-    for contact in contacts:
-        uids.add(contact.uidA)
-        uids.add(contact.uidB)
-    users = User.find_by_ids(uids)
+        next_cursor = encode_id("{}_{}".format(datetime_to_microseconds(edges[-1].updated_at),
+                                               edges[-1].id))
+    users = User.find_by_ids(set(edge.contact_uid for edge in edges))
     dict_users = list_to_dict(users, "id")
     json_contacts = []
-    for contact in contacts:
-        cuid = contact.uidB if contact.uidA == uid else contact.uidA
-        user = dict_users.get(cuid)
+    for edge in edges:
+        user = dict_users.get(edge.contact_uid)
         if user:
             json_contacts.append({
-                'id': encode_id(contact.id),
+                'id': encode_id(edge.contact_id),
                 'user': user.to_dict(),
-                'type': contact.type,
-                'update_at': datetime_to_timestamp(contact.updated_at)
+                'type': edge.type,
+                'update_at': datetime_to_timestamp(edge.updated_at)
             })
     return {
         "has_more": has_more,
@@ -43,6 +47,15 @@ def get_contacts(uid, last_update_date, size):
     }
 
 
+def _parse_contacts_cursor(cursor):
+    if not cursor:
+        return None, None
+    if '_' not in cursor:
+        return timestamp_to_datetime(float(cursor)), None
+    microseconds, last_id = cursor.split('_', 1)
+    return microseconds_to_datetime(microseconds), int(last_id)
+
+
 def get_contact_requests(uid, last_request_id, size):
     requests = ContactRequest.find_by_cursor(uid, last_request_id, size)
     _set_user_for_requests(requests)
@@ -65,19 +78,21 @@ def accept_contact_request(id, uid, accept):
     if request and request.status == ContactRequestStatus.Pending:
         request.status = ContactRequestStatus.Accepted if accept else ContactRequestStatus.Rejected
         request.end_at = arrow.utcnow().naive
-        db.session.commit()
+        unit_of_work.commit()
         if accept:
             result = Contact.add(request.uidA, request.uidB, request.type)
             _set_user_for_requests([request])
             if result:
+                # both timelines miss the feeds of the new contact
+                unit_of_work.after_commit(timeline_service.invalidate, request.uidA, request.uidB)
                 # Update the endorsement total contacts
                 Endorsement.update_total_contacts_count(request.uidA, 1)
                 Endorsement.update_total_contacts_count(request.uidB, 1)
                 message = "已成为联系人"
                 uidA = encode_id(request.uidA)
                 uidB = encode_id(request.uidB)
-                rc_service.send_private_notification(uidA, uidB, message)
-                rc_service.send_private_notification(uidB, uidA, message)
+                notification_service.send_private_notification(uidA, uidB, message)
+                notification_service.send_private_notification(uidB, uidA, message)
             return request.to_dict()
 
 
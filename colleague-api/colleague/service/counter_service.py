@@ -0,0 +1,50 @@
+# -*- coding:utf-8 -*-
+
+"""
+Recompute the counters maintained by `colleague.models.counter.incr` from the
+rows they count.
+"""
+
+from colleague.extensions import db
+from colleague.models.contact import Contact, ContactStatus
+from colleague.models.endorsement import (Endorsement, EndorseStatus, EndorseType,
+                                          UserEndorse)
+from colleague.models.feed import Feed, FeedLike, FeedLikeStatus
+
+
+def _reconcile(model, column, truth):
+    """
+    Set `column` to `truth` (a correlated count) where they differ
+    :return: Count of fixed rows
+    """
+    truth = truth.correlate(model).as_scalar()
+    return model.query.filter(column != truth) \
+        .update({column: truth}, synchronize_session=False)
+
+
+def reconcile_all():
+    """
+    Recompute every counter from the feed_like/user_endorse/contact rows
+    :return: {counter: count of fixed rows}
+    """
+    fixed = {}
+    fixed['feed.like_count'] = _reconcile(
+            Feed, Feed.like_count,
+            db.session.query(db.func.count(FeedLike.id))
+                .filter(FeedLike.feed_id == Feed.id,
+                        FeedLike.status == FeedLikeStatus.Liked))
+    for attr, type in (('niubility', EndorseType.Niubility),
+                       ('reliability', EndorseType.Reliability)):
+        fixed['endorsement.' + attr] = _reconcile(
+                Endorsement, getattr(Endorsement, attr),
+                db.session.query(db.func.count(UserEndorse.id))
+                    .filter(UserEndorse.uid == Endorsement.uid,
+                            UserEndorse.type == type,
+                            UserEndorse.status == EndorseStatus.Supported))
+    fixed['endorsement.total_contacts'] = _reconcile(
+            Endorsement, Endorsement.total_contacts,
+            db.session.query(db.func.count(Contact.id))
+                .filter((Contact.uidA == Endorsement.uid) | (Contact.uidB == Endorsement.uid),
+                        Contact.status == ContactStatus.Connected))
+    db.session.commit()
+    return fixed
@@ -1,6 +1,6 @@
 # -*- coding:utf-8 -*-
 
-from colleague.models.endorsement import UserEndorse, EndorseType, Endorsement, EndorseComment
+from colleague.models.endorsement import UserEndorse, EndorseType, EndorseComment
 from colleague.utils import (st_raise_error, ErrorCode, encode_id)
 from . import cursor_data
 
@@ -37,24 +37,3 @@ def get_endorse_comments(uid, latest_id, size=20):
     json_comments = [item.to_dict() for item in comments]
     return cursor_data(has_more, next_cursor, 'comments', json_comments)
 
-
-def get_user_endorsement(uid, from_uid):
-    """
-    Get the overall endorsement state
-    :param uid: Target uid
-    :param from_uid: Who endorse the target user
-    :return: Overall endorsement state
-    """
-    endorsement = Endorsement.find_by_uid(uid)
-    if endorsement:
-        json_endorsement = endorsement.to_dict()
-        endorse_comment = EndorseComment.find_by_from_uid(uid, from_uid)
-        if endorse_comment:
-            json_endorsement['comment'] = endorse_comment.text
-        endorse_niubility = UserEndorse.find_by_from_uid(uid, from_uid, EndorseType.Niubility)
-        if endorse_niubility:
-            json_endorsement['is_niubility'] = True
-        endorse_reliability = UserEndorse.find_by_from_uid(uid, from_uid, EndorseType.Reliability)
-        if endorse_reliability:
-            json_endorsement['is_reliability'] = True
-        return json_endorsement
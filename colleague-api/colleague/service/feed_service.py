@@ -1,42 +1,56 @@
 # -*- coding:utf-8 -*-
 
-from colleague.models.feed import Feed, FeedLike, FeedLikeStatus
+from colleague.models.feed import Feed, FeedLike
 from colleague.models.meida import Image
-from colleague.utils import encode_id
+from colleague.service import timeline_service
+from colleague.utils import encode_id, list_to_dict
 
 
 def get_feeds(uid, last_id, size):
-    feeds = Feed.find_by_cursor(last_id, size)
+    """
+    A page of the user's timeline, @see timeline_service
+    """
+    ids = timeline_service.get_feed_ids(uid, last_id, size)
+    feeds = Feed.find_by_ids(ids)
     has_more = False
     next_cursor = None
-    if len(feeds) == size:
+    if len(ids) == size:
         has_more = True
-        next_cursor = encode_id(feeds[-1].id)
-    dict_feeds = []
-    for feed in feeds:
-        feed_like = FeedLike.find_by_uid(uid, feed.id)
-        liked = (feed_like is not None and feed_like.status == FeedLikeStatus.Liked)
-        dict_feed = feed.to_dict()
-        dict_feed['liked'] = liked
-        if feed.images:
-            images = [image.to_dict() for image in Image.find_by_ids(feed.images)]
-            dict_feed['images'] = images
-        dict_feeds.append(dict_feed)
+        next_cursor = encode_id(ids[-1])
     return {
         "has_more": has_more,
         "next_cursor": next_cursor,
-        "feeds": dict_feeds
+        "feeds": _hydrate_feeds(uid, feeds)
     }
 
 
 def get_feed(uid, id):
     feed = Feed.find(id)
     if feed:
-        feed_like = FeedLike.find_by_uid(uid, feed.id)
-        liked = (feed_like is not None and feed_like.status == FeedLikeStatus.Liked)
+        return _hydrate_feeds(uid, [feed])[0]
+
+
+def _hydrate_feeds(uid, feeds):
+    """
+    Build the feed dicts of a page with one query for the likes and one for
+    the images, whatever the page size is. The authors are loaded along
+    with the feeds, @see Feed.find_by_ids
+    :param uid: The viewer
+    :param feeds: [Feed]
+    :return: [dict]
+    """
+    liked_ids = FeedLike.find_liked_feed_ids(uid, [feed.id for feed in feeds])
+    image_ids = set()
+    for feed in feeds:
+        if feed.images:
+            image_ids.update(feed.images)
+    dict_images = list_to_dict(Image.find_by_ids(list(image_ids)), "id") if image_ids else {}
+    dict_feeds = []
+    for feed in feeds:
         dict_feed = feed.to_dict()
-        dict_feed['liked'] = liked
+        dict_feed['liked'] = feed.id in liked_ids
         if feed.images:
-            images = [image.to_dict() for image in Image.find_by_ids(feed.images)]
-            dict_feed['images'] = images
-        return dict_feed
+            dict_feed['images'] = [dict_images[id].to_dict() for id in feed.images
+                                   if id in dict_images]
+        dict_feeds.append(dict_feed)
+    return dict_feeds
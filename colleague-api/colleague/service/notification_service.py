@@ -0,0 +1,98 @@
+# -*- coding:utf-8 -*-
+
+"""
+RongCloud notifications go through an outbox.
+
+Handlers call `send_system_notification`/`send_private_notification`, which
+only add a `Notification` row in the current transaction. The dispatcher
+(`python manage.py dispatch_notifications`, a separate process) claims the
+pending rows, sends the ones sharing sender and content in one RongCloud
+call and retries the failed ones with an exponential backoff.
+"""
+
+import logging
+import time
+from collections import OrderedDict
+
+from colleague import unit_of_work
+from colleague.config import settings
+from colleague.extensions import db
+from colleague.models.notification import Notification, NotificationType
+from colleague.service import rc_service
+
+# RongCloud accepts at most 100 `toUserId` per publish
+MAX_RECIPIENTS = 100
+
+logger = logging.getLogger(__name__)
+
+
+def send_system_notification(from_uid, to_uid, message):
+    Notification.add(NotificationType.System, from_uid, to_uid, message)
+    unit_of_work.commit()
+
+
+def send_private_notification(from_uid, to_uid, message, extra='new_contact'):
+    Notification.add(NotificationType.Private, from_uid, to_uid, message, extra)
+    unit_of_work.commit()
+
+
+def dispatch_once(size=None):
+    """
+    Deliver one batch of due notifications
+    :param size: Max count of notifications
+    :return: Count of the claimed notifications
+    """
+    notifications = Notification.claim_pending(size or settings['NOTIFICATION_BATCH_SIZE'])
+    for group in _group(notifications):
+        first = group[0]
+        to_uids = [_.to_uid for _ in group]
+        error = None
+        try:
+            if first.type == NotificationType.System:
+                ok = rc_service.publish_system(first.from_uid, to_uids, first.message)
+            else:
+                ok = rc_service.publish_private(first.from_uid, to_uids, first.message, first.extra)
+            if not ok:
+                error = "rejected by RongCloud"
+        except Exception as e:
+            error = str(e)
+        for notification in group:
+            if error is None:
+                notification.sent()
+            else:
+                notification.failed(error, _retry_after(notification.attempts),
+                                    settings['NOTIFICATION_MAX_ATTEMPTS'])
+        if error is not None:
+            logger.warning("Failed to send %d notifications: %s", len(group), error)
+    db.session.commit()
+    return len(notifications)
+
+
+def run_dispatcher():
+    """
+    Dispatch forever, sleep when there is nothing to send
+    """
+    while True:
+        try:
+            count = dispatch_once()
+        except Exception as e:
+            logger.exception(e)
+            db.session.rollback()
+            count = 0
+        if count == 0:
+            time.sleep(settings['NOTIFICATION_POLL_INTERVAL'])
+
+
+def _group(notifications):
+    groups = OrderedDict()
+    for notification in notifications:
+        key = (notification.type, notification.from_uid, notification.message, notification.extra)
+        groups.setdefault(key, []).append(notification)
+    for group in groups.itervalues():
+        for i in range(0, len(group), MAX_RECIPIENTS):
+            yield group[i:i + MAX_RECIPIENTS]
+
+
+def _retry_after(attempts):
+    return min(settings['NOTIFICATION_RETRY_BASE'] * 2 ** attempts,
+               settings['NOTIFICATION_RETRY_MAX'])
@@ -2,43 +2,83 @@
 
 import requests
 import hashlib
+import logging
 import time
 import os
 import json
+import uuid
+
+from colleague import metrics
+from colleague.config import settings
+from colleague.extensions import redis_conn
+from colleague.redis_scripts import scripts
 from colleague.utils import encode_id
-from rongcloud import RongCloud
+
+RC_TOKEN_KEY = "rc_token:{}"
+RC_TOKEN_LOCK_KEY = "rc_token_lock:{}"
 
 
 def get_rc_token(user):
+    """
+    The token is cached in redis. When it's missed by concurrent requests,
+    only the one holding the lock calls RongCloud, the others wait for it.
+    """
+    key = RC_TOKEN_KEY.format(user.id)
+    token = redis_conn.get(key)
+    if token:
+        return token
+    lock_key = RC_TOKEN_LOCK_KEY.format(user.id)
+    wait = settings['RC_TOKEN_LOCK_TIMEOUT']
+    lock_token = uuid.uuid4().hex
+    locked = redis_conn.set(lock_key, lock_token, nx=True, ex=wait)
+    if not locked:
+        deadline = time.time() + wait
+        while time.time() < deadline:
+            time.sleep(0.05)
+            token = redis_conn.get(key)
+            if token:
+                return token
+            if not redis_conn.exists(lock_key):
+                # the holder failed
+                break
+        # fetch it ourselves
+    try:
+        token = _fetch_rc_token(user)
+        if token:
+            redis_conn.set(key, token, ex=settings['RC_TOKEN_TTL'])
+        return token
+    finally:
+        if locked:
+            scripts.run('release_lock', [lock_key], [lock_token])
+
+
+def _fetch_rc_token(user):
     body = {
         'userId': encode_id(user.id),
         'name': user.user_name,
         'portraitUri': "http://39.107.239.252/2018/avatar/England-round.png"
     }
-    app_key = os.getenv("RONG_KEY")
-    app_sec = os.getenv("RONG_SEC")
-    timestamp = int(time.time() * 1000)
-    nonce = hashlib.md5(str(time.time())).hexdigest()
-    v = "{}{}{}".format(app_sec, nonce, timestamp)
-    sig = hashlib.sha1(v).hexdigest()
-    headers = {
-        'App-Key': app_key,
-        'Timestamp': str(timestamp),
-        "Nonce": nonce,
-        "Signature": sig
-    }
-    resp = requests.post('https://api.cn.ronghub.com/user/getToken.json',
-                         data=body, headers=headers)
-    print resp.text
-    if resp.status_code == 200:
-        return json.loads(resp.text)["token"]
-    else:
-        return None
+    resp = _post('/user/getToken.json', body)
+    try:
+        result = resp.json() if resp.status_code == 200 else {}
+    except ValueError:
+        result = {}
+    # the body has the token, don't log it
+    logging.info("getToken of %s: status %s, code %s", user.id, resp.status_code, result.get('code'))
+    # RongCloud answers some errors with 200 and an error code
+    if result.get('code') == 200:
+        return result.get('token')
+    return None
 
 
 def refresh_user_info(user):
-    rc = RongCloud(app_key=os.getenv("RONG_KEY"), app_secret=os.getenv("RONG_SEC"))
-    rc.User.refresh(encode_id(user.id), user.user_name, user.avatar_url)
+    _post('/user/refresh.json', {
+        'userId': encode_id(user.id),
+        'name': user.user_name,
+        'portraitUri': user.avatar_url
+    })
+    # the next token is issued with the new name and avatar
+    redis_conn.delete(RC_TOKEN_KEY.format(user.id))
 
 
 """
@@ -58,29 +98,59 @@ class RCSystemUser(object):
     T100005 = "100005"
 
 
-def send_system_notification(from_uid, to_uid, message):
-    rc = RongCloud(app_key=os.getenv("RONG_KEY"), app_secret=os.getenv("RONG_SEC"))
-    r = rc.Message.PublishSystem(
-            fromUserId=from_uid,
-            toUserId={to_uid},
-            objectName='RC:TxtMsg',
-            content=json.dumps({'content': message}),
-            pushContent=message,
-            pushData=json.dumps({'pushData': message}),
-            isPersisted='0',
-            isCounted='0')
-    print r.status
-
-
-def send_private_notification(from_uid, to_uid, message):
-    rc = RongCloud(app_key=os.getenv("RONG_KEY"), app_secret=os.getenv("RONG_SEC"))
-    r = rc.Message.publishPrivate(
-            fromUserId=from_uid,
-            toUserId={to_uid},
-            objectName='RC:TxtMsg',
-            content=json.dumps({'content': message, 'extra': 'new_contact'}),
-            pushContent=message,
-            pushData=json.dumps({'pushData': message}),
-            isPersisted='0',
-            isCounted='0')
-    print r.status
+def publish_system(from_uid, to_uids, message):
+    """
+    Send a system message to at most 100 users in one call
+    :return: True if RongCloud accepted it
+    """
+    return _publish('/message/system/publish.json', from_uid, to_uids,
+                    {'content': message}, message)
+
+
+def publish_private(from_uid, to_uids, message, extra=None):
+    """
+    Send a private message to at most 100 users in one call
+    :return: True if RongCloud accepted it
+    """
+    content = {'content': message}
+    if extra:
+        content['extra'] = extra
+    return _publish('/message/private/publish.json', from_uid, to_uids, content, message)
+
+
+def _publish(path, from_uid, to_uids, content, message):
+    body = {
+        'fromUserId': from_uid,
+        'toUserId': list(to_uids),
+        'objectName': 'RC:TxtMsg',
+        'content': json.dumps(content),
+        'pushContent': message,
+        'pushData': json.dumps({'pushData': message}),
+        'isPersisted': '0',
+        'isCounted': '0'
+    }
+    resp = _post(path, body)
+    return resp.status_code == 200 and resp.json().get('code') == 200
+
+
+# Connections to RongCloud are kept alive and reused
+_session = requests.Session()
+
+
+def _post(path, body):
+    app_key = os.getenv("RONG_KEY")
+    app_sec = os.getenv("RONG_SEC")
+    timestamp = int(time.time() * 1000)
+    nonce = hashlib.md5(str(time.time())).hexdigest()
+    v = "{}{}{}".format(app_sec, nonce, timestamp)
+    sig = hashlib.sha1(v).hexdigest()
+    headers = {
+        'App-Key': app_key,
+        'Timestamp': str(timestamp),
+        "Nonce": nonce,
+        "Signature": sig
+    }
+    api_host = os.getenv("RONG_API_HOST", "https://api.cn.ronghub.com")
+    with metrics.outbound('rongcloud'):
+        return _session.post(api_host + path, data=body, headers=headers,
+                             timeout=float(os.getenv("RONG_TIMEOUT", 5)))
@@ -0,0 +1,107 @@
+# -*- coding:utf-8 -*-
+
+import arrow
+
+from colleague.cache import user_session_cache
+from colleague.models.user import User, UserStatus
+from colleague.utils import encode_id
+
+
+class SessionUser(object):
+    """
+    The login user rebuilt from the cached session record.
+    It answers the fields every request needs without touching the db, any
+    other attribute (e.g. `update_user`, `logout`) loads the `User` row on
+    first access and is delegated to it.
+    """
+
+    FIELDS = ("id", "mobile", "status", "device_id", "user_name", "gender",
+              "colleague_id", "title", "company_id")
+
+    def __init__(self, record):
+        self.record = record
+        self._user = None
+
+    def __getattr__(self, name):
+        if name in SessionUser.FIELDS:
+            return self.record.get(name)
+        if self._user is None:
+            self._user = User.find(self.record['id'])
+        return getattr(self._user, name)
+
+    @property
+    def avatar_url(self):
+        return self.record['avatar_url']
+
+    def is_available(self):
+        return self.status not in [UserStatus.Blocked, UserStatus.Deleted]
+
+    def is_logged_out(self):
+        return self.status == UserStatus.Logout
+
+    def verify_token_metadata(self, metadata, device_id):
+        expected = {
+            'user_id': encode_id(self.id),
+            'device_id': device_id,
+            'timestamp': self.record['login_timestamp']
+        }
+        return metadata == expected
+
+    def to_dict_with_mobile(self):
+        d = self.to_dict()
+        d['mobile'] = self.mobile
+        return d
+
+    def to_dict(self):
+        return dict(self.record['profile'])
+
+
+def _build_record(user, device_id):
+    return {
+        "id": user.id,
+        "mobile": user.mobile,
+        "status": user.status,
+        "device_id": device_id,
+        "login_timestamp": arrow.get(user.last_login_at).timestamp,
+        "user_name": user.user_name,
+        "gender": user.gender,
+        "colleague_id": user.colleague_id,
+        "title": user.title,
+        "company_id": user.company_id,
+        "avatar_url": user.avatar_url,
+        "profile": user.to_dict()
+    }
+
+
+def _is_valid(user, identity, device_id):
+    return not user.is_logged_out() \
+           and user.is_available() \
+           and user.verify_token_metadata(identity, device_id)
+
+
+def load_user(uid, identity, device_id):
+    """
+    Load the login user for a jwt identity, the db is only queried when the
+    session record is missed.
+    :param uid: User id decoded from the identity
+    :param identity: The jwt identity
+    :param device_id: The device id in the identity
+    :return: SessionUser or None if the token is no longer valid
+    """
+    record, version = user_session_cache.get(uid)
+    if record is not None and not _is_valid(SessionUser(record), identity, device_id):
+        # The LRU may be behind a login handled by another worker,
+        # redis is always invalidated so check it before rejecting
+        record, version = user_session_cache.get(uid, local=False)
+    if record is None:
+        # the version is read before the row, a logout committed meanwhile
+        # bumps it and the record set below is ignored
+        user = User.find(uid)
+        if user is None:
+            return None
+        record = _build_record(user, device_id)
+        user_session_cache.set(uid, version, record)
+    session_user = SessionUser(record)
+    if not _is_valid(session_user, identity, device_id):
+        return None
+    return session_user
@@ -0,0 +1,271 @@
+# -*- coding:utf-8 -*-
+
+"""
+Verification code messages go through a redis queue.
+
+`send_code` records the code and enqueues a job in one redis script call
+and returns the job id at once, the api never waits for the provider. The
+dispatcher (`python manage.py dispatch_sms`, a separate process) runs a pool
+of workers delivering the jobs, at most `SMS_PROVIDER_CONCURRENCY` at a time
+per provider. A job taken from the queue stays in the processing list until
+it's sent, scheduled for a retry or dead lettered, the ones left there by a
+crashed dispatcher are queued again after `SMS_PROCESSING_TIMEOUT` seconds.
+Failed jobs are retried with an exponential backoff, the ones failing
+`SMS_MAX_ATTEMPTS` times are moved to the dead letter list without their
+code, it keeps the latest `SMS_DEAD_LETTER_SIZE` for `SMS_JOB_TTL` seconds.
+The status of a job is kept for `SMS_JOB_TTL` seconds, @see `get_status`.
+"""
+
+import json
+import logging
+import threading
+import time
+import uuid
+
+from colleague import metrics
+from colleague.config import settings
+from colleague.extensions import redis_conn
+from colleague.utils import VerificationCode
+
+QUEUE_KEY = "sms_queue"
+# jobs being delivered, and when each was taken
+PROCESSING_KEY = "sms_processing"
+PROCESSING_SINCE_KEY = "sms_processing_since"
+# zset of the jobs waiting for a retry, scored by the due time
+RETRY_KEY = "sms_retry"
+DEAD_LETTER_KEY = "sms_dead_letter"
+JOB_KEY = "sms_job:{}"
+
+logger = logging.getLogger(__name__)
+
+
+class JobStatus(object):
+    Queued = 'queued'
+    Sending = 'sending'
+    Retrying = 'retrying'
+    Sent = 'sent'
+    # Gave up after too many attempts
+    Dead = 'dead'
+
+
+class AliyunSmsProvider(object):
+    name = 'aliyun'
+
+    def send(self, mobile, code):
+        # the sdk client is built when the module is imported
+        from colleague.service.aliyun.aliyun_sms_service import send_sms_code
+        with metrics.outbound('sms'):
+            return send_sms_code(mobile, code)
+
+
+class FakeSmsProvider(object):
+    """
+    Keeps the messages instead of sending them, for dev and tests.
+    The next `failures` sends fail.
+    """
+    name = 'fake'
+
+    def __init__(self):
+        self.sent = []
+        self.failures = 0
+
+    def send(self, mobile, code):
+        if self.failures > 0:
+            self.failures -= 1
+            return False
+        self.sent.append((mobile, code))
+        return True
+
+
+_providers = {
+    AliyunSmsProvider.name: AliyunSmsProvider(),
+    FakeSmsProvider.name: FakeSmsProvider()
+}
+
+
+def get_provider(name=None):
+    return _providers[name or settings['SMS_PROVIDER']]
+
+
+def send_code(mobile, code, device_id=None):
+    """
+    Issue the code and enqueue the job atomically, @see VerificationCode.issue
+    :param mobile: Mobile
+    :param code: Verification code
+    :param device_id: Requesting device
+    :return: Job id, None if the mobile or device asked for too many codes
+    """
+    job = {
+        'id': uuid.uuid4().hex,
+        'mobile': mobile,
+        'code': code,
+        'provider': settings['SMS_PROVIDER'],
+        'attempts': 0
+    }
+    issued = VerificationCode(mobile).issue(code, device_id,
+                                            job=(QUEUE_KEY, json.dumps(job),
+                                                 JOB_KEY.format(job['id']),
+                                                 _dump_status(job, JobStatus.Queued),
+                                                 settings['SMS_JOB_TTL']))
+    return job['id'] if issued else None
+
+
+def get_status(job_id):
+    """
+    :return: {'status', 'attempts', 'error'} or None if the job is unknown
+    """
+    raw = redis_conn.get(JOB_KEY.format(job_id))
+    return json.loads(raw) if raw is not None else None
+
+
+def _dump_status(job, status):
+    return json.dumps({'status': status,
+                       'attempts': job['attempts'],
+                       'error': job.get('error')})
+
+
+def _set_status(redis, job, status):
+    redis.set(JOB_KEY.format(job['id']), _dump_status(job, status),
+              ex=settings['SMS_JOB_TTL'])
+
+
+def _retry_after(attempts):
+    return min(settings['SMS_RETRY_BASE'] * 2 ** (attempts - 1),
+               settings['SMS_RETRY_MAX'])
+
+
+class SmsDispatcher(object):
+    def __init__(self, redis, workers):
+        self.redis = redis
+        self.workers = workers
+        self._stopped = threading.Event()
+        self._limits = {}
+        self._limits_lock = threading.Lock()
+
+    def run(self):
+        """
+        Start the workers and move the due retries back to the queue until
+        `stop` is called
+        """
+        threads = [threading.Thread(target=self._work) for _ in range(self.workers)]
+        for thread in threads:
+            thread.daemon = True
+            thread.start()
+        while not self._stopped.is_set():
+            try:
+                self.requeue_due()
+                self.requeue_stuck()
+            except Exception as e:
+                logger.exception(e)
+            self._stopped.wait(1)
+        for thread in threads:
+            thread.join()
+
+    def stop(self):
+        self._stopped.set()
+
+    def _work(self):
+        while not self._stopped.is_set():
+            try:
+                raw = self.take()
+                if raw is not None:
+                    self.deliver(json.loads(raw), raw)
+            except Exception as e:
+                logger.exception(e)
+                self._stopped.wait(1)
+
+    def _limit(self, provider):
+        with self._limits_lock:
+            if provider not in self._limits:
+                limit = settings['SMS_PROVIDER_CONCURRENCY'].get(provider, 1)
+                self._limits[provider] = threading.BoundedSemaphore(limit)
+            return self._limits[provider]
+
+    def take(self):
+        """
+        Move the next job to the processing list
+        :return: The raw job, None if the queue stayed empty
+        """
+        raw = self.redis.brpoplpush(QUEUE_KEY, PROCESSING_KEY, timeout=1)
+        if raw is not None:
+            self.redis.hset(PROCESSING_SINCE_KEY, raw, time.time())
+        return raw
+
+    def deliver(self, job, raw=None):
+        """
+        Send one job, schedule a retry or dead letter it on failure
+        :param raw: The job in the processing list, removed along with the
+        outcome
+        :return: True if it's sent
+        """
+        _set_status(self.redis, job, JobStatus.Sending)
+        error = None
+        with self._limit(job['provider']):
+            try:
+                if not get_provider(job['provider']).send(job['mobile'], job['code']):
+                    error = "rejected by the provider"
+            except Exception as e:
+                error = str(e)
+        job['attempts'] += 1
+        job['error'] = error
+        pipe = self.redis.pipeline()
+        if raw is not None:
+            pipe.lrem(PROCESSING_KEY, 1, raw)
+            pipe.hdel(PROCESSING_SINCE_KEY, raw)
+        if error is None:
+            _set_status(pipe, job, JobStatus.Sent)
+        elif job['attempts'] >= settings['SMS_MAX_ATTEMPTS']:
+            logger.error("Gave up the sms job %s: %s", job['id'], error)
+            dead = dict(job, code=None)
+            pipe.lpush(DEAD_LETTER_KEY, json.dumps(dead))
+            pipe.ltrim(DEAD_LETTER_KEY, 0, settings['SMS_DEAD_LETTER_SIZE'] - 1)
+            pipe.expire(DEAD_LETTER_KEY, settings['SMS_JOB_TTL'])
+            _set_status(pipe, job, JobStatus.Dead)
+        else:
+            logger.warning("Failed to send the sms job %s: %s", job['id'], error)
+            pipe.execute_command('ZADD', RETRY_KEY,
+                                 time.time() + _retry_after(job['attempts']),
+                                 json.dumps(job))
+            _set_status(pipe, job, JobStatus.Retrying)
+        pipe.execute()
+        return error is None
+
+    def requeue_due(self):
+        """
+        Move the jobs due for a retry back to the queue
+        :return: Count of the moved jobs
+        """
+        count = 0
+        for raw in self.redis.zrangebyscore(RETRY_KEY, 0, time.time(), start=0, num=100):
+            # only the dispatcher removing it requeues it
+            if self.redis.zrem(RETRY_KEY, raw):
+                self.redis.lpush(QUEUE_KEY, raw)
+                count += 1
+        return count
+
+    def requeue_stuck(self):
+        """
+        Move the jobs taken more than `SMS_PROCESSING_TIMEOUT` seconds ago
+        back to the queue, their dispatcher crashed while delivering them
+        :return: Count of the moved jobs
+        """
+        count = 0
+        now = time.time()
+        for raw in self.redis.lrange(PROCESSING_KEY, 0, -1):
+            since = self.redis.hget(PROCESSING_SINCE_KEY, raw)
+            if since is None:
+                # taken just now, or the dispatcher crashed before recording it
+                self.redis.hsetnx(PROCESSING_SINCE_KEY, raw, now)
+                continue
+            if now - float(since) < settings['SMS_PROCESSING_TIMEOUT']:
+                continue
+            # only the dispatcher removing it requeues it
+            if self.redis.lrem(PROCESSING_KEY, 1, raw):
+                self.redis.hdel(PROCESSING_SINCE_KEY, raw)
+                self.redis.lpush(QUEUE_KEY, raw)
+                count += 1
+        return count
+
+
+def run_dispatcher(workers=None):
+    SmsDispatcher(redis_conn, workers or settings['SMS_WORKERS']).run()
@@ -0,0 +1,106 @@
+# -*- coding:utf-8 -*-
+
+"""
+Personal feed timelines.
+
+Every user has a redis sorted set of the latest feed ids posted by the user
+and the contacts, scored by the feed id. A new feed is pushed to the
+timelines of the author's contacts (fan-out on write). Timelines are only
+pushed to when they already exist, a missed one is loaded from the db the
+next time it's read.
+
+Authors with more than `TIMELINE_FANOUT_LIMIT` contacts are not pushed,
+they are recorded in a set and their feeds are merged in when reading
+(fan-out on read).
+"""
+
+from colleague.config import settings
+from colleague.extensions import redis_conn
+from colleague.models.contact import ContactEdge
+from colleague.models.feed import Feed
+from colleague.redis_scripts import scripts
+
+TIMELINE_KEY = "timeline:{}"
+HEAVY_AUTHORS_KEY = "timeline:heavy_authors"
+
+# Every loaded timeline has it, so an empty timeline isn't taken as a miss
+_SENTINEL = 0
+
+
+def push(feed):
+    """
+    Fan out a new feed to the timelines of the author and the contacts
+    :param feed: Feed which has been committed
+    """
+    limit = settings['TIMELINE_FANOUT_LIMIT']
+    contact_uids = ContactEdge.find_contact_uids(feed.uid, limit=limit + 1)
+    if len(contact_uids) > limit:
+        redis_conn.sadd(HEAVY_AUTHORS_KEY, feed.uid)
+        uids = [feed.uid]
+    else:
+        redis_conn.srem(HEAVY_AUTHORS_KEY, feed.uid)
+        uids = contact_uids + [feed.uid]
+
+    # checked and pushed in one script, a timeline dropped meanwhile isn't
+    # recreated with only the new feed
+    scripts.run('push_timeline', [TIMELINE_KEY.format(uid) for uid in uids],
+                [settings['TIMELINE_SIZE'], feed.id])
+
+
+def invalidate(*uids):
+    """
+    Drop the timelines, e.g. when the contacts changed
+    """
+    redis_conn.delete(*[TIMELINE_KEY.format(uid) for uid in uids])
+
+
+def get_feed_ids(uid, last_id, size):
+    """
+    :param uid: Whose timeline
+    :param last_id: The last feed id of the previous page
+    :param size: records count
+    :return: [feed id] in descending order
+    """
+    key = TIMELINE_KEY.format(uid)
+    # refresh the ttl and check the existence in one round trip
+    if not redis_conn.expire(key, settings['TIMELINE_TTL']):
+        _load(uid)
+    max_score = "({}".format(last_id) if last_id else "+inf"
+    ids = [int(_) for _ in redis_conn.zrevrangebyscore(key, max_score, "({}".format(_SENTINEL),
+                                                       start=0, num=size)]
+    if len(ids) < size and redis_conn.zcard(key) >= settings['TIMELINE_SIZE']:
+        # the timeline is bounded, older pages are read from the db
+        authors = ContactEdge.find_contact_uids(uid) + [uid]
+        ids = Feed.find_ids_by_uids(authors, last_id, size)
+
+    heavy_authors = [int(_) for _ in redis_conn.smembers(HEAVY_AUTHORS_KEY)]
+    if heavy_authors:
+        heavy_contacts = ContactEdge.find_contact_uids(uid, among=heavy_authors)
+        if heavy_contacts:
+            ids = set(ids) | set(Feed.find_ids_by_uids(heavy_contacts, last_id, size))
+            ids = sorted(ids, reverse=True)[:size]
+    return ids
+
+
+def _load(uid):
+    """
+    The timeline is created with the sentinel before the db is read, so the
+    feeds pushed meanwhile land in it, then the feeds read are added the way
+    they are pushed (dropped if the timeline was invalidated meanwhile)
+    """
+    key = TIMELINE_KEY.format(uid)
+    pipe = redis_conn.pipeline()
+    pipe.execute_command('ZADD', key, _SENTINEL, _SENTINEL)
+    pipe.expire(key, settings['TIMELINE_TTL'])
+    pipe.execute()
+    try:
+        heavy_authors = set(int(_) for _ in redis_conn.smembers(HEAVY_AUTHORS_KEY))
+        authors = [_ for _ in ContactEdge.find_contact_uids(uid) if _ not in heavy_authors]
+        authors.append(uid)
+        ids = Feed.find_ids_by_uids(authors, None, settings['TIMELINE_SIZE'])
+    except Exception:
+        # not left loaded and empty
+        redis_conn.delete(key)
+        raise
+    if ids:
+        scripts.run('push_timeline', [key], [settings['TIMELINE_SIZE']] + ids)
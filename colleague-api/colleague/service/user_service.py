@@ -1,12 +1,12 @@
 # -*- coding:utf-8 -*-
 
-from flask_jwt_extended import current_user
-
-from colleague.models.endorsement import EndorseComment
-from colleague.models.user import User
+from colleague import unit_of_work
+from colleague.cache import profile_cache
+from colleague.extensions import db
 from colleague.models.contact import Contact, ContactStatus
+from colleague.models.endorsement import EndorseComment, EndorseStatus, EndorseType, UserEndorse
+from colleague.models.user import User
 from colleague.service import work_service
-from colleague.service.endorse_service import get_user_endorsement
 from colleague.utils import st_raise_error, ErrorCode
 
 
@@ -18,23 +18,86 @@ def get_user_profile(uid, viewer_uid):
     :param viewer_uid: The viewer's uid.
     :return: Profile
     """
-    user = User.find(uid)
-    if not user:
-        st_raise_error(ErrorCode.USER_NOT_EXIST)
-    work_experiences = work_service.get_work_experiences(uid)
-    endorsement = get_user_endorsement(uid, current_user.user.id)
-    latest_comment = EndorseComment.find_latest_by_uid(uid)
-    profile = user.to_dict()
-    profile['endorsement'] = endorsement
-    profile['work_experiences'] = work_experiences
-    if latest_comment:
-        profile['latest_comment'] = latest_comment.to_dict()
-    contact = Contact.find_by_uid(uid, viewer_uid)
-    profile['is_contact'] = contact is not None \
-                            and contact.status == ContactStatus.Connected
+    profile = _get_public_profile(uid)
+    state = _get_viewer_state(uid, viewer_uid)
+    endorsement = profile['endorsement']
+    if endorsement:
+        if state['comment'] is not None:
+            endorsement['comment'] = state['comment']
+        if state['is_niubility']:
+            endorsement['is_niubility'] = True
+        if state['is_reliability']:
+            endorsement['is_reliability'] = True
+    profile['is_contact'] = state['is_contact']
     return profile
 
 
+def _get_public_profile(uid):
+    """
+    The part of the profile that is the same for every viewer, it's cached
+    until the user, work experiences, endorsement or comments change.
+    Not cached while the request has uncommitted changes to it.
+    @see colleague.cache.ProfileCache
+    """
+    profile, version = profile_cache.get(uid)
+    if profile is None:
+        user = User.find(uid)
+        if not user:
+            st_raise_error(ErrorCode.USER_NOT_EXIST)
+        profile = user.to_dict()
+        profile['work_experiences'] = work_service.get_work_experiences(uid)
+        latest_comment = EndorseComment.find_latest_by_uid(uid)
+        if latest_comment:
+            profile['latest_comment'] = latest_comment.to_dict()
+        # built from rows this request changed, they could be rolled back
+        if not unit_of_work.pending(profile_cache.invalidate, uid):
+            profile_cache.set(uid, version, profile)
+    return profile
+
+
+def _get_viewer_state(uid, viewer_uid):
+    """
+    What the viewer did to the user: endorsements, comment and contact,
+    read with a single query
+    """
+    uid_a, uid_b = Contact._ordered_uid(uid, viewer_uid)
+    no_text = db.cast(db.null(), db.Text)
+    endorses = db.session.query(db.literal_column("'endorse'").label('kind'),
+                                db.cast(UserEndorse.type, db.Integer).label('value'),
+                                no_text.label('text')) \
+        .filter(UserEndorse.uid == uid,
+                UserEndorse.from_uid == viewer_uid,
+                UserEndorse.status == EndorseStatus.Supported)
+    comments = db.session.query(db.literal_column("'comment'"),
+                                db.cast(EndorseComment.status, db.Integer),
+                                EndorseComment.text) \
+        .filter(EndorseComment.uid == uid,
+                EndorseComment.from_uid == viewer_uid)
+    contacts = db.session.query(db.literal_column("'contact'"),
+                                db.cast(Contact.status, db.Integer),
+                                no_text) \
+        .filter(Contact.uidA == uid_a,
+                Contact.uidB == uid_b)
+
+    state = {
+        'is_niubility': False,
+        'is_reliability': False,
+        'comment': None,
+        'is_contact': False
+    }
+    for kind, value, text in endorses.union_all(comments, contacts).all():
+        if kind == 'endorse':
+            if value == EndorseType.Niubility:
+                state['is_niubility'] = True
+            elif value == EndorseType.Reliability:
+                state['is_reliability'] = True
+        elif kind == 'comment':
+            state['comment'] = text
+        elif kind == 'contact':
+            state['is_contact'] = value == ContactStatus.Connected
+    return state
+
+
 def get_login_user_profile(uid):
     """
     Get current login user's profile
@@ -2,7 +2,9 @@
 
 from flask_jwt_extended import current_user
 
+from colleague import unit_of_work
 from colleague.models.work import WorkExperience, Organization
+from colleague.service import company_search
 from colleague.utils import st_raise_error, ErrorCode
 
 
@@ -11,19 +13,8 @@ def get_work_experiences(uid):
 
 
 def _get_work_experiences(uid):
-    def cmp(w1, w2):
-        f1 = w1.end_year * 100 + (w1.end_month or 1)
-        f2 = w2.end_year * 100 + (w2.end_month or 1)
-        if f1 == f2:
-            return (w1.update_date > w2.update_date) and -1 or 1
-        else:
-            return (f1 - f2) > 0 and -1 or 1
-
     # TODO we may need a service layer for this kind of api
-    # TODO where do we handle the redis cache?
-    work_experiences = WorkExperience.find_all_for_user(uid)
-    work_experiences.sort(cmp=cmp)
-    return work_experiences
+    return WorkExperience.find_all_for_user(uid)
 
 
 def _get_or_add_company(company_id, company_name):
@@ -42,6 +33,7 @@ def _get_or_add_company(company_id, company_name):
         if not company:
             company = Organization(name=company_name, verified=False)
             Organization.add(company)
+            unit_of_work.after_commit(company_search.on_company_added, company)
     return company
 
 
@@ -96,5 +88,5 @@ def search_company(keyword, count=10):
     striped_keyword = keyword.strip()
     if len(striped_keyword) == 0:
         return []
-    companies = Organization.like(striped_keyword, count)
+    companies = company_search.search(striped_keyword, count)
     return [_.to_dict() for _ in companies]
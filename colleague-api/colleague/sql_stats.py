@@ -0,0 +1,125 @@
+# -*- coding:utf-8 -*-
+
+"""
+Per request sql statistics.
+
+Every statement a request runs is counted and timed through the
+`before_cursor_execute`/`after_cursor_execute` events of the engine, and
+grouped by its fingerprint, the statement with the literals and parameters
+replaced by `?`. A fingerprint run `SQL_STATS_REPEAT_THRESHOLD` times or more
+is reported as a suspected N+1, usually a lazy relationship or a lookup in a
+loop.
+Each request gets an access log line (`colleague.access`) with its totals,
+and the `X-Sql-Stats` response header with `SQL_STATS_HEADER` on. A warning
+naming the resource is logged when a request runs more than
+`SQL_STATS_WARN_QUERIES` statements or has a suspected N+1.
+Statements outside a request (manage.py commands, the dispatchers) are not
+counted.
+"""
+
+import logging
+import re
+import time
+from collections import Counter
+
+from flask import g, has_app_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from colleague.config import settings
+from colleague.utils import resource_name
+
+HEADER = 'X-Sql-Stats'
+
+access_logger = logging.getLogger('colleague.access')
+logger = logging.getLogger(__name__)
+
+# string and number literals, pyformat/format/qmark parameters
+_LITERAL = re.compile(r"'(?:[^']|'')*'|%\(\w+\)s|%s|\?|\b\d+(?:\.\d+)?\b")
+# `IN (?, ?, ?)` of any length
+_LIST = re.compile(r"\(\?(?:\s*,\s*\?)*\)")
+_SPACE = re.compile(r"\s+")
+
+
+def fingerprint(statement):
+    """
+    :return: The statement without its literals and parameters, the same for
+    every run of a query whatever its values
+    """
+    statement = _LITERAL.sub('?', statement)
+    statement = _LIST.sub('(?)', statement)
+    return _SPACE.sub(' ', statement).strip()
+
+
+class QueryStats(object):
+    def __init__(self):
+        self.started_at = time.time()
+        self.count = 0
+        # seconds
+        self.time = 0.0
+        self.fingerprints = Counter()
+
+    def add(self, statement, elapsed):
+        self.count += 1
+        self.time += elapsed
+        self.fingerprints[fingerprint(statement)] += 1
+
+    def repeated(self, threshold):
+        """
+        :return: [(fingerprint, count)] of the ones run at least `threshold`
+        times, the most repeated first
+        """
+        return [(statement, count) for statement, count in self.fingerprints.most_common()
+                if count >= threshold]
+
+
+def _current():
+    if not has_app_context():
+        return None
+    return g.get('sql_stats')
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current() is not None:
+        # a connection runs one statement at a time
+        conn.info['sql_stats_started_at'] = time.time()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current()
+    started_at = conn.info.pop('sql_stats_started_at', None)
+    if stats is not None and started_at is not None:
+        stats.add(statement, time.time() - started_at)
+
+
+def begin():
+    g.sql_stats = QueryStats()
+
+
+def end(response):
+    stats = g.pop('sql_stats', None)
+    if stats is None:
+        return response
+    elapsed = (time.time() - stats.started_at) * 1000
+    sql_time = stats.time * 1000
+    repeated = stats.repeated(settings['SQL_STATS_REPEAT_THRESHOLD'])
+    resource = resource_name()
+    access_logger.info("%s %s %d %.1fms %s sql=%d %.1fms n+1=%d",
+                       request.method, request.path, response.status_code, elapsed,
+                       resource, stats.count, sql_time, len(repeated))
+    if settings['SQL_STATS_HEADER']:
+        response.headers[HEADER] = "count={}; time={:.1f}ms; n+1={}".format(
+                stats.count, sql_time, len(repeated))
+    if repeated or stats.count > settings['SQL_STATS_WARN_QUERIES']:
+        logger.warning("%s ran %d statements in %.1fms%s", resource, stats.count, sql_time,
+                       "".join("\n  {}x {}".format(count, statement[:300])
+                               for statement, count in repeated))
+    return response
+
+
+def init_app(app):
+    if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+    app.before_request(begin)
+    app.after_request(end)
@@ -0,0 +1,87 @@
+# -*- coding:utf-8 -*-
+
+"""
+One transaction per request.
+
+The models and services call `commit` instead of `db.session.commit()`.
+With `UNIT_OF_WORK` on, a request opens a unit of work: `commit` only
+stages the changes (they are flushed before the next query, call
+`db.session.flush()` where a new id is needed) and the request commits once
+after the handler returned. It rolls back when the handler raised, @see
+`ColleagueApi.handle_error` (the `ApiException` errors are answered with 200),
+or answered an error status.
+Callbacks registered with `after_commit` (cache invalidations, in-process
+indexes) run after that commit, so another request can't cache the old rows
+again in between. Until then, the caches don't store what the request read
+for the keys it changed, @see `pending`.
+Outside a request (manage.py commands, the dispatchers, tests calling the
+models directly) `commit` commits at once and the callbacks run at once.
+"""
+
+from flask import g, has_app_context
+
+from colleague.extensions import db
+
+
+def _callbacks():
+    """
+    :return: The callbacks of the current unit of work, None if there isn't one
+    """
+    if not has_app_context():
+        return None
+    return g.get('uow_callbacks')
+
+
+def begin():
+    g.uow_callbacks = []
+
+
+def commit():
+    if _callbacks() is None:
+        db.session.commit()
+
+
+def fail():
+    """
+    Roll back the current unit of work whatever the response is
+    """
+    if _callbacks() is not None:
+        g.uow_failed = True
+
+
+def after_commit(callback, *args):
+    """
+    Call `callback(*args)` once the changes are committed, dropped on rollback
+    """
+    callbacks = _callbacks()
+    if callbacks is None:
+        callback(*args)
+    else:
+        callbacks.append((callback, args))
+
+
+def pending(callback, *args):
+    """
+    :return: True if `callback(*args)` waits for the commit of the current
+    unit of work, i.e. what is read for these args isn't committed yet
+    """
+    callbacks = _callbacks()
+    return callbacks is not None and (callback, args) in callbacks
+
+
+def end(response):
+    callbacks = g.pop('uow_callbacks', None)
+    if callbacks is None:
+        return response
+    if g.pop('uow_failed', False) or response.status_code >= 400:
+        db.session.rollback()
+        return response
+    db.session.commit()
+    for callback, args in callbacks:
+        callback(*args)
+    return response
+
+
+def init_app(app):
+    app.before_request(begin)
+    app.after_request(end)
@@ -1,14 +1,15 @@
 # -*- coding: utf-8 -*-
-import base64
 import hashlib
 import random
+import time
+import uuid
 
 import arrow
+from flask import current_app, request
 
-from Crypto.Cipher import AES
-
-from colleague.extensions import redis_conn
 from colleague.config import settings
+from colleague.idcodec import get_id_codec
+from colleague.redis_scripts import scripts
 
 
 class STError(object):
@@ -25,6 +26,7 @@ class ErrorCode(object):
     VERIFICATION_CODE_NOT_MATCH = STError(2003, '验证码错误')
     VERIFICATION_CODE_MAX_REQUEST = STError(2004, '验证码请求过于频繁，请稍后再试')
     VERIFICATION_CODE_SEND_FAILED = STError(2005, '验证码发送失败，请稍后重试')
+    SMS_JOB_NOT_EXIST = STError(2019, '短信发送记录不存在')
 
     USER_PASSWORD_WRONG = STError(2005, "用户名或者密码错误")
     DEVICE_MISMATCH = STError(2006, "用户登录设备发生变化")
@@ -70,23 +72,49 @@ def st_raise_error(error):
 
 
 class VerificationCode(object):
+    """
+    Verification codes of a mobile, issue and check are atomic and take one
+    round trip each, @see colleague/lua
+    """
+
     def __init__(self, mobile):
         self.mobile = mobile
 
-        self.count_key = "verification_count:{}".format(self.mobile)
         self.code_key = "verification_code:{}".format(self.mobile)
-
-    def request_count(self):
-        return int(redis_conn.get(self.count_key) or 0)
-
-    def set_code(self, code):
-        redis_conn.set(self.code_key, code, ex=10 * 60)
-
-        redis_conn.incrby(self.count_key)
-        redis_conn.expire(self.count_key, 24 * 60 * 60)
-
-    def get_code(self):
-        redis_conn.get(self.code_key)
+        self.attempts_key = "verification_attempts:{}".format(self.mobile)
+        self.window_key = "verification_window:{}".format(self.mobile)
+
+    def issue(self, code, device_id=None, job=None):
+        """
+        Store a new code unless the mobile or the device asked for too many
+        codes within the window
+        :param device_id: Requesting device, not limited if None
+        :param job: (queue key, job, status key, status, status ttl), the job
+                    is pushed to the queue along with the code
+        :return: True if the code is issued
+        """
+        keys = [self.code_key, self.attempts_key, self.window_key,
+                "verification_device_window:{}".format(device_id or '')]
+        args = [code, settings['VERIFICATION_CODE_TTL'],
+                int(time.time() * 1000), settings['VERIFICATION_CODE_WINDOW'] * 1000,
+                settings['MAX_VERIFICATION_CODE_REQUEST_COUNT'],
+                settings['MAX_VERIFICATION_CODE_DEVICE_COUNT'] if device_id else 0,
+                uuid.uuid4().hex]
+        if job is not None:
+            queue_key, job, status_key, status, status_ttl = job
+            keys += [queue_key, status_key]
+            args += [job, status, status_ttl]
+        return scripts.run('issue_code', keys, args) == 0
+
+    def consume(self, code):
+        """
+        Check the code, a matched code can't be used again
+        :return: 1 matched, 0 mismatched, -1 expired
+        """
+        return scripts.run('consume_code',
+                           [self.code_key, self.attempts_key],
+                           [code, settings['VERIFICATION_CODE_MAX_ATTEMPTS'],
+                            settings['VERIFICATION_CODE_TTL']])
 
 
 def md5(secret, salt):
@@ -95,29 +123,19 @@ def md5(secret, salt):
 
 
 def decode_id(cursor):
-    if cursor is None:
-        return None
-    if isinstance(cursor, unicode):
-        cursor = cursor.encode('utf-8')
-    cursor += '=' * (-len(cursor) % 4)
-    raw = base64.urlsafe_b64decode(cursor)
-    obj = AES.new(settings['AES_KEY'].encode("utf8"), AES.MODE_CBC, settings['AES_IV'].encode("utf8"))
-    data = obj.decrypt(raw)
-    return data.rstrip('\t')
+    return get_id_codec().decode(cursor)
 
 
 def encode_id(cursor):
-    if cursor is None:
-        return None
-    if isinstance(cursor, unicode):
-        cursor = cursor.encode('utf-8')
-    else:
-        cursor = str(cursor)
-    left = len(cursor) % 16
-    left = 0 if left == 0 else (16 - left)
-    data = cursor + '\t' * left
-    obj = AES.new(settings['AES_KEY'].encode("utf8"), AES.MODE_CBC, settings['AES_IV'].encode("utf8"))
-    return base64.urlsafe_b64encode(obj.encrypt(data)).rstrip('==')
+    return get_id_codec().encode(cursor)
+
+
+def decode_ids(cursors):
+    return get_id_codec().decode_many(cursors)
+
+
+def encode_ids(cursors):
+    return get_id_codec().encode_many(cursors)
 
 
 def datetime_to_timestamp(dt):
@@ -134,6 +152,29 @@ def timestamp_to_datetime(timestamp):
     return arrow.get(timestamp).naive
 
 
+def datetime_to_microseconds(dt):
+    # exact, unlike the float timestamp, so it's safe for keyset cursors
+    t = arrow.get(dt)
+    return t.timestamp * 1000000 + t.microsecond
+
+
+def microseconds_to_datetime(microseconds):
+    seconds, microsecond = divmod(int(microseconds), 1000000)
+    return arrow.get(seconds).replace(microsecond=microsecond).naive
+
+
+def resource_name():
+    """
+    :return: The resource class and method handling the current request,
+    e.g. `Login.post`, the endpoint for the other views
+    """
+    view = current_app.view_functions.get(request.endpoint)
+    view_class = getattr(view, 'view_class', None)
+    if view_class is not None:
+        return "{}.{}".format(view_class.__name__, request.method.lower())
+    return request.endpoint or 'unknown'
+
+
 def list_to_dict(objects, key):
     dict_objects = {}
     for object in objects:
@@ -0,0 +1,18 @@
+# -*- coding: utf-8 -*-
+"""
+gunicorn -c gunicorn.conf.py colleague.app:app
+"""
+
+import logging
+
+
+def post_fork(server, worker):
+    # load the in-process company index before the worker takes requests,
+    # the first search loads it if this fails
+    from colleague.app import app
+    from colleague.service import company_search
+    try:
+        with app.app_context():
+            company_search.load_index()
+    except Exception as e:
+        logging.getLogger(__name__).exception(e)
@@ -17,5 +17,54 @@ def _make_context():
 
 manager.add_command('shell', Shell(make_context=_make_context))
 
+
+@manager.command
+def reconcile_counters():
+    """Recompute the like/endorsement/contact counters from their rows"""
+    from colleague.service import counter_service
+    for name, count in sorted(counter_service.reconcile_all().items()):
+        print "{}: {} rows fixed".format(name, count)
+
+
+@manager.command
+def dispatch_notifications():
+    """Run the RongCloud notification dispatcher"""
+    from colleague.service import notification_service
+    notification_service.run_dispatcher()
+
+
+@manager.option('-w', '--workers', dest='workers', type=int, default=None)
+def dispatch_sms(workers):
+    """Run the verification code sms dispatcher"""
+    from colleague.service import sms_service
+    sms_service.run_dispatcher(workers)
+
+
+@manager.option('-d', '--dir', dest='directory', default=None)
+@manager.option('-o', '--output', dest='output', default=None)
+@manager.option('-n', '--top', dest='top', type=int, default=10)
+def aggregate_profiles(directory, output, top):
+    """Merge the profiled requests per resource and print the hottest functions"""
+    import os
+    from colleague import profiler
+    from colleague.config import settings
+    resources = profiler.aggregate(directory or settings['PROFILER_DIR'])
+    for resource, (count, stacks) in sorted(resources.items()):
+        print "{}: {} requests, {} samples".format(resource, count, sum(stacks.values()))
+        for function, samples in profiler.top_functions(stacks, top):
+            print "  {:6d} {}".format(samples, function)
+        if output:
+            if not os.path.isdir(output):
+                os.makedirs(output)
+            profiler.write_folded(os.path.join(output, resource + profiler.SUFFIX), stacks)
+
+
+@manager.option('-t', '--ttl', dest='ttl', type=int, default=300)
+def profile_header(ttl):
+    """Print a X-Profile header valid for ttl seconds"""
+    from colleague import profiler
+    print "{}: {}".format(profiler.HEADER, profiler.make_header(ttl))
+
+
 if __name__ == '__main__':
     manager.run()
@@ -1,12 +1,22 @@
 # -*- coding: utf-8 -*-
 """Defines fixtures available to all tests."""
 
+from contextlib import contextmanager
+
+import fakeredis
 import pytest
+from sqlalchemy import event
 from sqlalchemy.exc import InternalError as SQLAInternalError
 
 from colleague.app import create_app
 from colleague.config import TestConfig
-from colleague.models.user import db as _db
+from colleague.models.contact import Contact, ContactRequestType
+from colleague.models.endorsement import Endorsement
+from colleague.models.feed import Feed, FeedLike, FeedLikeStatus
+from colleague.models.meida import Image
+from colleague.models.user import User, UserStatus, db as _db
+from colleague.models.work import Organization
+from colleague.redis_scripts import scripts
 
 
 @pytest.yield_fixture(scope='function')
@@ -32,3 +42,77 @@ def db(app):
         # could happen because SQLA issues "drop" without cascade
         pass
 
+
+@pytest.yield_fixture(scope='function')
+def rongcloud(mocker):
+    """A local RongCloud server api, @see rongcloud_stub"""
+    from .rongcloud_stub import RongCloudStub
+    stub = RongCloudStub().start()
+    mocker.patch.dict('os.environ', {'RONG_API_HOST': stub.url,
+                                     'RONG_KEY': 'key',
+                                     'RONG_SEC': 'secret'})
+    yield stub
+    stub.stop()
+
+
+@pytest.fixture
+def count_queries(db):
+    """
+    `with count_queries() as queries:` collects the statements run in the block
+    """
+    @contextmanager
+    def count():
+        queries = []
+
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            queries.append(statement)
+
+        event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+        try:
+            yield queries
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+
+    return count
+
+
+@pytest.fixture
+def feeds(db, mocker):
+    """
+    20 feeds from 10 authors in 10 companies, every feed has 2 images. The
+    viewer (the first author) is a contact of the others and liked every
+    other feed
+    """
+    redis = fakeredis.FakeStrictRedis()
+    mocker.patch('colleague.service.timeline_service.redis_conn', redis)
+    mocker.patch.object(scripts, 'redis', redis)
+    users = []
+    for i in range(10):
+        company = Organization(name='company{}'.format(i), verified=True)
+        db.session.add(company)
+        db.session.flush()
+        user = User(mobile='1380000{:04d}'.format(i), password_hash='-', user_name='user{}'.format(i),
+                    status=UserStatus.Confirmed, company_id=company.id)
+        db.session.add(user)
+        db.session.flush()
+        db.session.add(Endorsement(uid=user.id))
+        users.append(user)
+    db.session.commit()
+    for user in users[1:]:
+        Contact.add(users[0].id, user.id, ContactRequestType.Added)
+
+    for i in range(20):
+        author = users[i % len(users)]
+        images = []
+        for j in range(2):
+            image = Image(uid=author.id, path='feed/{}/{}'.format(i, j), width=1, height=1)
+            db.session.add(image)
+            db.session.flush()
+            images.append(image.id)
+        feed = Feed(uid=author.id, images=images, text='feed{}'.format(i))
+        db.session.add(feed)
+        db.session.flush()
+        if i % 2 == 0:
+            db.session.add(FeedLike(uid=users[0].id, feed_id=feed.id, status=FeedLikeStatus.Liked))
+    db.session.commit()
+    yield users[0]
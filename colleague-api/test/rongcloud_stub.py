@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+"""
+A local stand-in for the RongCloud server api, point RONG_API_HOST to `url`.
+Every call is recorded in `calls` as (path, form), `fail` makes every call
+answer an error, `error_code` makes them answer 200 with that error code.
+"""
+
+import threading
+
+from flask import Flask, jsonify, request
+from werkzeug.serving import make_server
+
+
+class RongCloudStub(object):
+    def __init__(self):
+        self.calls = []
+        self.fail = False
+        self.error_code = None
+        self.app = Flask(__name__)
+        self.app.add_url_rule('/<path:path>', 'api', self._api, methods=['POST'])
+        self.server = make_server('127.0.0.1', 0, self.app, threaded=True)
+        self.url = 'http://127.0.0.1:{}'.format(self.server.server_port)
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.daemon = True
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+
+    def _api(self, path):
+        form = request.form.to_dict(flat=False)
+        self.calls.append(('/' + path, form))
+        if self.fail:
+            return jsonify(code=1000, errorMessage='stub failure'), 500
+        if self.error_code:
+            return jsonify(code=self.error_code, errorMessage='stub failure')
+        if path == 'user/getToken.json':
+            return jsonify(code=200, userId=request.form['userId'],
+                           token='token-{}'.format(request.form['userId']))
+        return jsonify(code=200)
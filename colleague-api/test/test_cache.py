@@ -0,0 +1,70 @@
+import fakeredis
+
+from colleague.cache import LRUCache, ProfileCache, UserSessionCache
+
+
+def test_lru_cache_evicts_least_recently_used():
+    cache = LRUCache(maxsize=2)
+    cache.set(1, 'a')
+    cache.set(2, 'b')
+    assert cache.get(1) == 'a'
+    cache.set(3, 'c')
+    assert cache.get(2) is None
+    assert cache.get(1) == 'a'
+    assert cache.get(3) == 'c'
+
+
+def test_lru_cache_expires_entries(mocker):
+    cache = LRUCache(maxsize=2, ttl=5)
+    now = mocker.patch('colleague.cache.time.time', return_value=100)
+    cache.set(1, 'a')
+    now.return_value = 104
+    assert cache.get(1) == 'a'
+    now.return_value = 106
+    assert cache.get(1) is None
+
+
+def test_user_session_cache_invalidate():
+    redis = fakeredis.FakeStrictRedis()
+    cache = UserSessionCache(redis, ttl=60, local_size=10, local_ttl=5)
+    record, version = cache.get(1)
+    assert record is None
+    cache.set(1, version, {'id': 1, 'status': 1})
+    assert cache.get(1) == ({'id': 1, 'status': 1}, version)
+
+    # another worker only sees redis
+    cache.local.clear()
+    assert cache.get(1) == ({'id': 1, 'status': 1}, version)
+
+    cache.invalidate(1)
+    assert cache.get(1)[0] is None
+    assert cache.get(1, local=False)[0] is None
+
+
+def test_user_session_cache_ignores_records_read_before_a_logout():
+    redis = fakeredis.FakeStrictRedis()
+    cache = UserSessionCache(redis, ttl=60, local_size=10, local_ttl=5)
+    record, version = cache.get(1)
+
+    # the user logs out while the record is being built from the old row
+    cache.invalidate(1)
+    cache.set(1, version, {'id': 1, 'status': 1})
+    assert cache.get(1)[0] is None
+    cache.local.clear()
+    assert cache.get(1)[0] is None
+
+
+def test_profile_cache_ignores_stale_blobs():
+    redis = fakeredis.FakeStrictRedis()
+    cache = ProfileCache(redis, ttl=60)
+    profile, version = cache.get(1)
+    assert profile is None
+
+    # the profile changes while the blob is being built
+    cache.invalidate(1)
+    cache.set(1, version, {'user_name': 'old'})
+    assert cache.get(1)[0] is None
+
+    profile, version = cache.get(1)
+    cache.set(1, version, {'user_name': 'new'})
+    assert cache.get(1) == ({'user_name': 'new'}, version)
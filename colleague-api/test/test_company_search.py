@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+
+from colleague.models.work import Organization
+from colleague.service import company_search
+from colleague.service.company_search import NgramIndex
+
+
+def build_index():
+    index = NgramIndex(similarity=0.3)
+    index.add(1, u"阿里巴巴网络技术", u"alibaba", True)
+    index.add(2, u"蚂蚁金服", u"阿里金融", False)
+    index.add(3, u"腾讯科技", u"tencent", True)
+    index.add(4, u"阿里影业", None, False)
+    return index
+
+
+def test_ngram_index_ranks_prefix_similarity_verified():
+    index = build_index()
+    # all of them start with the keyword, the shorter names are more similar
+    assert index.search(u"阿里", 10) == [2, 4, 1]
+    assert index.search(u"Tencent", 10) == [3]
+    # typo
+    assert index.search(u"tencnt", 10) == [3]
+    assert index.search(u"巴巴", 10) == [1]
+    assert index.search(u"阿里", 1) == [2]
+
+
+def test_ngram_index_update():
+    index = build_index()
+    index.add(4, u"影业", None, False)
+    assert 4 not in index.search(u"阿里", 10)
+    index.remove(1)
+    assert index.search(u"alibaba", 10) == []
+
+
+def test_load_picks_up_the_companies_committed_late(db):
+    Organization.add(Organization(id=1, name=u"阿里巴巴网络技术"))
+    Organization.add(Organization(id=3, name=u"腾讯科技"))
+    index = NgramIndex()
+    company_search._load(index)
+    assert index.loaded_id == 3
+
+    # added by this worker
+    Organization.add(Organization(id=4, name=u"阿里影业"))
+    index.add(4, u"阿里影业")
+    # the id was taken before 4's, committed after
+    Organization.add(Organization(id=2, name=u"蚂蚁金服"))
+    company_search._load(index)
+    assert len(index) == 4
+    assert index.search(u"蚂蚁", 10) == [2]
+    assert index.loaded_id == 4
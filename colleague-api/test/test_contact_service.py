@@ -0,0 +1,17 @@
+from colleague.service import contact_service
+
+
+def test_get_contacts_query_count_is_constant(db, feeds, count_queries):
+    viewer = feeds
+    counts = []
+    for size in (1, 5, 20):
+        db.session.expunge_all()
+        with count_queries() as queries:
+            page = contact_service.get_contacts(viewer.id, None, size)
+        assert len(page['contacts']) == min(size, 9)
+        counts.append(len(queries))
+    # edges + users with their company and endorsement
+    assert counts == [2, 2, 2]
+    for contact in page['contacts']:
+        assert contact['user']['company'] is not None
+        assert contact['user']['endorsement'] is not None
@@ -0,0 +1,46 @@
+from colleague.models import counter
+from colleague.models.feed import Feed, FeedLike, FeedLikeStatus
+from colleague.models.user import User, UserStatus
+from colleague.service import counter_service
+
+
+def _add_feed(db):
+    user = User(mobile='12345678910', password_hash='-', status=UserStatus.Confirmed)
+    db.session.add(user)
+    db.session.flush()
+    feed = Feed(uid=user.id, images=[], text='text')
+    db.session.add(feed)
+    db.session.commit()
+    return user, feed
+
+
+def test_incr_never_goes_below_zero(db):
+    user, feed = _add_feed(db)
+    assert counter.incr(Feed.like_count, Feed.id == feed.id, 1)
+    assert counter.incr(Feed.like_count, Feed.id == feed.id, -1)
+    assert counter.incr(Feed.like_count, Feed.id == feed.id, -1)
+    db.session.commit()
+    assert Feed.find(feed.id).like_count == 0
+    assert not counter.incr(Feed.like_count, Feed.id == feed.id + 1, 1)
+
+
+def test_incr_refreshes_the_loaded_rows(db):
+    user, feed = _add_feed(db)
+    feed = Feed.find(feed.id)
+    assert feed.like_count == 0
+    Feed.update_like_count(feed.id, 1)
+    # not committed yet, e.g. within a unit of work
+    assert feed.like_count == 1
+    assert Feed.find(feed.id).like_count == 1
+
+
+def test_reconcile_recomputes_from_rows(db):
+    user, feed = _add_feed(db)
+    db.session.add(FeedLike(uid=user.id, feed_id=feed.id, status=FeedLikeStatus.Liked))
+    feed.like_count = 5
+    db.session.commit()
+
+    fixed = counter_service.reconcile_all()
+    assert fixed['feed.like_count'] == 1
+    assert Feed.find(feed.id).like_count == 1
+    assert counter_service.reconcile_all()['feed.like_count'] == 0
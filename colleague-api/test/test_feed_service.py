@@ -0,0 +1,104 @@
+import mock
+
+from colleague.models.contact import ContactEdge
+from colleague.models.feed import Feed
+from colleague.service import feed_service, timeline_service
+
+
+def test_get_feeds_query_count_is_constant(db, feeds, count_queries):
+    viewer = feeds
+    # load the timeline first
+    feed_service.get_feeds(viewer.id, None, 20)
+    counts = []
+    for size in (1, 5, 20):
+        db.session.expunge_all()
+        with count_queries() as queries:
+            page = feed_service.get_feeds(viewer.id, None, size)
+        assert len(page['feeds']) == size
+        counts.append(len(queries))
+    # feeds + authors + likes + images
+    assert counts == [4, 4, 4]
+
+
+def test_get_feeds_hydrates_likes_and_images(db, feeds, count_queries):
+    viewer = feeds
+    page = feed_service.get_feeds(viewer.id, None, 20)
+    liked = [feed['liked'] for feed in page['feeds']]
+    assert liked.count(True) == 10
+    for feed in page['feeds']:
+        assert len(feed['images']) == 2
+        assert feed['user']['company'] is not None
+        assert feed['user']['endorsement'] is not None
+
+    first_id = Feed.query.order_by(Feed.id).first().id
+    db.session.expunge_all()
+    with count_queries() as queries:
+        feed = feed_service.get_feed(viewer.id, first_id)
+    assert feed['liked'] is True
+    assert len(queries) == 4
+
+
+def test_new_feed_is_pushed_to_contact_timelines(db, feeds, mocker):
+    viewer = feeds
+    feed_service.get_feeds(viewer.id, None, 20)
+    author_id = Feed.query.filter(Feed.uid != viewer.id).first().uid
+    feed = Feed(uid=author_id, images=[], text='new')
+    Feed.add(feed)
+    timeline_service.push(feed)
+    assert timeline_service.get_feed_ids(viewer.id, None, 1) == [feed.id]
+
+    # authors with too many contacts are merged when reading instead
+    mocker.patch.object(timeline_service, 'settings', {'TIMELINE_FANOUT_LIMIT': 0,
+                                                       'TIMELINE_SIZE': 800,
+                                                       'TIMELINE_TTL': 3600})
+    heavy_feed = Feed(uid=author_id, images=[], text='heavy')
+    Feed.add(heavy_feed)
+    timeline_service.push(heavy_feed)
+    assert timeline_service.redis_conn.zscore(timeline_service.TIMELINE_KEY.format(viewer.id),
+                                              heavy_feed.id) is None
+    assert timeline_service.get_feed_ids(viewer.id, None, 2) == [heavy_feed.id, feed.id]
+
+
+def test_feed_pushed_while_loading_is_kept(db, feeds):
+    viewer = feeds
+    author_id = Feed.query.filter(Feed.uid != viewer.id).first().uid
+    feed = Feed(uid=author_id, images=[], text='new')
+    find_ids_by_uids = Feed.find_ids_by_uids
+
+    def pushed_meanwhile(*args, **kwargs):
+        # read before the new feed is committed
+        ids = find_ids_by_uids(*args, **kwargs)
+        Feed.add(feed)
+        timeline_service.push(feed)
+        return ids
+
+    with mock.patch.object(Feed, 'find_ids_by_uids', side_effect=pushed_meanwhile):
+        timeline_service._load(viewer.id)
+    ids = timeline_service.get_feed_ids(viewer.id, None, 21)
+    assert len(ids) == 21
+    assert ids[0] == feed.id
+
+
+def test_push_does_not_recreate_a_dropped_timeline(db, feeds):
+    viewer = feeds
+    page = feed_service.get_feeds(viewer.id, None, 20)
+    assert len(page['feeds']) == 20
+    author_id = Feed.query.filter(Feed.uid != viewer.id).first().uid
+    feed = Feed(uid=author_id, images=[], text='new')
+    Feed.add(feed)
+
+    # the contacts changed while the feed was pushed
+    find_contact_uids = ContactEdge.find_contact_uids
+
+    def dropped_meanwhile(*args, **kwargs):
+        uids = find_contact_uids(*args, **kwargs)
+        timeline_service.invalidate(viewer.id)
+        return uids
+
+    with mock.patch.object(ContactEdge, 'find_contact_uids', side_effect=dropped_meanwhile):
+        timeline_service.push(feed)
+    assert not timeline_service.redis_conn.exists(timeline_service.TIMELINE_KEY.format(viewer.id))
+    # loaded again from the db, not left with only the new feed
+    ids = timeline_service.get_feed_ids(viewer.id, None, 20)
+    assert len(ids) == 20
+    assert ids[0] == feed.id
@@ -0,0 +1,46 @@
+import base64
+
+from Crypto.Cipher import AES
+
+from colleague.idcodec import AESCodec, FeistelCodec, IdCodec
+
+KEY = "0123456789abcdef"
+IV = "fedcba9876543210"
+
+
+def legacy_encode(cursor):
+    data = cursor + '\t' * (-len(cursor) % 16)
+    obj = AES.new(KEY, AES.MODE_CBC, IV)
+    return base64.urlsafe_b64encode(obj.encrypt(data)).rstrip('==')
+
+
+def test_aes_codec_keeps_the_original_format():
+    codec = AESCodec(KEY, IV)
+    values = ['1', '1234567890123456', 'image42', '1538193134.123456', 'a' * 40]
+    tokens = [legacy_encode(value) for value in values]
+    assert [codec.encode(value) for value in values] == tokens
+    assert codec.encode_many(values) == tokens
+    assert [codec.decode(token) for token in tokens] == values
+    assert codec.decode_many(tokens) == values
+
+
+def test_feistel_codec_round_trip():
+    codec = FeistelCodec(KEY)
+    ids = [0, 1, 2, 1 << 40, (1 << 64) - 1]
+    tokens = codec.encode_many(ids)
+    assert len(set(tokens)) == len(ids)
+    assert all(len(token) == FeistelCodec.TOKEN_LENGTH for token in tokens)
+    assert codec.decode_many(tokens) == [str(i) for i in ids]
+
+
+def test_id_codec_decodes_both_formats():
+    aes = AESCodec(KEY, IV)
+    feistel = FeistelCodec(KEY)
+    codec = IdCodec(aes, feistel, default='feistel', memo_size=10)
+
+    assert codec.encode(7) == feistel.encode(7)
+    # non integer values are always encoded by aes
+    assert codec.encode('image7') == aes.encode('image7')
+    assert codec.encode_many([7, None, u'8']) == [feistel.encode(7), None, aes.encode('8')]
+    assert codec.decode_many([feistel.encode(7), legacy_encode('7')]) == ['7', '7']
+    assert codec.decode(None) is None
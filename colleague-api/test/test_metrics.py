@@ -0,0 +1,62 @@
+import fakeredis
+from flask import jsonify
+
+from colleague import metrics
+
+
+def _parse(text):
+    samples = {}
+    for line in text.splitlines():
+        if not line.startswith('#'):
+            sample, value = line.rsplit(' ', 1)
+            samples[sample] = float(value)
+    return samples
+
+
+def test_workers_are_aggregated_in_redis():
+    redis = fakeredis.FakeStrictRedis()
+    workers = [metrics.Registry(buckets=(0.1, 1)) for _ in range(2)]
+    for worker, latency in zip(workers, (0.05, 0.5)):
+        worker.redis = redis
+        worker.observe('http_request_duration_seconds', (('resource', 'Login.post'),), latency)
+        worker.inc('api_errors_total', (('code', 2003),))
+        worker.flush()
+
+    text = metrics.render(redis)
+    assert '# TYPE http_request_duration_seconds histogram' in text
+    # buckets are in order
+    assert text.index('le="0.1"') < text.index('le="1.0"') < text.index('le="+Inf"')
+    samples = _parse(text)
+    assert samples['http_request_duration_seconds_bucket{resource="Login.post",le="0.1"}'] == 1
+    assert samples['http_request_duration_seconds_bucket{resource="Login.post",le="1.0"}'] == 2
+    assert samples['http_request_duration_seconds_bucket{resource="Login.post",le="+Inf"}'] == 2
+    assert abs(samples['http_request_duration_seconds_sum{resource="Login.post"}'] - 0.55) < 1e-9
+    assert samples['api_errors_total{code="2003"}'] == 2
+
+
+def test_request_latency_by_resource(app, mocker):
+    mocker.patch.object(metrics.registry, 'redis', fakeredis.FakeStrictRedis())
+    mocker.patch.object(metrics, 'settings', {'METRICS_TOKEN': 'token', 'METRICS_FLUSH_INTERVAL': 1})
+
+    def view():
+        with metrics.outbound('oss'):
+            pass
+        return jsonify()
+
+    app.add_url_rule('/upload', 'upload', view)
+    client = app.test_client()
+    client.get('/upload')
+    samples = _parse(client.get('/metrics', headers={'Authorization': 'Bearer token'}).data)
+    assert samples['http_request_duration_seconds_count{resource="upload"}'] == 1
+    assert samples['http_request_outbound_seconds_count{resource="upload"}'] == 1
+    assert samples['outbound_request_duration_seconds_count{service="oss"}'] == 1
+
+
+def test_metrics_need_the_token(app, mocker):
+    mocker.patch.object(metrics, 'settings', {'METRICS_TOKEN': '', 'METRICS_FLUSH_INTERVAL': 1})
+    client = app.test_client()
+    assert client.get('/metrics').status_code == 404
+
+    metrics.settings['METRICS_TOKEN'] = 'token'
+    assert client.get('/metrics').status_code == 404
+    assert client.get('/metrics', headers={'Authorization': 'Bearer wrong'}).status_code == 404
@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+from colleague.models.notification import Notification, NotificationStatus
+from colleague.service import notification_service
+
+
+def test_dispatch_batches_recipients(db, rongcloud):
+    for to_uid in ('uid1', 'uid2', 'uid3'):
+        notification_service.send_system_notification('100003', to_uid, 'hello')
+    notification_service.send_private_notification('uid1', 'uid2', 'contact')
+
+    assert notification_service.dispatch_once() == 4
+    assert [path for path, _ in rongcloud.calls] == ['/message/system/publish.json',
+                                                     '/message/private/publish.json']
+    assert rongcloud.calls[0][1]['toUserId'] == ['uid1', 'uid2', 'uid3']
+    assert all(_.status == NotificationStatus.Sent for _ in Notification.query.all())
+    assert notification_service.dispatch_once() == 0
+
+
+def test_dispatch_retries_with_backoff(db, rongcloud):
+    rongcloud.fail = True
+    notification_service.send_system_notification('100003', 'uid1', 'hello')
+
+    assert notification_service.dispatch_once() == 1
+    notification = Notification.query.one()
+    assert notification.status == NotificationStatus.Pending
+    assert notification.attempts == 1
+    # not due yet
+    assert notification_service.dispatch_once() == 0
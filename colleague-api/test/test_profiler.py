@@ -0,0 +1,56 @@
+import os
+import time
+
+from flask import jsonify
+
+from colleague import profiler
+
+
+def _settings(tmpdir, **kwargs):
+    settings = {'PROFILER_SAMPLE_RATE': 0,
+                'PROFILER_SECRET': 'secret',
+                'PROFILER_INTERVAL': 0.001,
+                'PROFILER_DIR': str(tmpdir),
+                'PROFILER_MAX_FILES': 2}
+    settings.update(kwargs)
+    return settings
+
+
+def test_verify_header(tmpdir, mocker):
+    mocker.patch.object(profiler, 'settings', _settings(tmpdir))
+    header = profiler.make_header(60)
+    assert profiler.verify_header(header)
+    assert not profiler.verify_header(header[:-1] + 'x')
+    assert not profiler.verify_header('garbage')
+    assert not profiler.verify_header(profiler.make_header(-1))
+
+    profiler.settings['PROFILER_SECRET'] = ''
+    assert not profiler.verify_header(header)
+
+
+def _slow_handler():
+    time.sleep(0.05)
+
+
+def test_profiles_signed_requests(app, tmpdir, mocker):
+    mocker.patch.object(profiler, 'settings', _settings(tmpdir))
+    profiler.init_app(app)
+
+    def view():
+        _slow_handler()
+        return jsonify()
+
+    app.add_url_rule('/slow', 'slow', view)
+    client = app.test_client()
+    client.get('/slow')
+    assert os.listdir(str(tmpdir)) == []
+
+    for _ in range(3):
+        client.get('/slow', headers={profiler.HEADER: profiler.make_header()})
+    # only the latest files are kept
+    assert len(os.listdir(str(tmpdir))) == 2
+
+    count, stacks = profiler.aggregate(str(tmpdir))['slow']
+    assert count == 2
+    assert all(';' in stack for stack in stacks)
+    assert any('_slow_handler' in stack for stack in stacks)
@@ -0,0 +1,66 @@
+import threading
+
+import fakeredis
+import pytest
+
+from colleague.redis_scripts import scripts
+from colleague.service import rc_service
+
+
+class FakeUser(object):
+    id = 1
+    user_name = 'user_name1'
+    avatar_url = ''
+
+
+@pytest.fixture
+def redis(mocker):
+    _redis = fakeredis.FakeStrictRedis()
+    mocker.patch.object(rc_service, 'redis_conn', _redis)
+    mocker.patch.object(scripts, 'redis', _redis)
+    return _redis
+
+
+def test_rc_token_is_cached(app, redis, rongcloud):
+    token = rc_service.get_rc_token(FakeUser())
+    assert token
+    assert rc_service.get_rc_token(FakeUser()) == token
+    assert len(rongcloud.calls) == 1
+
+    rc_service.refresh_user_info(FakeUser())
+    assert rc_service.get_rc_token(FakeUser()) == token
+    assert [path for path, _ in rongcloud.calls] == ['/user/getToken.json',
+                                                     '/user/refresh.json',
+                                                     '/user/getToken.json']
+
+
+def test_concurrent_misses_fetch_once(app, redis, rongcloud):
+    tokens = []
+    threads = [threading.Thread(target=lambda: tokens.append(rc_service.get_rc_token(FakeUser())))
+               for _ in range(10)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(set(tokens)) == 1
+    assert len(rongcloud.calls) == 1
+
+
+def test_error_code_in_a_200_is_not_a_token(app, redis, rongcloud):
+    rongcloud.error_code = 1004
+    assert rc_service.get_rc_token(FakeUser()) is None
+    assert redis.get(rc_service.RC_TOKEN_KEY.format(FakeUser.id)) is None
+
+
+def test_lock_of_another_holder_is_kept(app, redis, rongcloud, mocker):
+    lock_key = rc_service.RC_TOKEN_LOCK_KEY.format(FakeUser.id)
+    fetch = rc_service._fetch_rc_token
+
+    def slow_fetch(user):
+        # our lock timed out and another request took it
+        redis.set(lock_key, 'another')
+        return fetch(user)
+
+    mocker.patch.object(rc_service, '_fetch_rc_token', side_effect=slow_fetch)
+    assert rc_service.get_rc_token(FakeUser())
+    assert redis.get(lock_key) == 'another'
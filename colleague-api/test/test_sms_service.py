@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+import json
+
+import fakeredis
+import pytest
+
+from colleague.redis_scripts import scripts
+from colleague.service import sms_service
+
+SETTINGS = {
+    'SMS_PROVIDER': 'fake',
+    'SMS_PROVIDER_CONCURRENCY': {'fake': 1},
+    'SMS_MAX_ATTEMPTS': 2,
+    'SMS_RETRY_BASE': 2,
+    'SMS_RETRY_MAX': 60,
+    'SMS_JOB_TTL': 60,
+    'SMS_PROCESSING_TIMEOUT': 300,
+    'SMS_DEAD_LETTER_SIZE': 10,
+}
+
+
+@pytest.fixture
+def redis(mocker):
+    redis = fakeredis.FakeStrictRedis()
+    mocker.patch.object(sms_service, 'redis_conn', redis)
+    mocker.patch.object(scripts, 'redis', redis)
+    mocker.patch.object(sms_service, 'settings', SETTINGS)
+    return redis
+
+
+@pytest.fixture
+def provider(mocker):
+    provider = sms_service.FakeSmsProvider()
+    mocker.patch.dict(sms_service._providers, {'fake': provider})
+    return provider
+
+
+def take(redis):
+    return json.loads(redis.rpop(sms_service.QUEUE_KEY))
+
+
+def test_send_code_records_and_enqueues(redis, provider):
+    job_id = sms_service.send_code('13800000000', '123456')
+
+    assert redis.get('verification_code:13800000000') == b'123456'
+    assert sms_service.get_status(job_id)['status'] == sms_service.JobStatus.Queued
+    assert provider.sent == []
+
+    dispatcher = sms_service.SmsDispatcher(redis, workers=1)
+    assert dispatcher.deliver(take(redis))
+    assert provider.sent == [('13800000000', '123456')]
+    assert sms_service.get_status(job_id)['status'] == sms_service.JobStatus.Sent
+
+
+def test_failed_jobs_are_retried_then_dead_lettered(redis, provider, mocker):
+    provider.failures = 2
+    job_id = sms_service.send_code('13800000000', '123456')
+    dispatcher = sms_service.SmsDispatcher(redis, workers=1)
+    now = mocker.patch('colleague.service.sms_service.time.time', return_value=100)
+
+    assert not dispatcher.deliver(take(redis))
+    assert sms_service.get_status(job_id)['status'] == sms_service.JobStatus.Retrying
+    # not due yet
+    assert dispatcher.requeue_due() == 0
+    now.return_value = 103
+    assert dispatcher.requeue_due() == 1
+
+    assert not dispatcher.deliver(take(redis))
+    assert sms_service.get_status(job_id) == {'status': sms_service.JobStatus.Dead,
+                                              'attempts': 2,
+                                              'error': 'rejected by the provider'}
+    assert redis.llen(sms_service.DEAD_LETTER_KEY) == 1
+    # the code isn't kept
+    assert json.loads(redis.lindex(sms_service.DEAD_LETTER_KEY, 0))['code'] is None
+    assert 0 < redis.ttl(sms_service.DEAD_LETTER_KEY) <= 60
+    assert provider.sent == []
+
+
+def test_jobs_of_a_crashed_dispatcher_are_queued_again(redis, provider, mocker):
+    job_id = sms_service.send_code('13800000000', '123456')
+    now = mocker.patch('colleague.service.sms_service.time.time', return_value=100)
+    crashed = sms_service.SmsDispatcher(redis, workers=1)
+    # taken, then the dispatcher died before delivering it
+    raw = crashed.take()
+    assert redis.llen(sms_service.QUEUE_KEY) == 0
+
+    dispatcher = sms_service.SmsDispatcher(redis, workers=1)
+    now.return_value = 200
+    assert dispatcher.requeue_stuck() == 0
+    now.return_value = 401
+    assert dispatcher.requeue_stuck() == 1
+    assert redis.llen(sms_service.PROCESSING_KEY) == 0
+
+    raw = dispatcher.take()
+    assert dispatcher.deliver(json.loads(raw), raw)
+    assert provider.sent == [('13800000000', '123456')]
+    assert sms_service.get_status(job_id)['status'] == sms_service.JobStatus.Sent
+    assert redis.llen(sms_service.PROCESSING_KEY) == 0
+    assert redis.hlen(sms_service.PROCESSING_SINCE_KEY) == 0
@@ -0,0 +1,40 @@
+from flask import jsonify
+
+from colleague import sql_stats
+from colleague.models.user import User
+
+
+def test_fingerprint_ignores_values():
+    a = sql_stats.fingerprint("SELECT * FROM users WHERE users.id IN (%(id_1)s, %(id_2)s) "
+                              "AND name = 'a''b' LIMIT 20")
+    b = sql_stats.fingerprint("SELECT *\n  FROM users WHERE users.id IN (%(id_1)s) "
+                              "AND name = 'c' LIMIT %(param_1)s")
+    assert a == b == "SELECT * FROM users WHERE users.id IN (?) AND name = ? LIMIT ?"
+
+
+def test_query_stats_repeated():
+    stats = sql_stats.QueryStats()
+    for id in range(3):
+        stats.add("SELECT * FROM users WHERE id = {}".format(id), 0.001)
+    stats.add("SELECT * FROM feed", 0.001)
+    assert stats.count == 4
+    assert stats.repeated(3) == [("SELECT * FROM users WHERE id = ?", 3)]
+    assert stats.repeated(4) == []
+
+
+def test_counts_the_statements_of_a_request(app, db, mocker):
+    mocker.patch.object(sql_stats, 'settings', {'SQL_STATS_HEADER': True,
+                                                'SQL_STATS_WARN_QUERIES': 20,
+                                                'SQL_STATS_REPEAT_THRESHOLD': 3})
+    warning = mocker.patch.object(sql_stats.logger, 'warning')
+
+    def view():
+        for id in range(3):
+            User.find(id)
+        return jsonify()
+
+    app.add_url_rule('/n_plus_one', 'n_plus_one', view)
+    response = app.test_client().get('/n_plus_one')
+    assert response.headers[sql_stats.HEADER].startswith("count=3; ")
+    assert response.headers[sql_stats.HEADER].endswith("; n+1=1")
+    assert warning.call_args[0][1] == 'n_plus_one'
@@ -0,0 +1,86 @@
+import json
+
+from flask import jsonify
+
+from colleague import unit_of_work
+from colleague.cache import profile_cache
+from colleague.models.endorsement import Endorsement
+from colleague.models.user import User
+from colleague.service import user_service
+
+
+def test_commits_at_once_outside_a_request(db, mocker):
+    commit = mocker.spy(db.session, 'commit')
+    called = []
+    user = User.add('12345678910', 'password')
+    unit_of_work.after_commit(called.append, user.id)
+    assert commit.call_count == 1
+    assert called == [user.id]
+
+
+def test_commits_once_per_request(app, db, mocker):
+    called = []
+
+    def view():
+        user = User.add('12345678910', 'password')
+        # the id is assigned before the commit
+        Endorsement.add(user.id)
+        unit_of_work.after_commit(called.append, user.id)
+        assert called == []
+        return jsonify(id=user.id)
+
+    app.add_url_rule('/uow', 'uow', view, methods=['POST'])
+    commit = mocker.spy(db.session, 'commit')
+    response = app.test_client().post('/uow')
+    assert response.status_code == 200
+    assert commit.call_count == 1
+    uid = User.find_by_mobile('12345678910').id
+    assert Endorsement.find_by_uid(uid) is not None
+    assert called == [uid]
+
+
+def test_rolls_back_an_error_response(app, db):
+    called = []
+
+    def view():
+        user = User.add('12345678910', 'password')
+        unit_of_work.after_commit(called.append, user.id)
+        return jsonify(error='failed'), 400
+
+    app.add_url_rule('/uow', 'uow', view, methods=['POST'])
+    assert app.test_client().post('/uow').status_code == 400
+    assert User.find_by_mobile('12345678910') is None
+    assert called == []
+
+
+def test_rolls_back_a_failed_unit_of_work(app, db):
+    def view():
+        User.add('12345678910', 'password')
+        # e.g. an ApiException answered with 200
+        unit_of_work.fail()
+        return jsonify(status=2000)
+
+    app.add_url_rule('/uow', 'uow', view, methods=['POST'])
+    assert app.test_client().post('/uow').status_code == 200
+    assert User.find_by_mobile('12345678910') is None
+
+
+def test_does_not_cache_uncommitted_profiles(app, db, mocker):
+    user = User.add('12345678910', 'password')
+    Endorsement.add(user.id)
+    cache_set = mocker.patch.object(profile_cache, 'set')
+    mocker.patch.object(profile_cache, 'invalidate')
+    mocker.patch.object(profile_cache, 'get', return_value=(None, 0))
+
+    def view():
+        Endorsement.update_niubility_count(user.id, 1)
+        assert unit_of_work.pending(profile_cache.invalidate, user.id)
+        profile = user_service.get_user_profile(user.id, user.id)
+        unit_of_work.fail()
+        return jsonify(count=profile['endorsement']['niubility_count'])
+
+    app.add_url_rule('/uow', 'uow', view, methods=['POST'])
+    response = app.test_client().post('/uow')
+    assert json.loads(response.data)['count'] == 1
+    assert not cache_set.called
+    assert Endorsement.find_by_uid(user.id).niubility == 0
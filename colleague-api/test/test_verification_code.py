@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+import fakeredis
+import pytest
+
+from colleague.redis_scripts import scripts
+from colleague.utils import VerificationCode
+
+
+@pytest.fixture
+def redis(mocker):
+    redis = fakeredis.FakeStrictRedis()
+    mocker.patch.object(scripts, 'redis', redis)
+    return redis
+
+
+def test_issue_is_limited_per_mobile_and_device(redis, mocker):
+    now = mocker.patch('colleague.utils.time.time', return_value=1000)
+    code = VerificationCode('13800000000')
+    assert all(code.issue('123456') for _ in range(5))
+    assert not code.issue('123456')
+
+    for i in range(10):
+        assert VerificationCode('1390000000{}'.format(i)).issue('123456', 'device')
+    assert not VerificationCode('13700000000').issue('123456', 'device')
+    assert VerificationCode('13700000000').issue('123456', 'another')
+
+    # the window slides
+    now.return_value = 1000 + 24 * 60 * 60 + 1
+    assert code.issue('123456')
+    assert VerificationCode('13700000000').issue('123456', 'device')
+
+
+def test_consume_code(redis):
+    code = VerificationCode('13800000000')
+    assert code.consume('123456') == -1
+    code.issue('123456')
+    assert code.consume('654321') == 0
+    assert code.consume('123456') == 1
+    # only once
+    assert code.consume('123456') == -1
+
+    code.issue('123456')
+    for _ in range(5):
+        assert code.consume('654321') == 0
+    # dropped after too many wrong codes
+    assert code.consume('123456') == -1
+
+
+def test_script_is_reloaded_after_flush(redis):
+    code = VerificationCode('13800000000')
+    code.issue('123456')
+    redis.script_flush()
+    assert code.consume('123456') == 1
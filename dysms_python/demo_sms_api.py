@@ -1,7 +1,7 @@
 #!/usr/bin/env python
 # coding=utf8
 import sys
-import datetime
+import time
 from aliyunsdkcore.acs_exception.exceptions import ServerException
 from aliyunsdkcore.client import AcsClient
 from aliyunsdkcore.profile import region_provider
@@ -13,6 +13,7 @@ import const
 sys.path.append("./mns_python_sdk/")
 from mns.mns_account import Account
 from mns.mns_queue import *
+from mns.mns_credentials import RefreshingCredentials
 
 try:
     import json
@@ -51,82 +52,39 @@ acs_client = AcsClient(const.ACCESS_KEY_ID, const.ACCESS_KEY_SECRET, REGION)
 region_provider.add_endpoint(PRODUCT_NAME, REGION, DOMAIN)
 
 
-# 云通信业务token存在失效时间，需动态更新。
-class Token():
-    def __init__(self, token=None, tmp_access_id=None, tmp_access_key=None, expire_time=None):
-        self.__token = token
-        self.__tmp_access_id = tmp_access_id
-        self.__tmp_access_key = tmp_access_key
-        self.__expire_time = expire_time
+# 云通信业务token存在失效时间，由RefreshingCredentials在后台提前刷新，
+# MNSClient每次请求时读取当前token，刷新时无需重建Account和连接。
+def fetch_token():
+    print("start refresh token...")
+    request = QueryTokenForMnsQueueRequest()
+    request.set_MessageType(msgtype)
+    # 数据提交方式
+    # smsRequest.set_method(MT.POST)
+    # 数据提交格式
+    # smsRequest.set_accept_format(FT.JSON)
 
-    def get_token(self):
-        return self.__token
+    response = acs_client.do_action_with_exception(request)
+    # print response
+    if response is None:
+        raise ServerException("GET_TOKEN_FAIL", "获取token时无响应")
 
-    def set_token(self, token):
-        self.__token = token
+    response_body = json.loads(response.decode('utf-8'))
 
-    def get_tmp_access_id(self):
-        return self.__tmp_access_id
+    if response_body.get("Code") != "OK":
+        raise ServerException("GET_TOKEN_FAIL", "获取token失败")
 
-    def set_tmp_access_id(self, tmp_access_id):
-        self.__tmp_access_id = tmp_access_id
-
-    def get_tmp_access_key(self):
-        return self.__tmp_access_key
-
-    def set_tmp_access_key(self, tmp_access_key):
-        self.__tmp_access_key = tmp_access_key
-
-    def get_expire_time(self):
-        return self.__expire_time
-
-    def set_expire_time(self, expire_time):
-        self.__expire_time = expire_time
-
-    def is_refresh(self):
-        # 失效时间与当前系统时间比较，提前2分钟刷新token
-        now = datetime.datetime.now()
-        expire = datetime.datetime.strptime(self.__expire_time, "%Y-%m-%d %H:%M:%S")
-        # intval = (expire - now).seconds
-        # print "token生效剩余时长（秒）：" + str(intval)
-        if expire <= now or (expire - now).seconds < 120:
-            return 1
-        return 0
-
-    def refresh(self):
-        print("start refresh token...")
-        request = QueryTokenForMnsQueueRequest()
-        request.set_MessageType(msgtype)
-		# 数据提交方式
-	    # smsRequest.set_method(MT.POST)	
-	    # 数据提交格式
-        # smsRequest.set_accept_format(FT.JSON)
-		
-        response = acs_client.do_action_with_exception(request)
-        # print response
-        if response is None:
-            raise ServerException("GET_TOKEN_FAIL", "获取token时无响应")
-
-        #response = response.decode('utf-8')
-        response_body = json.loads(response.decode('utf-8'))
-
-        if response_body.get("Code") != "OK":
-            raise ServerException("GET_TOKEN_FAIL", "获取token失败")
-
-        self.__tmp_access_key = response_body.get("MessageTokenDTO").get("AccessKeySecret")
-        self.__tmp_access_id = response_body.get("MessageTokenDTO").get("AccessKeyId")
-        self.__expire_time = response_body.get("MessageTokenDTO").get("ExpireTime")
-        self.__token = response_body.get("MessageTokenDTO").get("SecurityToken")
-        print("key=%s, id=%s, expire_time=%s, token=%s" \
-                % (self.__tmp_access_key, self.__tmp_access_id, self.__expire_time, self.__token))
-
-        print("finsh refresh token...")
+    token = response_body.get("MessageTokenDTO")
+    # ExpireTime为本地时间，例如 2017-10-13 12:00:00
+    expire_time = time.mktime(time.strptime(token.get("ExpireTime"), "%Y-%m-%d %H:%M:%S"))
+    print("id=%s, expire_time=%s" % (token.get("AccessKeyId"), token.get("ExpireTime")))
+    print("finsh refresh token...")
+    return token.get("AccessKeyId"), token.get("AccessKeySecret"), token.get("SecurityToken"), expire_time
 
 
 # 初始化 my_account, my_queue
-token = Token()
-token.refresh()
-my_account = Account(endpoint, token.get_tmp_access_id(), token.get_tmp_access_key(), token.get_token())
+# 过期前2分钟刷新token
+credentials = RefreshingCredentials(fetch_token, refresh_ahead=120)
+my_account = Account(endpoint, None, None, credentials=credentials)
 my_queue = my_account.get_queue(qname)
 # my_queue.set_encoding(False)
 # 循环读取删除消息直到队列空
@@ -142,14 +100,6 @@ print("%sReceive And Delete Message From Queue%s\nQueueName:%s\nWaitSeconds:%s\n
 while True:
     # 读取消息
     try:
-        # token过期是否需要刷新
-        if token.is_refresh() == 1:
-            # 刷新token
-            token.refresh()
-            my_account.mns_client.close_connection()
-            my_account = Account(endpoint, token.get_tmp_access_id(), token.get_tmp_access_key(), token.get_token())
-            my_queue = my_account.get_queue(qname)
-
         # 接收消息
         recv_msg = my_queue.receive_message(wait_seconds)
 
@@ -18,7 +18,7 @@ from .mns_subscription import Subscription
 from .mns_tool import MNSLogger
 
 class Account:
-    def __init__(self, host, access_id, access_key, security_token = "", debug=False, logger = None):
+    def __init__(self, host, access_id, access_key, security_token = "", debug=False, logger = None, credentials = None):
         """
             @type host: string
             @param host: 访问的url，例如：http://$accountid.mns.cn-hangzhou.aliyuncs.com
@@ -32,15 +32,19 @@ class Account:
             @type security_token: string
             @param security_token: 如果用户使用STS Token访问，需要提供security_token
 
+            @type credentials: RefreshingCredentials object
+            @param credentials: 自动刷新的STS Token, 指定时忽略access_id/access_key/security_token
+
             @note: Exception
             :: MNSClientParameterException host格式错误
         """
         self.access_id = access_id
         self.access_key = access_key
         self.security_token = security_token
+        self.credentials = credentials
         self.debug = debug
         self.logger = logger
-        self.mns_client = MNSClient(host, access_id, access_key, security_token = security_token, logger=self.logger)
+        self.mns_client = MNSClient(host, access_id, access_key, security_token = security_token, logger=self.logger, credentials=credentials)
 
     def set_debug(self, debug):
         self.debug = debug
@@ -83,7 +87,7 @@ class Account:
             access_key = self.access_key
         if security_token is None:
             security_token = self.security_token
-        self.mns_client = MNSClient(host, access_id, access_key, security_token=security_token, logger=self.logger)
+        self.mns_client = MNSClient(host, access_id, access_key, security_token=security_token, logger=self.logger, credentials=self.credentials)
 
     def set_attributes(self, account_meta, req_info=None):
         """ 设置Account的属性
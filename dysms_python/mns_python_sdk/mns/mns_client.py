@@ -19,6 +19,7 @@ from .mns_exception import *
 from .mns_request import *
 from .mns_tool import *
 from .mns_http import *
+from .mns_credentials import StaticCredentials
 
 #from mns.mns_xml_handler import *
 #from mns.mns_exception import *
@@ -34,14 +35,14 @@ URISEC_SUBSCRIPTION = "subscriptions"
 
 class MNSClient(object):
     #__metaclass__ = type
-    def __init__(self, host, access_id, access_key, version = "2015-06-06", security_token = "", logger=None):
+    def __init__(self, host, access_id, access_key, version = "2015-06-06", security_token = "", logger=None, pool_size=MNSHttp.DEFAULT_POOL_SIZE, credentials=None):
         self.host, self.is_https = self.process_host(host)
-        self.access_id = access_id
-        self.access_key = access_key
+        #read on every signed request, so a RefreshingCredentials rotates the token without a new client
+        self.credentials = credentials or StaticCredentials(access_id, access_key, security_token)
         self.version = version
-        self.security_token = security_token
         self.logger = logger
-        self.http = MNSHttp(self.host, logger=logger, is_https=self.is_https)
+        #a connection is checked out of the pool per request, so the client can be shared by threads
+        self.http = MNSHttp(self.host, logger=logger, is_https=self.is_https, pool_size=pool_size)
         if self.logger:
             self.logger.info("InitClient Host:%s Version:%s" % (host, version))
 
@@ -61,8 +62,23 @@ class MNSClient(object):
     def set_keep_alive(self, keep_alive):
         self.http.set_keep_alive(keep_alive)
 
+    def set_pool_size(self, pool_size):
+        self.http.set_pool_size(pool_size)
+
     def close_connection(self):
-        self.http.conn.close()
+        self.http.close()
+
+    @property
+    def access_id(self):
+        return self.credentials.get_credentials()[0]
+
+    @property
+    def access_key(self):
+        return self.credentials.get_credentials()[1]
+
+    @property
+    def security_token(self):
+        return self.credentials.get_credentials()[2]
 
 #===============================================queue operation===============================================#
     def set_account_attributes(self, req, resp):
@@ -719,11 +735,14 @@ class MNSClient(object):
         req_inter.header["date"] = time.strftime("%a, %d %b %Y %H:%M:%S GMT", time.gmtime())
         req_inter.header["user-agent"] = "aliyun-sdk-python/%s(%s/%s;%s)" % \
                                          (mns_pkg_info.version, platform.system(), platform.release(), platform.python_version())
-        req_inter.header["Authorization"] = self.get_signature(req_inter.method, req_inter.header, req_inter.uri)
-        if self.security_token != "":
-            req_inter.header["security-token"] = self.security_token
-
-    def get_signature(self,method,headers,resource):
+        access_id, access_key, security_token = self.credentials.get_credentials()
+        req_inter.header["Authorization"] = self.get_signature(req_inter.method, req_inter.header, req_inter.uri, access_id, access_key)
+        if security_token:
+            req_inter.header["security-token"] = security_token
+
+    def get_signature(self,method,headers,resource,access_id=None,access_key=None):
+        if access_id is None:
+            access_id, access_key = self.access_id, self.access_key
         content_md5 = self.get_element('content-md5', headers)
         content_type = self.get_element('content-type', headers)
         date = self.get_element('date', headers)
@@ -739,10 +758,10 @@ class MNSClient(object):
         string_to_sign = "%s\n%s\n%s\n%s\n%s%s" % (method, content_md5, content_type, date, canonicalized_mns_headers, canonicalized_resource)
         #hmac only support str in python2.7
         #tmp_key = self.access_key.encode('utf-8') if isinstance(self.access_key, unicode) else self.access_key
-        tmp_key = self.access_key.encode('utf-8')
+        tmp_key = access_key.encode('utf-8')
         h = hmac.new(tmp_key, string_to_sign.encode('utf-8'), hashlib.sha1)
         signature = base64.b64encode(h.digest())
-        signature = "MNS " + self.access_id + ":" + signature.decode('utf-8')
+        signature = "MNS " + access_id + ":" + signature.decode('utf-8')
         return signature
 
     def get_element(self, name, container):
@@ -0,0 +1,212 @@
+#coding=utf-8
+# Copyright (C) 2015, Alibaba Cloud Computing
+
+#Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated documentation files (the "Software"), to deal in the Software without restriction, including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+#The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+
+#THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+import time
+import threading
+try:
+    import queue as Queue
+except ImportError:
+    import Queue
+from .mns_exception import *
+
+class QueueConsumer:
+    """ 多线程消费队列
+
+        @note: 由一个IO线程负责batch_receive_message(长轮询), 另一个线程负责合并后的batch_delete_message,
+             : 长轮询期间已处理的消息也在ack_interval内删除;
+             : handler在有界的工作线程池中执行, handler正常返回即确认(删除)消息,
+             : 抛出异常则不删除, 消息在visibility_timeout之后被重新消费;
+             : 处理中的消息数达到max_pending时暂停receive(背压);
+             : stop()停止receive, 等待处理中的消息完成并删除后返回.
+    """
+    #batch_receive_message/batch_delete_message单次最多16条
+    MAX_BATCH_SIZE = 16
+
+    def __init__(self, queue, handler, workers=4, batch_size=16, wait_seconds=3, max_pending=None, ack_interval=0.5, logger=None):
+        """
+            @type queue: Queue object
+            @param queue: 消费的队列
+
+            @type handler: function
+            @param handler: handler(message), 处理一条消息
+
+            @type workers: int
+            @param workers: 工作线程数
+
+            @type batch_size: int
+            @param batch_size: 单次receive的最多消息条数, 不超过16
+
+            @type wait_seconds: int
+            @param wait_seconds: receive的长轮询时间, 单位：秒
+
+            @type max_pending: int
+            @param max_pending: 最多处理中(已receive未删除)的消息数, 默认为 2 * workers * batch_size
+
+            @type ack_interval: float
+            @param ack_interval: 待删除的消息不足16条时, 最长等待多久合并删除, 单位：秒
+        """
+        self.queue = queue
+        self.handler = handler
+        self.workers = workers
+        self.batch_size = min(batch_size, QueueConsumer.MAX_BATCH_SIZE)
+        self.wait_seconds = wait_seconds
+        self.max_pending = max_pending or 2 * workers * self.batch_size
+        self.ack_interval = ack_interval
+        self.logger = logger
+
+        self.received = 0
+        self.handled = 0
+        self.failed = 0
+        self.deleted = 0
+
+        self._tasks = Queue.Queue()
+        self._acks = []
+        self._acked_at = time.time()
+        self._pending = 0
+        self._polling = False
+        self._cond = threading.Condition()
+        self._stopped = threading.Event()
+        self._threads = []
+
+    def start(self):
+        self._stopped.clear()
+        self._polling = True
+        self._threads = [threading.Thread(target=self._work) for i in range(self.workers)]
+        self._threads.append(threading.Thread(target=self._poll))
+        self._threads.append(threading.Thread(target=self._ack))
+        for thread in self._threads:
+            thread.daemon = True
+            thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        """ 停止消费, 处理中的消息完成并删除后返回
+        """
+        self._stopped.set()
+        with self._cond:
+            self._cond.notify_all()
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def run(self):
+        """ 在当前线程消费直到KeyboardInterrupt
+        """
+        self.start()
+        try:
+            while not self._stopped.is_set():
+                self._stopped.wait(1)
+        except KeyboardInterrupt:
+            pass
+        self.stop()
+
+    def stats(self):
+        with self._cond:
+            return {"Received": self.received, "Handled": self.handled, "Failed": self.failed,
+                    "Deleted": self.deleted, "Pending": self._pending}
+
+    def _poll(self):
+        backoff = 0
+        while self._wait_capacity():
+            try:
+                messages = self.queue.batch_receive_message(self.batch_size, self.wait_seconds)
+                backoff = 0
+            except MNSServerException as e:
+                if e.type == u"MessageNotExist":
+                    continue
+                backoff = self._on_error("BatchReceiveMessage", e, backoff)
+                continue
+            except MNSExceptionBase as e:
+                backoff = self._on_error("BatchReceiveMessage", e, backoff)
+                continue
+            with self._cond:
+                self._pending += len(messages)
+                self.received += len(messages)
+            for msg in messages:
+                self._tasks.put(msg)
+
+        #graceful shutdown: the workers finish the queued messages, the ack thread deletes them
+        for i in range(self.workers):
+            self._tasks.put(None)
+        with self._cond:
+            self._polling = False
+            self._cond.notify_all()
+
+    def _wait_capacity(self):
+        """ 处理中的消息数加上一批不超过max_pending时返回True, 停止时返回False
+        """
+        with self._cond:
+            while self._pending + self.batch_size > self.max_pending and not self._stopped.is_set():
+                self._cond.wait()
+            return not self._stopped.is_set()
+
+    def _work(self):
+        while True:
+            msg = self._tasks.get()
+            if msg is None:
+                return
+            try:
+                self.handler(msg)
+                ok = True
+            except Exception as e:
+                ok = False
+                if self.logger:
+                    self.logger.error("HandleMessage Failed MessageId:%s Exception:%s" % (msg.message_id, e))
+            with self._cond:
+                if ok:
+                    self.handled += 1
+                    if not self._acks:
+                        self._acked_at = time.time()
+                    self._acks.append(msg.receipt_handle)
+                else:
+                    self.failed += 1
+                    self._pending -= 1
+                self._cond.notify_all()
+
+    def _ack(self):
+        """ 合并删除已处理的消息: 满16条, 最早的一条等待了ack_interval, 或者正在停止时删除
+        """
+        while True:
+            with self._cond:
+                while True:
+                    if len(self._acks) >= QueueConsumer.MAX_BATCH_SIZE:
+                        break
+                    if self._acks:
+                        left = self.ack_interval - (time.time() - self._acked_at)
+                        if left <= 0 or self._stopped.is_set():
+                            break
+                        self._cond.wait(left)
+                    elif self._stopped.is_set() and not self._polling and self._pending == 0:
+                        return
+                    else:
+                        self._cond.wait()
+                handles = self._acks[:QueueConsumer.MAX_BATCH_SIZE]
+                del self._acks[:QueueConsumer.MAX_BATCH_SIZE]
+            deleted = len(handles)
+            try:
+                self.queue.batch_delete_message(handles)
+            except MNSServerException as e:
+                #the others are deleted, the failed ones are visible again after the visibility timeout
+                deleted -= len(e.sub_errors) if e.sub_errors else len(handles)
+                if self.logger:
+                    self.logger.error("BatchDeleteMessage Failed Count:%s Exception:%s" % (len(handles) - deleted, e))
+            except MNSExceptionBase as e:
+                deleted = 0
+                if self.logger:
+                    self.logger.error("BatchDeleteMessage Failed Count:%s Exception:%s" % (len(handles), e))
+            with self._cond:
+                self.deleted += deleted
+                self._pending -= len(handles)
+                self._cond.notify_all()
+
+    def _on_error(self, action, e, backoff):
+        if self.logger:
+            self.logger.error("%s Failed Exception:%s" % (action, e))
+        backoff = min(backoff * 2 or 0.1, 10)
+        self._stopped.wait(backoff)
+        return backoff
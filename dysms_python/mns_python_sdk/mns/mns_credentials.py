@@ -0,0 +1,108 @@
+#coding=utf-8
+# Copyright (C) 2015, Alibaba Cloud Computing
+
+#Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated documentation files (the "Software"), to deal in the Software without restriction, including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+#The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+
+#THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+import time
+import threading
+
+class StaticCredentials:
+    """ 固定的AccessId/AccessKey/SecurityToken
+    """
+    def __init__(self, access_id, access_key, security_token=""):
+        self._credentials = (access_id, access_key, security_token)
+
+    def get_credentials(self):
+        """
+            @rtype: tuple
+            @return: (access_id, access_key, security_token)
+        """
+        return self._credentials
+
+class RefreshingCredentials:
+    """ 在后台线程中提前刷新的STS Token
+
+        @note: fetch()返回 (access_id, access_key, security_token, expire_time),
+             : expire_time为过期时间的时间戳, 单位：秒;
+             : 构造时同步获取一次, 之后后台线程在过期前refresh_ahead秒刷新,
+             : 刷新失败或者新token也在refresh_ahead内过期时每retry_interval秒重试, 期间继续使用未过期的token;
+             : get_credentials总是返回同一次获取的三元组, 可以被多个线程和MNSClient共享.
+    """
+    def __init__(self, fetch, refresh_ahead=300, retry_interval=10, logger=None):
+        """
+            @type fetch: function
+            @param fetch: 获取新token, 抛出异常表示失败
+
+            @type refresh_ahead: int
+            @param refresh_ahead: 提前多久刷新, 单位：秒
+
+            @type retry_interval: int
+            @param retry_interval: 刷新失败后的重试间隔, 单位：秒
+        """
+        self.fetch = fetch
+        self.refresh_ahead = refresh_ahead
+        self.retry_interval = retry_interval
+        self.logger = logger
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._credentials = None
+        self._expire_time = 0
+        self.refresh()
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def get_credentials(self):
+        """
+            @rtype: tuple
+            @return: (access_id, access_key, security_token)
+
+            @note: token已过期(后台刷新一直失败)时同步刷新一次, 失败则抛出fetch的异常;
+                 : 多个线程同时发现过期时只有一个线程获取, 其他线程等待并使用它获取的token
+        """
+        if self._expire_time <= time.time():
+            self._refresh(0)
+        return self._credentials
+
+    def expire_time(self):
+        return self._expire_time
+
+    def refresh(self):
+        self._refresh(None)
+
+    def _refresh(self, ahead):
+        """ ahead不为None时只在token ahead秒内过期时获取
+        """
+        with self._lock:
+            #refreshed by another thread while this one waited for the lock
+            if ahead is not None and self._expire_time - ahead > time.time():
+                return
+            access_id, access_key, security_token, expire_time = self.fetch()
+            self._credentials = (access_id, access_key, security_token)
+            self._expire_time = expire_time
+        if self.logger:
+            self.logger.info("RefreshCredentials AccessId:%s ExpireTime:%s" % (access_id, expire_time))
+
+    def stop(self):
+        self._stopped.set()
+
+    def _run(self):
+        while not self._stopped.is_set():
+            wait = self._expire_time - self.refresh_ahead - time.time()
+            if wait > 0:
+                self._stopped.wait(wait)
+                continue
+            try:
+                self._refresh(self.refresh_ahead)
+            except Exception as e:
+                if self.logger:
+                    self.logger.error("RefreshCredentials Failed Exception:%s" % e)
+                self._stopped.wait(self.retry_interval)
+                continue
+            if self._expire_time - self.refresh_ahead <= time.time():
+                #the new token is already due, e.g. a cached one near its end, don't fetch again at once
+                self._stopped.wait(self.retry_interval)
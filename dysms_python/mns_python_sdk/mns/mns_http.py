@@ -9,18 +9,30 @@
 
 
 import time
+import errno
 import socket
+import select
+import threading
 try:
     from http.client import HTTPConnection, BadStatusLine, HTTPSConnection
 except:
     from httplib import HTTPConnection, BadStatusLine, HTTPSConnection
 from .mns_exception import *
 
+class ConnectionClosed(Exception):
+    """ 服务端在返回响应之前关闭了连接, 请求未被处理, 可以在新连接上重试
+    """
+    def __init__(self, error):
+        Exception.__init__(self, str(error))
+        self.error = error
+
 class MNSHTTPConnection(HTTPConnection):
     def __init__(self, host, port=None, strict=None, connection_timeout=60):
         HTTPConnection.__init__(self, host, port)
         self.request_length = 0
         self.connection_timeout = connection_timeout
+        self.created_time = time.time()
+        self.last_used_time = self.created_time
 
     def send(self, str):
         HTTPConnection.send(self, str)
@@ -53,9 +65,12 @@ class MNSHTTPConnection(HTTPConnection):
             raise socket.error(msg)
 
 class MNSHTTPSConnection(HTTPSConnection):
-    def __init__(self, host, port=None, strict=None):
-        HTTPSConnection.__init__(self, host, port) 
+    def __init__(self, host, port=None, strict=None, connection_timeout=60):
+        HTTPSConnection.__init__(self, host, port, timeout=connection_timeout)
         self.request_length = 0
+        self.connection_timeout = connection_timeout
+        self.created_time = time.time()
+        self.last_used_time = self.created_time
 
     def send(self, str):
         HTTPSConnection.send(self, str)
@@ -66,20 +81,38 @@ class MNSHTTPSConnection(HTTPSConnection):
         HTTPSConnection.request(self, method, url, body, headers)
 
 class MNSHttp:
-    def __init__(self, host, connection_timeout = 60, keep_alive = True, logger=None, is_https=False):
-        if is_https:
-            self.conn = MNSHTTPSConnection(host)
-        else:
-            self.conn = MNSHTTPConnection(host, connection_timeout=connection_timeout)
+    """ 线程安全的连接池, 每个请求从池中取出一个连接, 请求完成后放回
+
+        @note: 连接池属性
+        :: pool_size: 最多同时存在的连接数, 连接都在使用中时请求等待
+        :: max_connection_age: 连接最长使用时间, 超过后关闭, 单位：秒
+        :: max_idle_time: 连接最长空闲时间, 超过后关闭, 单位：秒
+        :: pool_timeout: 等待可用连接的最长时间, None表示一直等待, 单位：秒
+    """
+    DEFAULT_POOL_SIZE = 10
+    DEFAULT_MAX_CONNECTION_AGE = 300
+    #less than the idle timeout of the MNS server side keep-alive
+    DEFAULT_MAX_IDLE_TIME = 30
+
+    def __init__(self, host, connection_timeout = 60, keep_alive = True, logger=None, is_https=False,
+                 pool_size=DEFAULT_POOL_SIZE, max_connection_age=DEFAULT_MAX_CONNECTION_AGE,
+                 max_idle_time=DEFAULT_MAX_IDLE_TIME, pool_timeout=None):
         self.host = host
         self.is_https = is_https
         self.connection_timeout = connection_timeout
         self.keep_alive = keep_alive
+        self.pool_size = pool_size
+        self.max_connection_age = max_connection_age
+        self.max_idle_time = max_idle_time
+        self.pool_timeout = pool_timeout
         self.request_size = 0
         self.response_size = 0
         self.logger = logger
+        self.__idle = []
+        self.__busy = 0
+        self.__cond = threading.Condition()
         if self.logger:
-            self.logger.info("InitMNSHttp KeepAlive:%s ConnectionTime:%s" % (self.keep_alive, self.connection_timeout))
+            self.logger.info("InitMNSHttp KeepAlive:%s ConnectionTime:%s PoolSize:%s" % (self.keep_alive, self.connection_timeout, self.pool_size))
 
     def set_log_level(self, log_level):
         if self.logger:
@@ -90,10 +123,7 @@ class MNSHttp:
 
     def set_connection_timeout(self, connection_timeout):
         self.connection_timeout = connection_timeout
-        if not self.is_https:
-            if self.conn:
-                self.conn.close()
-            self.conn = MNSHTTPConnection(self.host, connection_timeout=connection_timeout)
+        self.close()
 
     def set_keep_alive(self, keep_alive):
         self.keep_alive = keep_alive
@@ -101,33 +131,116 @@ class MNSHttp:
     def is_keep_alive(self):
         return self.keep_alive
 
+    def set_pool_size(self, pool_size):
+        with self.__cond:
+            self.pool_size = pool_size
+            self.__cond.notify_all()
+
+    def close(self):
+        """ 关闭所有空闲连接, 使用中的连接在请求完成后关闭
+        """
+        with self.__cond:
+            idle, self.__idle = self.__idle, []
+        for conn in idle:
+            conn.close()
+
+    def new_connection(self):
+        if self.is_https:
+            return MNSHTTPSConnection(self.host, connection_timeout=self.connection_timeout)
+        return MNSHTTPConnection(self.host, connection_timeout=self.connection_timeout)
+
+    def is_reusable(self, conn, now):
+        """ 检查空闲连接: 未超过最长使用和空闲时间, 且没有可读数据(对端已关闭或异常)
+        """
+        if conn.sock is None:
+            return False
+        if now - conn.created_time > self.max_connection_age or now - conn.last_used_time > self.max_idle_time:
+            return False
+        if conn.connection_timeout != self.connection_timeout:
+            return False
+        try:
+            readable, _, _ = select.select([conn.sock], [], [], 0)
+        except (select.error, socket.error, ValueError):
+            return False
+        return not readable
+
+    def checkout(self):
+        """ 取出一个连接, 优先使用最近放回的空闲连接
+        """
+        deadline = None if self.pool_timeout is None else time.time() + self.pool_timeout
+        with self.__cond:
+            while True:
+                while self.__idle:
+                    conn = self.__idle.pop()
+                    if self.is_reusable(conn, time.time()):
+                        self.__busy += 1
+                        return conn, True
+                    conn.close()
+                if self.__busy < self.pool_size:
+                    self.__busy += 1
+                    return self.new_connection(), False
+                if deadline is None:
+                    self.__cond.wait()
+                else:
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        raise MNSClientNetworkException("NetWorkException", "No connection available in %s seconds" % self.pool_timeout)
+                    self.__cond.wait(remaining)
+
+    def checkin(self, conn, reusable=True):
+        with self.__cond:
+            self.__busy -= 1
+            if reusable and self.keep_alive:
+                conn.last_used_time = time.time()
+                self.__idle.append(conn)
+            else:
+                conn.close()
+            self.__cond.notify()
+
+    def __do_request(self, conn, req_inter):
+        try:
+            conn.request(req_inter.method, req_inter.uri, req_inter.data, req_inter.header)
+        except socket.timeout:
+            raise
+        except socket.error as e:
+            if e.errno in (errno.ECONNRESET, errno.EPIPE):
+                raise ConnectionClosed(e)
+            raise
+        conn.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        try:
+            return conn.getresponse()
+        except BadStatusLine as e:
+            #closed without a byte of the response, a read timeout is not retried, the request may have been handled
+            raise ConnectionClosed(e)
+
     def send_request(self, req_inter):
+        conn, reused = self.checkout()
         try:
             if self.logger:
                 self.logger.debug("SendRequest %s" % req_inter)
-            self.conn.request(req_inter.method, req_inter.uri, req_inter.data, req_inter.header)
-            self.conn.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
             try:
-                http_resp = self.conn.getresponse()
-            except BadStatusLine:
-                #open another connection when keep-alive timeout
-                #httplib will not handle keep-alive timeout, so we must handle it ourself
-                self.conn.close()
-                self.conn.request(req_inter.method, req_inter.uri, req_inter.data, req_inter.header)
-                self.conn.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
-                http_resp = self.conn.getresponse()
+                http_resp = self.__do_request(conn, req_inter)
+            except ConnectionClosed as e:
+                if not reused:
+                    raise e.error
+                #the server closed the kept-alive connection after the health check, retry on a new one
+                conn.close()
+                conn = self.new_connection()
+                try:
+                    http_resp = self.__do_request(conn, req_inter)
+                except ConnectionClosed as e:
+                    raise e.error
             headers = dict(http_resp.getheaders())
             resp_inter = ResponseInternal(status = http_resp.status, header = headers, data = http_resp.read())
             resp_inter.data = resp_inter.data.decode('utf-8')
-            self.request_size = self.conn.request_length
+            self.request_size = conn.request_length
             self.response_size = len(resp_inter.data)
-            if not self.is_keep_alive():
-                self.conn.close()
+            self.checkin(conn, not http_resp.will_close)
             if self.logger:
                 self.logger.debug("GetResponse %s" % resp_inter)
             return resp_inter
         except Exception as e:
-            self.conn.close()
+            self.checkin(conn, False)
             raise MNSClientNetworkException("NetWorkException", str(e), req_inter.get_req_id()) #raise netException
 
 class RequestInternal:
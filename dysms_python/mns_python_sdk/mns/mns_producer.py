@@ -0,0 +1,278 @@
+#coding=utf-8
+# Copyright (C) 2015, Alibaba Cloud Computing
+
+#Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated documentation files (the "Software"), to deal in the Software without restriction, including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+#The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+
+#THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+import time
+import threading
+from .mns_exception import *
+from .mns_queue import Message
+
+class SendFuture:
+    """ send()的结果
+
+        @note: result()返回的Message object包含MessageId和MessageBodyMD5,
+             : 发送失败时result()抛出最后一次发送的异常
+    """
+    def __init__(self, message):
+        self.message = message
+        self._done = threading.Event()
+        self._result = None
+        self._exception = None
+        self._callbacks = []
+        self._lock = threading.Lock()
+
+    def done(self):
+        return self._done.is_set()
+
+    def result(self, timeout=None):
+        """
+            @type timeout: float
+            @param timeout: 最长等待时间, 单位：秒, 超时抛出MNSClientException("Timeout")
+        """
+        if not self._done.wait(timeout):
+            raise MNSClientException("Timeout", "Message is not sent in %s seconds." % timeout)
+        if self._exception is not None:
+            raise self._exception
+        return self._result
+
+    def exception(self, timeout=None):
+        if not self._done.wait(timeout):
+            raise MNSClientException("Timeout", "Message is not sent in %s seconds." % timeout)
+        return self._exception
+
+    def add_done_callback(self, callback):
+        """ callback(future), 在发送线程中调用, 已完成则立即调用
+        """
+        with self._lock:
+            if not self._done.is_set():
+                self._callbacks.append(callback)
+                return
+        callback(self)
+
+    def _set(self, result=None, exception=None):
+        with self._lock:
+            self._result = result
+            self._exception = exception
+            self._done.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            try:
+                callback(self)
+            except Exception:
+                pass
+
+class QueueProducer:
+    """ 自动合并发送的队列生产者
+
+        @note: send()把消息放入缓冲区并立即返回SendFuture,
+             : 发送线程在缓冲的消息达到batch_size条、消息体达到max_bytes字节或者最早的消息等待了linger秒时,
+             : 以一次batch_send_message发送;
+             : 部分消息失败时只重发失败的消息, 最多发送max_attempts次;
+             : close()发送缓冲区中的全部消息后返回.
+    """
+    #batch_send_message单次最多16条, 消息体总大小不超过64KB
+    MAX_BATCH_SIZE = 16
+    MAX_BATCH_BYTES = 65536
+
+    def __init__(self, queue, batch_size=16, max_bytes=65536, linger=0.01, max_attempts=3, retry_backoff=0.1, logger=None):
+        """
+            @type queue: Queue object
+            @param queue: 发送的队列
+
+            @type batch_size: int
+            @param batch_size: 单次发送的最多消息条数, 不超过16
+
+            @type max_bytes: int
+            @param max_bytes: 单次发送的消息体总大小(base64编码后), 单位：字节, 不超过65536
+
+            @type linger: float
+            @param linger: 消息在缓冲区最长等待多久, 单位：秒
+
+            @type max_attempts: int
+            @param max_attempts: 每条消息最多发送次数
+
+            @type retry_backoff: float
+            @param retry_backoff: 第n次重发前等待 retry_backoff * 2^(n-1) 秒
+        """
+        self.queue = queue
+        self.batch_size = min(batch_size, QueueProducer.MAX_BATCH_SIZE)
+        self.max_bytes = min(max_bytes, QueueProducer.MAX_BATCH_BYTES)
+        self.linger = linger
+        self.max_attempts = max_attempts
+        self.retry_backoff = retry_backoff
+        self.logger = logger
+
+        self.sent = 0
+        self.failed = 0
+        self.requests = 0
+
+        self._buffer = []
+        self._buffer_bytes = 0
+        self._sending = 0
+        self._flushing = False
+        self._cond = threading.Condition()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def send(self, message):
+        """ 异步发送消息
+
+            @type message: Message object
+            @param message: 发送的Message object
+
+            @rtype: SendFuture object
+        """
+        future = SendFuture(message)
+        size = self._size(message)
+        with self._cond:
+            if self._closed:
+                raise MNSClientException("ProducerClosed", "Producer is closed.")
+            self._buffer.append((future, size, time.time()))
+            self._buffer_bytes += size
+            #the first message starts the linger timer of the sending thread
+            if len(self._buffer) == 1 or len(self._buffer) >= self.batch_size or self._buffer_bytes >= self.max_bytes:
+                self._cond.notify_all()
+        return future
+
+    def flush(self, timeout=None):
+        """ 等待已send的消息全部完成
+
+            @rtype: bool
+            @return: timeout之前全部完成返回True
+        """
+        deadline = None if timeout is None else time.time() + timeout
+        with self._cond:
+            self._flushing = True
+            self._cond.notify_all()
+            while self._buffer or self._sending:
+                remaining = None if deadline is None else deadline - time.time()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+            return True
+
+    def close(self, timeout=None):
+        """ 不再接收新消息, 发送缓冲区中的全部消息后返回
+        """
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join(timeout)
+
+    def stats(self):
+        with self._cond:
+            return {"Sent": self.sent, "Failed": self.failed, "Requests": self.requests,
+                    "Buffered": len(self._buffer)}
+
+    def _size(self, message):
+        body = message.message_body
+        if not isinstance(body, bytes):
+            body = body.encode("utf-8")
+        if self.queue.encoding:
+            return (len(body) + 2) // 3 * 4
+        return len(body)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                batch = self._next_batch()
+                while batch is None:
+                    if self._closed and not self._buffer:
+                        return
+                    self._cond.wait(self._linger_left())
+                    batch = self._next_batch()
+                self._sending += len(batch)
+            try:
+                self._send(batch)
+            finally:
+                with self._cond:
+                    self._sending -= len(batch)
+                    self._cond.notify_all()
+
+    def _linger_left(self):
+        if not self._buffer:
+            return None
+        return max(self._buffer[0][2] + self.linger - time.time(), 0.001)
+
+    def _next_batch(self):
+        """ 缓冲区可以发送时取出一批, 否则返回None
+        """
+        if not self._buffer:
+            return None
+        if not (self._closed or self._flushing or len(self._buffer) >= self.batch_size \
+                or self._buffer_bytes >= self.max_bytes or time.time() >= self._buffer[0][2] + self.linger):
+            return None
+        batch = []
+        size = 0
+        for future, message_size, buffered_at in self._buffer:
+            #a message larger than max_bytes is sent alone
+            if batch and (len(batch) == self.batch_size or size + message_size > self.max_bytes):
+                break
+            batch.append(future)
+            size += message_size
+        del self._buffer[:len(batch)]
+        self._buffer_bytes -= size
+        if not self._buffer:
+            self._flushing = False
+        return batch
+
+    def _send(self, batch):
+        attempt = 1
+        while True:
+            try:
+                self.requests += 1
+                results = self.queue.batch_send_message([future.message for future in batch])
+                self._resolve(batch, results=results)
+                return
+            except MNSServerException as e:
+                if not e.sub_errors or len(e.sub_errors) != len(batch):
+                    failed, errors = batch, [e] * len(batch)
+                else:
+                    #sub_errors are in the order of the messages, the others are sent
+                    failed, errors = [], []
+                    for future, entry in zip(batch, e.sub_errors):
+                        if "ErrorCode" in entry:
+                            failed.append(future)
+                            errors.append(MNSServerException(entry["ErrorCode"], entry["ErrorMessage"], e.request_id, e.host_id))
+                        else:
+                            result = Message()
+                            result.message_id = entry["MessageId"]
+                            result.message_body_md5 = entry["MessageBodyMD5"]
+                            self._resolve([future], results=[result])
+            except MNSClientParameterException as e:
+                self._resolve(batch, errors=[e] * len(batch))
+                return
+            except MNSExceptionBase as e:
+                failed, errors = batch, [e] * len(batch)
+
+            if attempt >= self.max_attempts:
+                if self.logger:
+                    self.logger.error("BatchSendMessage Failed QueueName:%s Count:%s Exception:%s" % \
+                        (self.queue.queue_name, len(failed), errors[0]))
+                self._resolve(failed, errors=errors)
+                return
+            if self.logger:
+                self.logger.warning("BatchSendMessage Retry QueueName:%s Count:%s Exception:%s" % \
+                    (self.queue.queue_name, len(failed), errors[0]))
+            time.sleep(self.retry_backoff * 2 ** (attempt - 1))
+            attempt += 1
+            batch = failed
+
+    def _resolve(self, futures, results=None, errors=None):
+        with self._cond:
+            if results is not None:
+                self.sent += len(futures)
+            else:
+                self.failed += len(futures)
+        for i, future in enumerate(futures):
+            if results is not None:
+                future._set(result=results[i])
+            else:
+                future._set(exception=errors[i])
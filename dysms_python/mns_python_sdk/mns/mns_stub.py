@@ -0,0 +1,513 @@
+#coding=utf-8
+# Copyright (C) 2015, Alibaba Cloud Computing
+
+#Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated documentation files (the "Software"), to deal in the Software without restriction, including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+#The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+
+#THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+""" 本地的MNS服务端, 用于测试和压测, 不访问阿里云
+
+    @note: 支持MNSClient使用的队列和主题协议:
+         :: 创建/删除队列, 获取队列属性
+         :: 发送/批量发送, 接收/批量接收(长轮询, VisibilityTimeout), 删除/批量删除, 查看/批量查看, 修改可见时间
+         :: 创建/删除主题, 订阅/取消订阅, 发布消息推送到HTTP endpoint或者队列(acs:mns:...:queues/$name)
+         : 校验请求签名, 推送的通知在指定signing_key和signing_cert时签名, 证书地址为 $url/x509_public_certificate.pem
+
+    pytest fixture: 见 tests/conftest.py 的 mns_stub 和 queue
+"""
+
+import time
+import uuid
+import base64
+import hashlib
+import hmac
+import threading
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from http.client import HTTPConnection
+    from urllib.parse import urlparse, parse_qs
+    import socketserver as SocketServer
+    import queue as Queue
+except ImportError:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from httplib import HTTPConnection
+    from urlparse import urlparse, parse_qs
+    import SocketServer
+    import Queue
+try:
+    from xml.etree import cElementTree as ElementTree
+except ImportError:
+    from xml.etree import ElementTree
+from xml.sax.saxutils import escape
+
+from .mns_xml_handler import XMLNS, local_name
+
+class StubError(Exception):
+    def __init__(self, status, code, message):
+        Exception.__init__(self, message)
+        self.status = status
+        self.code = code
+        self.message = message
+
+class StubMessage:
+    def __init__(self, body, priority, visible_time, seq):
+        self.message_id = uuid.uuid4().hex.upper()
+        self.body = body
+        self.body_md5 = hashlib.md5(body.encode("utf-8")).hexdigest().upper()
+        self.priority = priority
+        self.enqueue_time = int(time.time() * 1000)
+        self.first_dequeue_time = self.enqueue_time
+        self.dequeue_count = 0
+        self.visible_time = visible_time
+        self.receipt_handle = None
+        self.seq = seq
+
+class StubQueue:
+    def __init__(self, name, visibility_timeout=30, delay_seconds=0, polling_wait_seconds=0, maximum_message_size=65536):
+        self.name = name
+        self.visibility_timeout = visibility_timeout
+        self.delay_seconds = delay_seconds
+        self.polling_wait_seconds = polling_wait_seconds
+        self.maximum_message_size = maximum_message_size
+        self.create_time = int(time.time())
+        self.messages = {}
+        self.handles = {}
+        self.cond = threading.Condition()
+        self._seq = 0
+
+    def send(self, body, delay_seconds=None, priority=8):
+        with self.cond:
+            self._seq += 1
+            delay = self.delay_seconds if delay_seconds is None else delay_seconds
+            msg = StubMessage(body, priority, time.time() + delay, self._seq)
+            self.messages[msg.message_id] = msg
+            self.cond.notify_all()
+            return msg
+
+    def receive(self, count, wait_seconds):
+        """ 长轮询最多wait_seconds秒, 返回可见的消息, 按优先级和发送顺序
+        """
+        deadline = time.time() + wait_seconds
+        with self.cond:
+            while True:
+                now = time.time()
+                visible = sorted([msg for msg in self.messages.values() if msg.visible_time <= now],
+                                 key=lambda msg: (msg.priority, msg.seq))[:count]
+                if visible or now >= deadline:
+                    break
+                #wake up for the next message becoming visible as well
+                pending = [msg.visible_time for msg in self.messages.values()]
+                self.cond.wait(min([deadline] + pending) - now)
+            for msg in visible:
+                if msg.dequeue_count == 0:
+                    msg.first_dequeue_time = int(now * 1000)
+                msg.dequeue_count += 1
+                self._set_invisible(msg, self.visibility_timeout)
+            return visible
+
+    def peek(self, count):
+        with self.cond:
+            now = time.time()
+            return sorted([msg for msg in self.messages.values() if msg.visible_time <= now],
+                          key=lambda msg: (msg.priority, msg.seq))[:count]
+
+    def delete(self, receipt_handle):
+        with self.cond:
+            msg = self._by_handle(receipt_handle)
+            del self.messages[msg.message_id]
+            del self.handles[receipt_handle]
+
+    def change_visibility(self, receipt_handle, visibility_timeout):
+        with self.cond:
+            msg = self._by_handle(receipt_handle)
+            self._set_invisible(msg, visibility_timeout)
+            self.cond.notify_all()
+            return msg
+
+    def _set_invisible(self, msg, timeout):
+        #a new handle per receive, the old one can't delete the message any more
+        if msg.receipt_handle is not None:
+            self.handles.pop(msg.receipt_handle, None)
+        msg.receipt_handle = "%s-%s" % (msg.message_id, uuid.uuid4().hex[:12])
+        msg.visible_time = time.time() + timeout
+        self.handles[msg.receipt_handle] = msg
+
+    def _by_handle(self, receipt_handle):
+        msg = self.handles.get(receipt_handle)
+        if msg is None or msg.message_id not in self.messages:
+            raise StubError(400, "ReceiptHandleError", "The receipt handle you provide is not valid.")
+        if msg.visible_time <= time.time():
+            raise StubError(400, "MessageNotExist", "The receipt handle has expired.")
+        return msg
+
+class StubTopic:
+    def __init__(self, name):
+        self.name = name
+        self.create_time = int(time.time())
+        self.subscriptions = {}
+        self.message_count = 0
+
+class MNSStub:
+    """ 本地的MNS服务端
+
+        @note: url为 http://127.0.0.1:$port, 作为Account的host;
+             : 签名错误返回403 SignatureDoesNotMatch, credentials为{access_id: access_key};
+             : fail_send: 之后的N条(批量)发送的消息返回InternalError, 用于测试重试;
+             : notifications记录推送的结果 (subscription_name, endpoint, status)
+    """
+    def __init__(self, access_id="access_id", access_key="access_key", credentials=None, account_id="1234567890",
+                 signing_key=None, signing_cert=None, notify_workers=4, notify_retries=3):
+        self.credentials = dict(credentials or {access_id: access_key})
+        self.account_id = account_id
+        self.signing_key = signing_key
+        self.signing_cert = signing_cert
+        self.notify_retries = notify_retries
+        self.queues = {}
+        self.topics = {}
+        self.notifications = []
+        self.fail_send = 0
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._notify_tasks = Queue.Queue()
+
+        self.server = StubHTTPServer(("127.0.0.1", 0), StubRequestHandler)
+        self.server.stub = self
+        self.url = "http://127.0.0.1:%s" % self.server.server_port
+        self._threads = [threading.Thread(target=self.server.serve_forever)]
+        self._threads += [threading.Thread(target=self._notify) for i in range(notify_workers)]
+        for thread in self._threads:
+            thread.daemon = True
+
+    def start(self):
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+        for i in range(len(self._threads) - 1):
+            self._notify_tasks.put(None)
+        for thread in self._threads:
+            thread.join()
+
+    def create_queue(self, name, **attrs):
+        """ attrs: visibility_timeout, delay_seconds, polling_wait_seconds, maximum_message_size
+        """
+        with self._lock:
+            if name not in self.queues:
+                self.queues[name] = StubQueue(name, **attrs)
+            return self.queues[name]
+
+    def create_topic(self, name):
+        with self._lock:
+            if name not in self.topics:
+                self.topics[name] = StubTopic(name)
+            return self.topics[name]
+
+    def subscribe(self, topic_name, subscription_name, endpoint, filter_tag="", notify_content_format="XML"):
+        topic = self.create_topic(topic_name)
+        topic.subscriptions[subscription_name] = {"Endpoint": endpoint, "FilterTag": filter_tag,
+                                                  "NotifyContentFormat": notify_content_format or "XML",
+                                                  "CreateTime": int(time.time())}
+
+    def queue(self, name):
+        queue = self.queues.get(name)
+        if queue is None:
+            raise StubError(404, "QueueNotExist", "The queue name you provided is not exist.")
+        return queue
+
+    def topic(self, name):
+        topic = self.topics.get(name)
+        if topic is None:
+            raise StubError(404, "TopicNotExist", "The topic name you provided is not exist.")
+        return topic
+
+    def check_signature(self, method, path, headers):
+        authorization = headers.get("authorization", "")
+        if not authorization.startswith("MNS ") or ":" not in authorization:
+            raise StubError(403, "AccessDenied", "No authorization.")
+        access_id, signature = authorization[4:].rsplit(":", 1)
+        access_key = self.credentials.get(access_id)
+        if access_key is None:
+            raise StubError(403, "InvalidAccessKeyId", "The access id you provided is not exist.")
+        mns_headers = "".join(["%s:%s\n" % (k, headers[k]) for k in sorted(headers.keys()) if k.startswith("x-mns-")])
+        string_to_sign = "%s\n%s\n%s\n%s\n%s%s" % (method, headers.get("content-md5", ""), headers.get("content-type", ""),
+                                                  headers.get("date", ""), mns_headers, path)
+        expected = base64.b64encode(hmac.new(access_key.encode("utf-8"), string_to_sign.encode("utf-8"), hashlib.sha1).digest())
+        #compare_digest takes two str or two bytes, on python 2 the header is a str and a decoded value is unicode
+        if not isinstance(signature, bytes):
+            signature = signature.encode("utf-8")
+        if not hmac.compare_digest(expected, signature):
+            raise StubError(403, "SignatureDoesNotMatch", "The request signature we calculated does not match the signature you provided.")
+
+    def publish(self, topic, body, tag):
+        topic.message_count += 1
+        message_id = uuid.uuid4().hex.upper()
+        md5 = hashlib.md5(body.encode("utf-8")).hexdigest().upper()
+        publish_time = int(time.time() * 1000)
+        for name, subscription in list(topic.subscriptions.items()):
+            if subscription["FilterTag"] and subscription["FilterTag"] != tag:
+                continue
+            self._notify_tasks.put((topic.name, name, subscription, message_id, md5, body, tag, publish_time))
+        return message_id, md5
+
+    def _notify(self):
+        while True:
+            task = self._notify_tasks.get()
+            if task is None:
+                return
+            topic_name, name, subscription, message_id, md5, body, tag, publish_time = task
+            endpoint = subscription["Endpoint"]
+            if subscription["NotifyContentFormat"] == "SIMPLIFIED":
+                data = body
+            else:
+                items = [("TopicOwner", self.account_id), ("TopicName", topic_name), ("Subscriber", self.account_id),
+                         ("SubscriptionName", name), ("MessageId", message_id), ("MessageMD5", md5),
+                         ("MessageTag", tag), ("Message", body), ("PublishTime", publish_time)]
+                data = to_xml("Notification", items)
+            if ":queues/" in endpoint:
+                #the body is put as is, receive with queue.set_encoding(False)
+                queue = self.queues.get(endpoint.rsplit("/", 1)[-1])
+                status = 201 if queue is not None else 404
+                if queue is not None:
+                    queue.send(data)
+                self.notifications.append((name, endpoint, status))
+                continue
+            status = None
+            for attempt in range(self.notify_retries):
+                try:
+                    status = self._post(endpoint, data)
+                except Exception:
+                    status = None
+                if status is not None and 200 <= status < 300:
+                    break
+                time.sleep(0.1 * 2 ** attempt)
+            self.notifications.append((name, endpoint, status))
+
+    def _post(self, endpoint, data):
+        url = urlparse(endpoint)
+        path = url.path or "/"
+        headers = {"content-type": "text/xml;charset=utf-8",
+                   "date": time.strftime("%a, %d %b %Y %H:%M:%S GMT", time.gmtime()),
+                   "x-mns-request-id": uuid.uuid4().hex.upper(),
+                   "x-mns-version": "2015-06-06",
+                   "x-mns-signing-cert-url": base64.b64encode(("%s/x509_public_certificate.pem" % self.url).encode("utf-8")).decode("utf-8")}
+        headers["Authorization"] = self._sign_notification("POST", path, headers)
+        conn = HTTPConnection(url.hostname, url.port or 80, timeout=10)
+        try:
+            conn.request("POST", path, data.encode("utf-8"), headers)
+            resp = conn.getresponse()
+            resp.read()
+            return resp.status
+        finally:
+            conn.close()
+
+    def _sign_notification(self, method, path, headers):
+        if self.signing_key is None:
+            return ""
+        from Crypto.PublicKey import RSA
+        from Crypto.Signature import PKCS1_v1_5
+        from Crypto.Hash import SHA
+        service_str = "\n".join(sorted(["%s:%s" % (k, v) for k, v in headers.items() if k.startswith("x-mns-")]))
+        str2sign = u"%s\n%s\n%s\n%s\n%s\n%s" % (method, headers.get("content-md5", ""), headers["content-type"],
+                                                headers["date"], service_str, path)
+        signer = PKCS1_v1_5.new(RSA.importKey(self.signing_key))
+        return base64.b64encode(signer.sign(SHA.new(str2sign.encode("utf-8")))).decode("utf-8")
+
+class StubHTTPServer(SocketServer.ThreadingMixIn, HTTPServer):
+    #a thread per connection, receive requests block for up to 30s of long polling
+    daemon_threads = True
+
+class StubRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    wbufsize = -1
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self.handle_request("GET")
+
+    def do_PUT(self):
+        self.handle_request("PUT")
+
+    def do_POST(self):
+        self.handle_request("POST")
+
+    def do_DELETE(self):
+        self.handle_request("DELETE")
+
+    def handle_request(self, method):
+        stub = self.server.stub
+        stub.requests += 1
+        self.request_id = uuid.uuid4().hex.upper()
+        length = int(self.headers.get("content-length") or 0)
+        body = self.rfile.read(length).decode("utf-8") if length else ""
+        url = urlparse(self.path)
+        parts = [part for part in url.path.split("/") if part]
+        query = dict((k, v[0]) for k, v in parse_qs(url.query).items())
+        try:
+            if method == "GET" and parts == ["x509_public_certificate.pem"] and stub.signing_cert:
+                return self.reply(200, stub.signing_cert, content_type="text/plain")
+            headers = dict((k.lower(), v) for k, v in self.headers.items())
+            stub.check_signature(method, self.path, headers)
+            root = ElementTree.fromstring(body.encode("utf-8")) if body else None
+            if len(parts) >= 2 and parts[0] == "queues":
+                self.handle_queue(stub, method, parts[1], parts[2:], query, root)
+            elif len(parts) >= 2 and parts[0] == "topics":
+                self.handle_topic(stub, method, parts[1], parts[2:], root)
+            else:
+                raise StubError(400, "InvalidArgument", "Unsupported resource: %s" % url.path)
+        except StubError as e:
+            self.reply(e.status, to_xml("Error", [("Code", e.code), ("Message", e.message),
+                                                  ("RequestId", self.request_id), ("HostId", stub.url)]))
+        except ElementTree.ParseError as e:
+            self.reply(400, to_xml("Error", [("Code", "MalformedXML"), ("Message", str(e)),
+                                             ("RequestId", self.request_id), ("HostId", stub.url)]))
+
+    def handle_queue(self, stub, method, name, rest, query, root):
+        if not rest:
+            if method == "PUT":
+                attrs = xml_items(root)
+                stub.create_queue(name, **dict((key, int(attrs[tag])) for tag, key in
+                                               [("VisibilityTimeout", "visibility_timeout"), ("DelaySeconds", "delay_seconds"),
+                                                ("PollingWaitSeconds", "polling_wait_seconds"),
+                                                ("MaximumMessageSize", "maximum_message_size")] if tag in attrs))
+                return self.reply(201, "", location="%s/queues/%s" % (stub.url, name))
+            if method == "DELETE":
+                stub.queues.pop(name, None)
+                return self.reply(204, "")
+            queue = stub.queue(name)
+            with queue.cond:
+                now = time.time()
+                active = len([msg for msg in queue.messages.values() if msg.visible_time <= now])
+                inactive = len([msg for msg in queue.messages.values() if msg.receipt_handle and msg.visible_time > now])
+                delayed = len(queue.messages) - active - inactive
+            return self.reply(200, to_xml("Queue", [
+                ("QueueName", name), ("ActiveMessages", active), ("InactiveMessages", inactive),
+                ("DelayMessages", delayed), ("CreateTime", queue.create_time), ("LastModifyTime", queue.create_time),
+                ("MaximumMessageSize", queue.maximum_message_size), ("MessageRetentionPeriod", 345600),
+                ("VisibilityTimeout", queue.visibility_timeout), ("DelaySeconds", queue.delay_seconds),
+                ("PollingWaitSeconds", queue.polling_wait_seconds), ("LoggingEnabled", "False")]))
+
+        queue = stub.queue(name)
+        if method == "POST":
+            if local_name(root.tag) == "Message":
+                msg = self.send_message(stub, queue, xml_items(root))
+                return self.reply(201, to_xml("Message", [("MessageId", msg.message_id), ("MessageBodyMD5", msg.body_md5)]))
+            results = []
+            failed = False
+            for item in root:
+                if stub.fail_send > 0:
+                    stub.fail_send -= 1
+                    failed = True
+                    results.append([("ErrorCode", "InternalError"), ("ErrorMessage", "Injected failure.")])
+                    continue
+                msg = self.send_message(stub, queue, xml_items(item))
+                results.append([("MessageId", msg.message_id), ("MessageBodyMD5", msg.body_md5)])
+            return self.reply(500 if failed else 201, to_xml_list("Messages", "Message", results))
+
+        if method == "GET":
+            count = int(query.get("numOfMessages", 1))
+            if query.get("peekonly") == "true":
+                messages = queue.peek(count)
+            else:
+                wait = int(query.get("waitseconds", queue.polling_wait_seconds))
+                messages = queue.receive(count, wait)
+            if not messages:
+                raise StubError(404, "MessageNotExist", "Message not exist.")
+            entries = [self.message_items(msg, query.get("peekonly") == "true") for msg in messages]
+            if "numOfMessages" in query:
+                return self.reply(200, to_xml_list("Messages", "Message", entries))
+            return self.reply(200, to_xml("Message", entries[0]))
+
+        if method == "DELETE":
+            if "ReceiptHandle" in query:
+                queue.delete(query["ReceiptHandle"])
+                return self.reply(204, "")
+            errors = []
+            for item in root:
+                try:
+                    queue.delete(item.text)
+                except StubError as e:
+                    errors.append([("ErrorCode", e.code), ("ErrorMessage", e.message), ("ReceiptHandle", item.text)])
+            if errors:
+                return self.reply(404, to_xml_list("Errors", "Error", errors))
+            return self.reply(204, "")
+
+        if method == "PUT":
+            msg = queue.change_visibility(query["ReceiptHandle"], int(query["VisibilityTimeout"]))
+            return self.reply(200, to_xml("ChangeVisibility", [("ReceiptHandle", msg.receipt_handle),
+                                                               ("NextVisibleTime", int(msg.visible_time * 1000))]))
+
+    def send_message(self, stub, queue, items):
+        delay = int(items["DelaySeconds"]) if "DelaySeconds" in items else None
+        return queue.send(items.get("MessageBody", ""), delay, int(items.get("Priority", 8)))
+
+    def message_items(self, msg, peek):
+        items = [("MessageId", msg.message_id), ("MessageBody", msg.body), ("MessageBodyMD5", msg.body_md5),
+                 ("EnqueueTime", msg.enqueue_time), ("FirstDequeueTime", msg.first_dequeue_time),
+                 ("DequeueCount", msg.dequeue_count), ("Priority", msg.priority)]
+        if not peek:
+            items += [("ReceiptHandle", msg.receipt_handle), ("NextVisibleTime", int(msg.visible_time * 1000))]
+        return items
+
+    def handle_topic(self, stub, method, name, rest, root):
+        if not rest:
+            if method == "PUT":
+                stub.create_topic(name)
+                return self.reply(201, "", location="%s/topics/%s" % (stub.url, name))
+            if method == "DELETE":
+                stub.topics.pop(name, None)
+                return self.reply(204, "")
+            topic = stub.topic(name)
+            return self.reply(200, to_xml("Topic", [
+                ("TopicName", name), ("MessageCount", topic.message_count), ("CreateTime", topic.create_time),
+                ("LastModifyTime", topic.create_time), ("MaximumMessageSize", 65536),
+                ("MessageRetentionPeriod", 86400), ("LoggingEnabled", "False")]))
+
+        topic = stub.topic(name)
+        if rest == ["messages"] and method == "POST":
+            items = xml_items(root)
+            message_id, md5 = stub.publish(topic, items.get("MessageBody", ""), items.get("MessageTag", ""))
+            return self.reply(201, to_xml("Message", [("MessageId", message_id), ("MessageBodyMD5", md5)]))
+
+        if len(rest) == 2 and rest[0] == "subscriptions":
+            if method == "PUT":
+                items = xml_items(root)
+                stub.subscribe(name, rest[1], items.get("Endpoint", ""), items.get("FilterTag", ""),
+                               items.get("NotifyContentFormat", "XML"))
+                return self.reply(201, "", location="%s/topics/%s/subscriptions/%s" % (stub.url, name, rest[1]))
+            if method == "DELETE":
+                topic.subscriptions.pop(rest[1], None)
+                return self.reply(204, "")
+        raise StubError(400, "InvalidArgument", "Unsupported topic operation.")
+
+    def reply(self, status, data, content_type="text/xml;charset=utf-8", location=None):
+        data = data.encode("utf-8")
+        self.send_response(status)
+        self.send_header("x-mns-request-id", self.request_id)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        if location:
+            self.send_header("Location", location)
+        self.end_headers()
+        self.wfile.write(data)
+
+def xml_items(element):
+    if element is None:
+        return {}
+    return dict((local_name(child.tag), child.text or "") for child in element)
+
+def to_xml(tag_name, items):
+    fields = "".join(["<%s>%s</%s>" % (k, escape(u"%s" % v), k) for k, v in items])
+    return u'<?xml version="1.0" encoding="UTF-8"?>\n<%s xmlns="%s">%s</%s>' % (tag_name, XMLNS, fields, tag_name)
+
+def to_xml_list(tag_name1, tag_name2, entries):
+    inner = "".join(["<%s>%s</%s>" % (tag_name2, "".join(["<%s>%s</%s>" % (k, escape(u"%s" % v), k) for k, v in items]), tag_name2)
+                     for items in entries])
+    return u'<?xml version="1.0" encoding="UTF-8"?>\n<%s xmlns="%s">%s</%s>' % (tag_name1, XMLNS, inner, tag_name1)
@@ -12,6 +12,10 @@ import base64
 import string
 import types
 from xml.etree import ElementTree
+try:
+    from xml.etree import cElementTree as FastElementTree
+except ImportError:
+    FastElementTree = ElementTree
 from .mns_exception import *
 from .mns_request import *
 try:
@@ -199,6 +203,20 @@ class SubscriptionEncoder(EncoderBase):
 
 #-------------------------------------------------decode-----------------------------------------------------#
 class DecoderBase:
+    """ 解析返回的xml
+
+        @note: parser 可选:
+        :: "etree": xml.etree.cElementTree, 默认
+        :: "minidom": xml.dom.minidom, 构造完整的DOM, 较慢
+    """
+    parser = "etree"
+
+    @staticmethod
+    def set_parser(parser):
+        if parser not in ("etree", "minidom"):
+            raise MNSClientParameterException("ParserInvalid", "Bad value: '%s', expect 'etree' or 'minidom'." % parser)
+        DecoderBase.parser = parser
+
     @staticmethod
     def xml_to_nodes(tag_name, xml_data):
         if xml_data == "":
@@ -215,9 +233,31 @@ class DecoderBase:
 
         return nodelist[0].childNodes
 
+    @staticmethod
+    def xml_to_element(tag_name, xml_data):
+        """ 与xml_to_nodes相同, 返回第一个tag_name元素(忽略namespace)
+        """
+        if xml_data == "":
+            raise MNSClientNetworkException("RespDataDamaged", "Xml data is \"\"!")
+
+        try:
+            #parse bytes, the declared encoding is utf-8
+            root = FastElementTree.fromstring(xml_data.encode('utf-8') if not isinstance(xml_data, bytes) else xml_data)
+        except Exception:
+            raise MNSClientNetworkException("RespDataDamaged", xml_data)
+
+        for element in root.iter():
+            if local_name(element.tag) == tag_name:
+                return element
+        raise MNSClientNetworkException("RespDataDamaged", "No element with tag name '%s'.\nData:%s" % (tag_name, xml_data))
+
     @staticmethod
     def xml_to_dic(tag_name, xml_data, data_dic, req_id=None):
         try:
+            if DecoderBase.parser == "etree":
+                for element in DecoderBase.xml_to_element(tag_name, xml_data):
+                    data_dic[local_name(element.tag)] = element.text or ""
+                return
             for node in DecoderBase.xml_to_nodes(tag_name, xml_data):
                 if node.nodeName != "#text":
                     if node.childNodes != []:
@@ -230,6 +270,16 @@ class DecoderBase:
     @staticmethod
     def xml_to_listofdic(root_tagname, sec_tagname, xml_data, data_listofdic, req_id=None):
         try:
+            if DecoderBase.parser == "etree":
+                for message in DecoderBase.xml_to_element(root_tagname, xml_data):
+                    if local_name(message.tag) != sec_tagname:
+                        continue
+                    data_dic = {}
+                    for property in message:
+                        if property.text:
+                            data_dic[local_name(property.tag)] = property.text
+                    data_listofdic.append(data_dic)
+                return
             for message in DecoderBase.xml_to_nodes(root_tagname, xml_data):
                 if message.nodeName != sec_tagname:
                     continue
@@ -239,9 +289,14 @@ class DecoderBase:
                     if property.nodeName != "#text" and property.childNodes != []:
                         data_dic[property.nodeName] = property.firstChild.data
                 data_listofdic.append(data_dic)
-        except MNSClientNetworkException:
+        except MNSClientNetworkException as e:
             raise MNSClientNetworkException(e.type, e.message, req_id)
 
+def local_name(tag):
+    """ "{http://mns.aliyuncs.com/doc/v1/}Message" -> "Message"
+    """
+    return tag.rsplit("}", 1)[-1]
+
 class ListQueueDecoder(DecoderBase):
     @staticmethod
     def decode(xml_data, with_meta, req_id=None):
@@ -315,7 +370,6 @@ class BatchSendMessageDecoder(DecoderBase):
     def decode(xml_data, req_id=None):
         data_listofdic = []
         message_list = []
-        print(xml_data)
         DecoderBase.xml_to_listofdic("Messages", "Message", xml_data, data_listofdic, req_id)
         try:
             for data_dic in data_listofdic:
@@ -370,7 +424,6 @@ class RecvMessageDecoder(DecoderBase):
 class BatchRecvMessageDecoder(DecoderBase):
     @staticmethod
     def decode(xml_data, base64decode, req_id=None):
-        print(xml_data)
         data_listofdic = []
         message_list = []
         DecoderBase.xml_to_listofdic("Messages", "Message", xml_data, data_listofdic, req_id)
@@ -412,7 +465,6 @@ class PeekMessageDecoder(DecoderBase):
 class BatchPeekMessageDecoder(DecoderBase):
     @staticmethod
     def decode(xml_data, base64decode, req_id=None):
-        print(xml_data)
         data_listofdic = []
         message_list = []
         DecoderBase.xml_to_listofdic("Messages", "Message", xml_data, data_listofdic, req_id)
@@ -0,0 +1,48 @@
+#!/usr/bin/env python
+#coding=utf8
+# Copyright (C) 2015, Alibaba Cloud Computing
+
+#Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated documentation files (the "Software"), to deal in the Software without restriction, including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+#The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+
+#THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#producer/consumer throughput against the local MNS stub, no account needed
+#usage: python benchqueue.py [MessageCount] [Workers]
+
+import sys
+import os
+import time
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)) + "/..")
+from mns.mns_account import Account
+from mns.mns_queue import *
+from mns.mns_stub import MNSStub
+from mns.mns_producer import QueueProducer
+from mns.mns_consumer import QueueConsumer
+
+count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+workers = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+
+stub = MNSStub("id", "key").start()
+stub.create_queue("bench")
+my_queue = Account(stub.url, "id", "key").get_queue("bench")
+print("Stub:%s Messages:%s Workers:%s" % (stub.url, count, workers))
+
+start = time.time()
+producer = QueueProducer(my_queue)
+for i in range(count):
+    producer.send(Message("bench message %s" % i))
+producer.close()
+elapsed = time.time() - start
+print("Produce  %.1f msg/s Requests:%s" % (count / elapsed, producer.stats()["Requests"]))
+
+start = time.time()
+consumer = QueueConsumer(my_queue, lambda msg: None, workers=workers, wait_seconds=1).start()
+while consumer.stats()["Deleted"] < count:
+    time.sleep(0.05)
+elapsed = time.time() - start
+consumer.stop()
+print("Consume  %.1f msg/s" % (count / elapsed))
+print("Stub Requests:%s" % stub.requests)
+stub.stop()
@@ -0,0 +1,57 @@
+#!/usr/bin/env python
+#coding=utf8
+# Copyright (C) 2015, Alibaba Cloud Computing
+
+#Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated documentation files (the "Software"), to deal in the Software without restriction, including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+#The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+
+#THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+#compare the xml parsers of the decoders on batch receive responses, no account needed
+#usage: python benchxmldecoder.py [MessageCount] [BodySize] [Rounds]
+
+import sys
+import os
+import time
+import base64
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)) + "/..")
+from mns.mns_xml_handler import DecoderBase, BatchRecvMessageDecoder
+
+MESSAGE = """<Message>
+<MessageId>5F290C926D472878-2-14D9529A8FA-200000%(i)03d</MessageId>
+<ReceiptHandle>1-ODU4OTkzNDU5My0xNDM1MTk3NjAwLTItMTA=%(i)03d</ReceiptHandle>
+<MessageBodyMD5>C5DD56A39F5F7BB8B3337C6D11B6D8C7</MessageBodyMD5>
+<MessageBody>%(body)s</MessageBody>
+<EnqueueTime>1250700979248</EnqueueTime>
+<NextVisibleTime>1250700799348</NextVisibleTime>
+<FirstDequeueTime>1250700779318</FirstDequeueTime>
+<DequeueCount>1</DequeueCount>
+<Priority>8</Priority>
+</Message>"""
+
+def build_payload(count, body_size):
+    body = base64.b64encode(os.urandom(body_size)).decode("ascii")
+    messages = "".join([MESSAGE % {"i": i, "body": body} for i in range(count)])
+    return u'<?xml version="1.0" encoding="UTF-8"?>\n<Messages xmlns="http://mns.aliyuncs.com/doc/v1/">%s</Messages>' % messages
+
+def bench(parser, payload, rounds):
+    DecoderBase.set_parser(parser)
+    start = time.time()
+    for i in range(rounds):
+        messages = BatchRecvMessageDecoder.decode(payload, True)
+    return time.time() - start, [msg.__dict__ for msg in messages]
+
+count = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+body_size = int(sys.argv[2]) if len(sys.argv) > 2 else 4096
+rounds = int(sys.argv[3]) if len(sys.argv) > 3 else 200
+
+payload = build_payload(count, body_size)
+print("Messages:%s BodySize:%s PayloadSize:%s Rounds:%s" % (count, body_size, len(payload), rounds))
+results = {}
+for parser in ["minidom", "etree"]:
+    elapsed, results[parser] = bench(parser, payload, rounds)
+    print("%-8s %.2fms/response" % (parser, elapsed * 1000 / rounds))
+DecoderBase.set_parser("etree")
+assert results["minidom"] == results["etree"], "the parsers decoded differently"
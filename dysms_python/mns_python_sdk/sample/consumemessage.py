@@ -0,0 +1,49 @@
+#!/usr/bin/env python
+#coding=utf8
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)) + "/..")
+
+import time
+from sample_common import MNSSampleCommon
+from mns.mns_account import Account
+from mns.mns_consumer import QueueConsumer
+
+
+#从sample.cfg中读取基本配置信息
+## WARNING： Please do not hard code your accessId and accesskey in next line.(more information: https://yq.aliyun.com/articles/55947)
+accid,acckey,endpoint,token = MNSSampleCommon.LoadConfig()
+
+#初始化 my_account, my_queue
+my_account = Account(endpoint, accid, acckey, token)
+queue_name = MNSSampleCommon.LoadIndexParam(1)
+if not queue_name:
+    print("Error: get parameter failed")
+    sys.exit(0)
+
+workers = MNSSampleCommon.LoadIndexParam(2)
+workers = int(workers) if workers else 4
+
+my_queue = my_account.get_queue(queue_name)
+
+#多线程消费消息, 每次batch receive 16条消息, 处理完成后合并batch delete
+#每5秒输出一次吞吐量, Ctrl+C 停止消费, 处理中的消息完成并删除后退出
+
+def handler(msg):
+    #TODO 业务处理, 抛出异常的消息不会被删除
+    pass
+
+consumer = QueueConsumer(my_queue, handler, workers=workers, batch_size=16, wait_seconds=3).start()
+print("%sConsume Message From Queue%s\nQueueName:%s\nWorkers:%s\n" % (10*"=", 10*"=", queue_name, workers))
+last = consumer.stats()
+try:
+    while True:
+        time.sleep(5)
+        stats = consumer.stats()
+        print("Handled:%s Failed:%s Deleted:%s Pending:%s %.1f msg/s" % \
+                (stats["Handled"], stats["Failed"], stats["Deleted"], stats["Pending"], (stats["Handled"] - last["Handled"]) / 5.0))
+        last = stats
+except KeyboardInterrupt:
+    consumer.stop()
+    print("Consumer Stopped! %s" % consumer.stats())
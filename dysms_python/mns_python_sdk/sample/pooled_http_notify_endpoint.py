@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+#coding=utf8
+# Copyright (C) 2015, Alibaba Cloud Computing
+
+#Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated documentation files (the "Software"), to deal in the Software without restriction, including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+#The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+
+#THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+import sys
+import logging
+import logging.handlers
+
+from sample_common import MNSSampleCommon
+import server
+
+_LOGGER = logging.getLogger(__name__)
+
+#高并发的HTTP endpoint: 固定数量的工作线程, keep-alive, 校验通过的消息分批交给handler
+#GET http://$ip:$port/metrics 查看 accepted/rejected 计数和队列长度
+
+def handler(messages):
+    #TODO 业务处理, 例如批量更新短信回执状态; 抛出异常时这批消息返回500, MNS会重新推送,
+    #同一条消息可能收到多次, 按message_id去重
+    _LOGGER.info("Received %s notify messages" % len(messages))
+
+def main(ip_addr, port, workers=16, msg_type=u"XML", cert_urls=()):
+    #init logger
+    log_file = "endpoint_log.%s" % port
+    logger = logging.getLogger()
+    file_handler = logging.handlers.RotatingFileHandler(log_file, maxBytes=100*1024*1024)
+    formatter = logging.Formatter('[%(asctime)s] [%(name)s] [%(levelname)s] [%(filename)s:%(lineno)d] [%(thread)d] %(message)s', '%Y-%m-%d %H:%M:%S')
+    file_handler.setFormatter(formatter)
+    logger.addHandler(file_handler)
+    logger.setLevel(logging.INFO)
+
+    server.PooledNotifyEndpoint.msg_type = msg_type
+    server.PooledNotifyEndpoint.signing_cert_cache.prefetch(cert_urls)
+    httpd, dispatcher = server.make_pooled_server(ip_addr, port, handler, workers=workers,
+                                                  access_log_file="access_log.%s" % port)
+
+    #start endpoint
+    addr_info = "Start Endpoint! Address: http://%s:%s Workers: %s" % (ip_addr, port, workers)
+    print(addr_info)
+    try:
+        logger.info(addr_info)
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        print("Shutting down the pooled notify endpoint!")
+        httpd.server_close()
+        dispatcher.stop()
+
+if __name__ == "__main__":
+    ip_addr = MNSSampleCommon.LoadIndexParam(1)
+    if not ip_addr:
+        print("ERROR: Must specify IP Address")
+        sys.exit(0)
+
+    para_port = MNSSampleCommon.LoadIndexParam(2)
+    port = int(para_port) if para_port else 8080
+    para_workers = MNSSampleCommon.LoadIndexParam(3)
+    workers = int(para_workers) if para_workers else 16
+    #comma separated, e.g. https://mnstest.oss-cn-hangzhou.aliyuncs.com/x509_public_certificate.pem
+    cert_urls = MNSSampleCommon.LoadIndexParam(4)
+    cert_urls = cert_urls.split(",") if cert_urls else ()
+    main(ip_addr, port, workers, u"XML", cert_urls)
@@ -0,0 +1,43 @@
+#!/usr/bin/env python
+#coding=utf8
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)) + "/..")
+
+import time
+from sample_common import MNSSampleCommon
+from mns.mns_account import Account
+from mns.mns_queue import *
+from mns.mns_producer import QueueProducer
+
+
+#从sample.cfg中读取基本配置信息
+## WARNING： Please do not hard code your accessId and accesskey in next line.(more information: https://yq.aliyun.com/articles/55947)
+accid,acckey,endpoint,token = MNSSampleCommon.LoadConfig()
+
+#初始化 my_account, my_queue
+my_account = Account(endpoint, accid, acckey, token)
+queue_name = MNSSampleCommon.LoadIndexParam(1)
+if not queue_name:
+    print("Error: get parameter failed")
+    sys.exit(0)
+
+count = MNSSampleCommon.LoadIndexParam(2)
+count = int(count) if count else 1000
+
+my_queue = my_account.get_queue(queue_name)
+
+#send立即返回, 缓冲的消息满16条或等待超过linger秒后以一次batch send发送
+print("%sSend Message To Queue%s\nQueueName:%s\nMessageCount:%s\n" % (10*"=", 10*"=", queue_name, count))
+producer = QueueProducer(my_queue, linger=0.01)
+start = time.time()
+futures = [producer.send(Message("I am test message %s." % i)) for i in range(count)]
+producer.close()
+elapsed = time.time() - start
+
+failed = [future for future in futures if future.exception() is not None]
+for future in failed[:10]:
+    print("Send Message Fail! Exception:%s" % future.exception())
+stats = producer.stats()
+print("Sent:%s Failed:%s Requests:%s %.1f msg/s" % (stats["Sent"], stats["Failed"], stats["Requests"], count / elapsed))
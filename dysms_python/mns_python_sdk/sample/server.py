@@ -10,14 +10,19 @@
 
 import sys
 import cgi
+import time
 import shutil
+import threading
 import socket
 import base64
 import logging
+from collections import OrderedDict
 try:
     from urllib.request import urlopen
+    from urllib.parse import urlparse
 except ImportError:
     from urllib2 import urlopen
+    from urlparse import urlparse
 except Exception as err:
     raise(err)
 #import M2Crypto
@@ -29,6 +34,14 @@ except Exception as err:
 
 import logging.handlers
 import xml.dom.minidom
+try:
+    from xml.etree import cElementTree as ElementTree
+except ImportError:
+    from xml.etree import ElementTree
+try:
+    import queue as Queue
+except ImportError:
+    import Queue
 #import BaseHTTPServer
 try:
     from http.server import BaseHTTPRequestHandler, HTTPServer
@@ -48,11 +61,90 @@ from sample_common import MNSSampleCommon
 __version__ = "1.0.3"
 _LOGGER = logging.getLogger(__name__)
 
+def load_public_key(cert_str):
+    """ 从PEM格式的X.509证书中取出RSA公钥
+    """
+    from Crypto.Util.asn1 import DerSequence
+    from Crypto.PublicKey import RSA
+    from binascii import a2b_base64
+
+    # Convert from PEM to DER
+    lines = cert_str.replace(" ",'').split()
+    der = a2b_base64(''.join(lines[1:-1]))
+
+    # Extract subjectPublicKeyInfo field from X.509 certificate (see RFC3280)
+    cert = DerSequence()
+    cert.decode(der)
+    tbsCertificate = DerSequence()
+    tbsCertificate.decode(cert[0])
+    subjectPublicKeyInfo = tbsCertificate[6]
+
+    # Initialize RSA key
+    return RSA.importKey(subjectPublicKeyInfo)
+
+class SigningCertCache:
+    """ 按URL缓存签名证书的公钥
+
+        @note: 只下载allowed_hosts上(完全匹配, 不含子域名)以schemes访问的证书, 公钥缓存ttl秒;
+             : 任何阿里云用户都能在 <bucket>.oss-<region>.aliyuncs.com 上放自己的证书, 所以不能按域名后缀放行;
+             : 最多缓存max_entries个URL, 同一URL同时只下载一次, 下载失败时继续使用过期的公钥;
+             : prefetch在启动时下载已知的证书, 避免第一批通知等待下载.
+    """
+    def __init__(self, ttl=3600, allowed_hosts=("mnstest.oss-cn-hangzhou.aliyuncs.com",), schemes=("https",),
+                 timeout=5, max_entries=16):
+        self.ttl = ttl
+        self.allowed_hosts = allowed_hosts
+        self.schemes = schemes
+        self.timeout = timeout
+        self.max_entries = max_entries
+        self._keys = OrderedDict()
+        #a fixed set of locks picked by the URL hash, the URLs don't add locks
+        self._locks = [threading.Lock() for i in range(16)]
+        self._lock = threading.Lock()
+
+    def is_allowed(self, url):
+        parsed = urlparse(url)
+        host = (parsed.hostname or "").lower()
+        return parsed.scheme in self.schemes and host in self.allowed_hosts
+
+    def get_key(self, url):
+        """ 返回url证书的公钥, url不在allowed_hosts中或者下载失败时返回None
+        """
+        entry = self._keys.get(url)
+        if entry is not None and entry[1] > time.time():
+            return entry[0]
+        if not self.is_allowed(url):
+            _LOGGER.warning("Signing cert url not allowed: %s" % url)
+            return None
+
+        with self._locks[hash(url) % len(self._locks)]:
+            entry = self._keys.get(url)
+            if entry is not None and entry[1] > time.time():
+                return entry[0]
+            try:
+                cert_str = urlopen(url, timeout=self.timeout).read().decode('utf-8')
+                key = load_public_key(cert_str)
+            except Exception as e:
+                _LOGGER.error("Load signing cert fail, url:%s exception:%s" % (url, e))
+                return entry[0] if entry is not None else None
+            with self._lock:
+                self._keys.pop(url, None)
+                self._keys[url] = (key, time.time() + self.ttl)
+                while len(self._keys) > self.max_entries:
+                    self._keys.popitem(last=False)
+            return key
+
+    def prefetch(self, urls):
+        for url in urls:
+            if self.get_key(url) is not None:
+                _LOGGER.info("Prefetched signing cert: %s" % url)
+
 #class SimpleHttpNotifyEndpoint(BaseHTTPServer.BaseHTTPRequestHandler):
 class SimpleHttpNotifyEndpoint(BaseHTTPRequestHandler):
     server_version = "SimpleHttpNotifyEndpoint/" + __version__
     access_log_file = "access_log"
     msg_type = "XML"
+    signing_cert_cache = SigningCertCache()
 
     def do_POST(self):
         #content_length = int(self.headers.getheader('content-length', 0))
@@ -90,28 +182,13 @@ class SimpleHttpNotifyEndpoint(BaseHTTPRequestHandler):
         #authorization = self.headers.getheader('Authorization')
         authorization = self.headers['Authorization']
         signature = base64.b64decode(authorization)
-        cert = urlopen(base64.b64decode(self.headers['x-mns-signing-cert-url']).decode('utf-8')).read()
-        cert_str = cert.decode('utf-8')
+        key = self.signing_cert_cache.get_key(base64.b64decode(self.headers['x-mns-signing-cert-url']).decode('utf-8'))
+        if key is None:
+            return False
 
-        from Crypto.Util.asn1 import DerSequence
-        from Crypto.PublicKey import RSA 
         from Crypto.Signature import PKCS1_v1_5
         from Crypto.Hash import SHA
-        from binascii import a2b_base64
-
-        # Convert from PEM to DER
-        lines = cert_str.replace(" ",'').split()
-        der = a2b_base64(''.join(lines[1:-1]))
-        
-        # Extract subjectPublicKeyInfo field from X.509 certificate (see RFC3280)
-        cert = DerSequence()
-        cert.decode(der)
-        tbsCertificate = DerSequence()
-        tbsCertificate.decode(cert[0])
-        subjectPublicKeyInfo = tbsCertificate[6]
-
-        # Initialize RSA key
-        key = RSA.importKey(subjectPublicKeyInfo)
+
         h = SHA.new(str2sign.encode('utf-8'))
         verifier = PKCS1_v1_5.new(key)
         if verifier.verify(h, signature):
@@ -190,6 +267,11 @@ class SimpleHttpNotifyEndpoint(BaseHTTPRequestHandler):
         self.send_header('Date', self.date_time_string())
 
     def access_log(self, res_code):
+        acc_log = self.access_log_line(res_code)
+        print(acc_log)
+        open(self.access_log_file, 'a').write(acc_log)
+
+    def access_log_line(self, res_code):
         """
         access_log format: time method res_code path req_http_version req_length req_host req_agent mns_reqid mns_version
         """
@@ -202,14 +284,293 @@ class SimpleHttpNotifyEndpoint(BaseHTTPRequestHandler):
                 item_list.append(self.headers[key])
             else:
                 item_list.append("-")
-        acc_log = "[%s]" % self.log_date_time_string() + " ".join(["\"%s\"" % item for item in item_list]) + "\n"
-        print(acc_log)
-        open(self.access_log_file, 'a').write(acc_log)
+        return "[%s]" % self.log_date_time_string() + " ".join(["\"%s\"" % item for item in item_list]) + "\n"
 
 #class ThreadedHTTPServer(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
 class ThreadedHTTPServer(SocketServer.ThreadingMixIn, HTTPServer):
     '''Handle request in a separated thread.'''
 
+class EndpointMetrics:
+    """ 计数器, GET /metrics 以 "name value" 每行一个输出
+    """
+    def __init__(self):
+        self._counters = {"accepted": 0, "rejected_auth": 0, "rejected_invalid": 0,
+                          "rejected_busy": 0, "rejected_failed": 0, "rejected_connections": 0,
+                          "handled": 0, "handler_errors": 0}
+        self._lock = threading.Lock()
+
+    def incr(self, name, count=1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + count
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._counters)
+
+class NotifyTicket:
+    """ NotifyDispatcher.put的返回值, wait等到消息所在的批次处理完
+    """
+    def __init__(self, handled=False):
+        self.ok = handled
+        self._event = threading.Event()
+        if handled:
+            self._event.set()
+
+    def set(self, ok):
+        self.ok = ok
+        self._event.set()
+
+    def wait(self, timeout=None):
+        """ handler处理成功返回True, 处理失败或者超时返回False
+        """
+        return bool(self._event.wait(timeout)) and self.ok
+
+class NotifyDispatcher:
+    """ 把校验通过的NotifyMessage分批交给handler
+
+        @note: handler(messages)在单独的线程中调用, 每批最多batch_size条;
+             : 队列中达到max_queue条或者已经stop时put返回None, endpoint返回503, MNS会重新推送;
+             : sync为True时(默认)endpoint等到消息所在的批次处理完才返回, handler抛出异常或者超过timeout秒返回500,
+             : MNS会重新推送, 同一条消息可能处理多次(at-least-once), handler需要按message_id去重;
+             : 这时不等待linger, 处理一批期间到达的消息组成下一批;
+             : sync为False时消息入队后立即返回201, 不足batch_size条时最多等待linger秒, handler抛出异常
+             : 或者进程在处理完队列前退出时消息丢失且不会重新推送(at-most-once).
+    """
+    def __init__(self, handler, batch_size=100, linger=0.1, max_queue=10000, metrics=None, sync=True, timeout=10):
+        self.handler = handler
+        self.batch_size = batch_size
+        self.linger = linger
+        self.metrics = metrics or EndpointMetrics()
+        self.sync = sync
+        self.timeout = timeout
+        self._queue = Queue.Queue(max_queue)
+        self._stopped = False
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        """ 不再接受消息, 处理完队列中的消息后返回
+        """
+        with self._lock:
+            self._stopped = True
+        self._thread.join(timeout)
+
+    def put(self, msg):
+        """ @rtype: NotifyTicket, 队列已满或者已经stop时返回None
+        """
+        ticket = NotifyTicket(handled=not self.sync)
+        with self._lock:
+            if self._stopped:
+                return None
+            try:
+                self._queue.put_nowait((msg, ticket))
+            except Queue.Full:
+                return None
+        return ticket
+
+    def depth(self):
+        return self._queue.qsize()
+
+    def _run(self):
+        #put doesn't enqueue once stopped, the queue is drained before returning
+        while not (self._stopped and self._queue.empty()):
+            try:
+                batch = [self._queue.get(timeout=0.5)]
+            except Queue.Empty:
+                continue
+            deadline = time.time() + (0 if self.sync else self.linger)
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.time()
+                try:
+                    batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+                except Queue.Empty:
+                    break
+            try:
+                self.handler([msg for msg, ticket in batch])
+                self.metrics.incr("handled", len(batch))
+                ok = True
+            except Exception as e:
+                self.metrics.incr("handler_errors", len(batch))
+                _LOGGER.error("Handle notify messages fail, count:%s exception:%s" % (len(batch), e))
+                ok = False
+            for msg, ticket in batch:
+                ticket.set(ok)
+
+class AccessLogWriter:
+    """ 在单独的线程中写access log, 文件只打开一次
+    """
+    def __init__(self, path):
+        self.path = path
+        self._queue = Queue.Queue()
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def write(self, line):
+        self._queue.put(line)
+
+    def _run(self):
+        with open(self.path, 'a') as f:
+            while True:
+                f.write(self._queue.get())
+                #flush once the burst is written
+                if self._queue.empty():
+                    f.flush()
+
+class PooledNotifyEndpoint(SimpleHttpNotifyEndpoint):
+    """ 配合PooledHTTPServer使用的endpoint
+
+        @note: HTTP/1.1 keep-alive, 连接空闲timeout秒后关闭以释放工作线程;
+             : ElementTree解析消息体, 校验通过的消息交给dispatcher, 见NotifyDispatcher的sync;
+             : handler处理成功(sync)或者入队(非sync)后返回201, 队列已满返回503, 处理失败返回500;
+             : GET /metrics 返回计数和队列长度.
+    """
+    protocol_version = "HTTP/1.1"
+    timeout = 15
+    #one write per response, the status line, headers and body in small writes stall on delayed ACKs
+    wbufsize = -1
+    disable_nagle_algorithm = True
+    dispatcher = None
+    access_log_writer = None
+
+    def do_POST(self):
+        content_length = int(self.headers['content-length'])
+        self.req_body = self.rfile.read(content_length)
+        self.msg = NotifyMessage()
+        metrics = self.dispatcher.metrics
+        if not self.authenticate():
+            res_code = 403
+            res_content = u"Access Forbidden"
+            metrics.incr("rejected_auth")
+        elif not self.validateBody(self.req_body, self.msg, self.msg_type):
+            res_code = 400
+            res_content = u"Invalid Notify Message"
+            metrics.incr("rejected_invalid")
+        else:
+            ticket = self.dispatcher.put(self.msg)
+            if ticket is None:
+                res_code = 503
+                res_content = u"Busy"
+                metrics.incr("rejected_busy")
+            elif not ticket.wait(self.dispatcher.timeout):
+                res_code = 500
+                res_content = u"Handle Fail"
+                metrics.incr("rejected_failed")
+            else:
+                res_code = 201
+                res_content = u""
+                metrics.incr("accepted")
+        self.access_log(res_code)
+        self.response(res_code, res_content)
+
+    def do_GET(self):
+        if self.path != "/metrics":
+            self.response(404, u"Not Found")
+            return
+        counters = self.dispatcher.metrics.snapshot()
+        counters["queue_depth"] = self.dispatcher.depth()
+        counters["connection_queue_depth"] = self.server.connection_queue_depth()
+        self.response(200, u"".join([u"%s %s\n" % (k, v) for k, v in sorted(counters.items())]))
+
+    def xml_decode(self, data, msg):
+        try:
+            root = ElementTree.fromstring(data)
+        except Exception as e:
+            _LOGGER.error("Parse string fail, exception:%s" % e)
+            return False
+        if root.tag.rsplit("}", 1)[-1] != "Notification":
+            _LOGGER.error("Get node of \"Notification\" fail.")
+            return False
+
+        data_dic = {}
+        for node in root:
+            if node.text:
+                data_dic[node.tag.rsplit("}", 1)[-1]] = node.text
+
+        key_list = ["TopicOwner", "TopicName", "Subscriber", "SubscriptionName", "MessageId", "MessageMD5", "Message", "PublishTime"]
+        for key in key_list:
+            if key not in data_dic:
+                _LOGGER.error("Check item fail. Need \"%s\"." % key)
+                return False
+
+        msg.topic_owner = data_dic["TopicOwner"]
+        msg.topic_name = data_dic["TopicName"]
+        msg.subscriber = data_dic["Subscriber"]
+        msg.subscription_name = data_dic["SubscriptionName"]
+        msg.message_id = data_dic["MessageId"]
+        msg.message_md5 = data_dic["MessageMD5"]
+        msg.message_tag = data_dic.get("MessageTag", "")
+        msg.message = data_dic["Message"]
+        msg.publish_time = data_dic["PublishTime"]
+        return True
+
+    def access_log(self, res_code):
+        if self.access_log_writer is not None:
+            self.access_log_writer.write(self.access_log_line(res_code))
+
+    def log_message(self, format, *args):
+        pass
+
+class PooledHTTPServer(HTTPServer):
+    """ 固定数量的工作线程处理连接
+
+        @note: 等待处理的连接超过backlog个时直接关闭新连接并计入rejected_connections.
+    """
+    def __init__(self, server_address, handler_class, workers=16, backlog=256, metrics=None):
+        HTTPServer.__init__(self, server_address, handler_class)
+        self.metrics = metrics or EndpointMetrics()
+        self._connections = Queue.Queue(backlog)
+        self._workers = [threading.Thread(target=self._work) for i in range(workers)]
+        for worker in self._workers:
+            worker.daemon = True
+            worker.start()
+
+    def process_request(self, request, client_address):
+        try:
+            self._connections.put_nowait((request, client_address))
+        except Queue.Full:
+            self.metrics.incr("rejected_connections")
+            self.shutdown_request(request)
+
+    def connection_queue_depth(self):
+        return self._connections.qsize()
+
+    def _work(self):
+        while True:
+            item = self._connections.get()
+            if item is None:
+                return
+            request, client_address = item
+            try:
+                self.finish_request(request, client_address)
+            except Exception:
+                self.handle_error(request, client_address)
+            finally:
+                self.shutdown_request(request)
+
+    def server_close(self):
+        HTTPServer.server_close(self)
+        for worker in self._workers:
+            self._connections.put(None)
+
+def make_pooled_server(ip_addr, port, handler, endpoint_class=PooledNotifyEndpoint, workers=16, backlog=256, batch_size=100, linger=0.1, max_queue=10000, access_log_file=None, sync=True, timeout=10):
+    """ 创建PooledHTTPServer, handler(messages)分批接收校验通过的NotifyMessage, sync见NotifyDispatcher
+
+        @rtype: (PooledHTTPServer, NotifyDispatcher)
+    """
+    metrics = EndpointMetrics()
+    dispatcher = NotifyDispatcher(handler, batch_size, linger, max_queue, metrics, sync, timeout).start()
+    endpoint_class.dispatcher = dispatcher
+    if access_log_file:
+        endpoint_class.access_log_writer = AccessLogWriter(access_log_file)
+    httpd = PooledHTTPServer((ip_addr, port), endpoint_class, workers, backlog, metrics)
+    return httpd, dispatcher
+
 class NotifyMessage:
     def __init__(self):
         self.topic_owner = ""
@@ -43,7 +43,7 @@ import server
 __version__ = "1.0.3"
 _LOGGER = logging.getLogger(__name__)
 
-def main(ip_addr, port, endpoint_class = server.SimpleHttpNotifyEndpoint, msg_type=u"XML", prefix=u"http://"):
+def main(ip_addr, port, endpoint_class = server.SimpleHttpNotifyEndpoint, msg_type=u"XML", cert_urls=(), prefix=u"http://"):
     #init logger
     global logger
     endpoint_class.access_log_file = "access_log.%s" % port
@@ -56,6 +56,9 @@ def main(ip_addr, port, endpoint_class = server.SimpleHttpNotifyEndpoint, msg_ty
     logger.addHandler(file_handler)
     logger.setLevel(logging.INFO)
 
+    #download the signing certs before the first notification
+    endpoint_class.signing_cert_cache.prefetch(cert_urls)
+
     #start endpoint
     addr_info = "Start Endpoint! Address: %s%s:%s" % (prefix, ip_addr, port)
     print(addr_info)
@@ -81,4 +84,7 @@ if __name__ == "__main__":
     msg_type = MNSSampleCommon.LoadIndexParam(3)
     if not msg_type:
         msg_type = u"XML"    
-    main(ip_addr, port, server.SimpleHttpNotifyEndpoint, msg_type)
+    #comma separated, e.g. https://mnstest.oss-cn-hangzhou.aliyuncs.com/x509_public_certificate.pem
+    cert_urls = MNSSampleCommon.LoadIndexParam(4)
+    cert_urls = cert_urls.split(",") if cert_urls else ()
+    main(ip_addr, port, server.SimpleHttpNotifyEndpoint, msg_type, cert_urls)
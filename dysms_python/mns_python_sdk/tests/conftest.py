@@ -0,0 +1,39 @@
+#coding=utf-8
+#fixtures of the local MNS stub, run from mns_python_sdk: python -m pytest tests
+
+import os
+import sys
+
+import pytest
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, TESTS_DIR + "/..")
+from mns.mns_account import Account
+from mns.mns_stub import MNSStub
+
+@pytest.fixture
+def mns_stub():
+    stub = MNSStub("id", "key").start()
+    yield stub
+    stub.stop()
+
+@pytest.fixture
+def account(mns_stub):
+    return Account(mns_stub.url, "id", "key")
+
+@pytest.fixture
+def queue(mns_stub, account):
+    mns_stub.create_queue("test", visibility_timeout=30)
+    return account.get_queue("test")
+
+@pytest.fixture
+def signed_stub():
+    """ 推送的通知用tests/signing_key.pem签名, 证书在 $url/x509_public_certificate.pem
+    """
+    with open(os.path.join(TESTS_DIR, "signing_key.pem")) as f:
+        signing_key = f.read()
+    with open(os.path.join(TESTS_DIR, "signing_cert.pem")) as f:
+        signing_cert = f.read()
+    stub = MNSStub("id", "key", signing_key=signing_key, signing_cert=signing_cert, notify_retries=2).start()
+    yield stub
+    stub.stop()
@@ -0,0 +1,56 @@
+#coding=utf-8
+
+import threading
+import time
+
+from mns.mns_credentials import RefreshingCredentials
+
+def test_a_token_already_due_is_not_fetched_in_a_loop():
+    fetched = []
+
+    def fetch():
+        fetched.append(time.time())
+        #expires within refresh_ahead every time
+        return "id", "key", "token%s" % len(fetched), time.time() + 60
+
+    credentials = RefreshingCredentials(fetch, refresh_ahead=300, retry_interval=0.2)
+    time.sleep(0.5)
+    credentials.stop()
+    #the first fetch, then one per retry_interval
+    assert 2 <= len(fetched) <= 4
+    assert credentials.get_credentials() == ("id", "key", "token%s" % len(fetched))
+
+def test_refreshes_ahead_of_the_expiry():
+    fetched = []
+
+    def fetch():
+        fetched.append(time.time())
+        return "id", "key", "token%s" % len(fetched), time.time() + 0.3
+
+    credentials = RefreshingCredentials(fetch, refresh_ahead=0.2, retry_interval=1)
+    time.sleep(0.35)
+    credentials.stop()
+    assert len(fetched) >= 2
+
+def test_an_expired_token_is_fetched_once_for_concurrent_callers():
+    fetched = []
+
+    def fetch():
+        fetched.append(time.time())
+        if len(fetched) == 1:
+            return "id", "key", "token1", time.time() + 0.1
+        time.sleep(0.1)
+        return "id", "key", "token%s" % len(fetched), time.time() + 3600
+
+    credentials = RefreshingCredentials(fetch, refresh_ahead=0, retry_interval=10)
+    #no background refresh
+    credentials.stop()
+    time.sleep(0.2)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(credentials.get_credentials())) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(fetched) == 2
+    assert results == [("id", "key", "token2")] * 8
@@ -0,0 +1,81 @@
+#coding=utf-8
+
+import threading
+import time
+try:
+    import socketserver as SocketServer
+except ImportError:
+    import SocketServer
+
+import pytest
+
+from mns.mns_exception import MNSClientNetworkException
+from mns.mns_http import MNSHttp, RequestInternal
+
+class ScriptedServer(SocketServer.ThreadingMixIn, SocketServer.TCPServer):
+    """ 按顺序对每个请求执行actions: "ok"返回200, "close"不返回直接关闭连接, "hang"不返回
+    """
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, actions):
+        SocketServer.TCPServer.__init__(self, ("127.0.0.1", 0), ScriptedHandler)
+        self.actions = list(actions)
+        self.requests = 0
+        self.lock = threading.Lock()
+
+class ScriptedHandler(SocketServer.StreamRequestHandler):
+    def handle(self):
+        while True:
+            length = 0
+            line = self.rfile.readline()
+            if not line:
+                return
+            while line not in (b"\r\n", b""):
+                if line.lower().startswith(b"content-length:"):
+                    length = int(line.split(b":", 1)[1])
+                line = self.rfile.readline()
+            self.rfile.read(length)
+            with self.server.lock:
+                action = self.server.actions[self.server.requests]
+                self.server.requests += 1
+            if action == "close":
+                return
+            if action == "hang":
+                time.sleep(2)
+                return
+            self.wfile.write(b"HTTP/1.1 200 OK\r\nContent-Length: 2\r\n\r\nok")
+            self.wfile.flush()
+
+@pytest.fixture
+def scripted():
+    servers = []
+
+    def start(actions):
+        server = ScriptedServer(actions)
+        thread = threading.Thread(target=server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        servers.append(server)
+        return server, MNSHttp("127.0.0.1:%s" % server.server_address[1], connection_timeout=0.5)
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+def _request():
+    return RequestInternal("POST", "/queues/test/messages", {"content-length": "4"}, "body")
+
+def test_retries_a_kept_alive_connection_closed_before_the_response(scripted):
+    server, http = scripted(["ok", "close", "ok"])
+    assert http.send_request(_request()).status == 200
+    assert http.send_request(_request()).status == 200
+    assert server.requests == 3
+
+def test_does_not_resend_after_a_timeout(scripted):
+    server, http = scripted(["ok", "hang", "ok"])
+    assert http.send_request(_request()).status == 200
+    with pytest.raises(MNSClientNetworkException):
+        http.send_request(_request())
+    #the message may have been handled, it's not sent again
+    assert server.requests == 2
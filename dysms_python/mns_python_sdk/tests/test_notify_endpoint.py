@@ -0,0 +1,130 @@
+#coding=utf-8
+#the pooled notify endpoint of sample/server.py, the signed notifications come from the stub
+
+import os
+import sys
+import threading
+import time
+try:
+    from http.client import HTTPConnection
+except ImportError:
+    from httplib import HTTPConnection
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "sample"))
+import server
+
+def wait_for(predicate, timeout=5):
+    deadline = time.time() + timeout
+    while not predicate():
+        if time.time() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+class Handler:
+    def __init__(self):
+        self.batches = []
+        self.fail = False
+
+    def __call__(self, messages):
+        if self.fail:
+            raise Exception("handler failed")
+        self.batches.append(messages)
+
+    def messages(self):
+        return [msg for batch in self.batches for msg in batch]
+
+@pytest.fixture
+def endpoint():
+    """ (url, handler, dispatcher), 只信任本地stub的证书
+    """
+    class Endpoint(server.PooledNotifyEndpoint):
+        signing_cert_cache = server.SigningCertCache(allowed_hosts=("127.0.0.1",), schemes=("http",))
+
+    handler = Handler()
+    httpd, dispatcher = server.make_pooled_server("127.0.0.1", 0, handler, endpoint_class=Endpoint, workers=4)
+    thread = threading.Thread(target=httpd.serve_forever)
+    thread.daemon = True
+    thread.start()
+    yield "http://127.0.0.1:%s" % httpd.server_port, handler, dispatcher
+    httpd.shutdown()
+    httpd.server_close()
+    dispatcher.stop()
+
+def test_dispatcher_acks_after_the_batch_is_handled():
+    handler = Handler()
+    dispatcher = server.NotifyDispatcher(handler).start()
+    tickets = [dispatcher.put(i) for i in range(3)]
+    assert all(ticket.wait(5) for ticket in tickets)
+    assert sorted(handler.messages()) == [0, 1, 2]
+
+    handler.fail = True
+    assert not dispatcher.put(3).wait(5)
+    assert dispatcher.metrics.snapshot()["handler_errors"] == 1
+    dispatcher.stop()
+    assert dispatcher.put(4) is None
+
+def test_async_dispatcher_drains_the_queue_on_stop():
+    handler = Handler()
+    dispatcher = server.NotifyDispatcher(handler, batch_size=2, linger=0.5, sync=False).start()
+    tickets = [dispatcher.put(i) for i in range(5)]
+    #acked before the handler is called
+    assert all(ticket.wait(0) for ticket in tickets)
+    dispatcher.stop()
+    assert sorted(handler.messages()) == [0, 1, 2, 3, 4]
+    assert max(len(batch) for batch in handler.batches) == 2
+    assert dispatcher.put(5) is None
+
+def test_dispatcher_rejects_when_full():
+    dispatcher = server.NotifyDispatcher(Handler(), max_queue=1)
+    assert dispatcher.put(0) is not None
+    assert dispatcher.put(1) is None
+
+def test_metrics(endpoint):
+    url, handler, dispatcher = endpoint
+    conn = HTTPConnection(url[len("http://"):], timeout=5)
+    conn.request("GET", "/metrics")
+    resp = conn.getresponse()
+    lines = resp.read().decode("utf-8").splitlines()
+    assert resp.status == 200
+    assert "accepted 0" in lines
+    assert "queue_depth 0" in lines
+    assert "connection_queue_depth 0" in lines
+
+    #the same keep-alive connection
+    conn.request("GET", "/other")
+    resp = conn.getresponse()
+    resp.read()
+    assert resp.status == 404
+    conn.close()
+
+def test_signed_notifications_are_handled(signed_stub, endpoint):
+    pytest.importorskip("Crypto")
+    url, handler, dispatcher = endpoint
+    signed_stub.subscribe("topic", "sub", url + "/notify")
+    topic = signed_stub.topic("topic")
+    signed_stub.publish(topic, u"hello", "")
+    assert wait_for(lambda: len(signed_stub.notifications) == 1)
+    assert signed_stub.notifications[0] == ("sub", url + "/notify", 201)
+    assert [msg.message for msg in handler.messages()] == [u"hello"]
+
+    #answered 500, the stub pushes it again
+    handler.fail = True
+    signed_stub.publish(topic, u"again", "")
+    assert wait_for(lambda: len(signed_stub.notifications) == 2)
+    assert signed_stub.notifications[1][2] == 500
+    assert dispatcher.metrics.snapshot()["rejected_failed"] == signed_stub.notify_retries
+
+def test_forged_notifications_are_rejected(signed_stub, endpoint):
+    pytest.importorskip("Crypto")
+    url, handler, dispatcher = endpoint
+    #signed with a key which doesn't match the cert
+    from Crypto.PublicKey import RSA
+    signed_stub.signing_key = RSA.generate(2048).exportKey().decode("utf-8")
+    signed_stub.subscribe("topic", "sub", url + "/notify")
+    signed_stub.publish(signed_stub.topic("topic"), u"hello", "")
+    assert wait_for(lambda: len(signed_stub.notifications) == 1)
+    assert signed_stub.notifications[0][2] == 403
+    assert handler.messages() == []
@@ -0,0 +1,70 @@
+#coding=utf-8
+#SigningCertCache of sample/server.py, the cert is served by the stub
+
+import os
+import sys
+import time
+
+import pytest
+
+pytest.importorskip("Crypto")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "sample"))
+import server
+
+def local_cache(**kwargs):
+    return server.SigningCertCache(allowed_hosts=("127.0.0.1",), schemes=("http",), **kwargs)
+
+def cert_url(stub, query=""):
+    return "%s/x509_public_certificate.pem%s" % (stub.url, query)
+
+def test_only_the_exact_host_over_https_is_allowed(signed_stub):
+    cache = server.SigningCertCache()
+    assert cache.is_allowed("https://mnstest.oss-cn-hangzhou.aliyuncs.com/x509_public_certificate.pem")
+    assert cache.is_allowed("https://MNSTEST.oss-cn-hangzhou.aliyuncs.com/x509_public_certificate.pem")
+    assert not cache.is_allowed("http://mnstest.oss-cn-hangzhou.aliyuncs.com/x509_public_certificate.pem")
+    #any aliyun user can put a cert on these
+    assert not cache.is_allowed("https://bucket.oss-cn-hangzhou.aliyuncs.com/x509_public_certificate.pem")
+    assert not cache.is_allowed("https://a.mnstest.oss-cn-hangzhou.aliyuncs.com/x509_public_certificate.pem")
+    assert not cache.is_allowed("https://mnstest.oss-cn-hangzhou.aliyuncs.com.example.com/x509_public_certificate.pem")
+
+    #not fetched
+    requests = signed_stub.requests
+    assert cache.get_key(cert_url(signed_stub)) is None
+    assert signed_stub.requests == requests
+
+def test_keys_expire_after_ttl(signed_stub):
+    cache = local_cache(ttl=0.2)
+    key = cache.get_key(cert_url(signed_stub))
+    assert key is not None
+    requests = signed_stub.requests
+    assert cache.get_key(cert_url(signed_stub)) is key
+    assert signed_stub.requests == requests
+
+    time.sleep(0.3)
+    assert cache.get_key(cert_url(signed_stub)) is not None
+    assert signed_stub.requests == requests + 1
+
+def test_the_expired_key_is_used_when_the_fetch_fails(signed_stub):
+    cache = local_cache(ttl=0.1)
+    key = cache.get_key(cert_url(signed_stub))
+    assert key is not None
+    time.sleep(0.2)
+    #the cert route answers 403 without a cert
+    signed_stub.signing_cert = None
+    requests = signed_stub.requests
+    assert cache.get_key(cert_url(signed_stub)) is key
+    assert signed_stub.requests == requests + 1
+    #never fetched before
+    assert cache.get_key(cert_url(signed_stub, "?v=2")) is None
+
+def test_the_oldest_url_is_evicted(signed_stub):
+    cache = local_cache(max_entries=2)
+    urls = [cert_url(signed_stub, "?v=%s" % i) for i in range(3)]
+    for url in urls:
+        assert cache.get_key(url) is not None
+    assert list(cache._keys) == urls[1:]
+
+    requests = signed_stub.requests
+    assert cache.get_key(urls[0]) is not None
+    assert signed_stub.requests == requests + 1
+    assert list(cache._keys) == [urls[2], urls[0]]
@@ -0,0 +1,78 @@
+#coding=utf-8
+
+import threading
+import time
+
+import pytest
+
+from mns.mns_account import Account
+from mns.mns_consumer import QueueConsumer
+from mns.mns_exception import MNSServerException
+from mns.mns_producer import QueueProducer
+from mns.mns_queue import Message
+
+def test_send_receive_delete(mns_stub, queue):
+    sent = queue.send_message(Message("hello"))
+    msg = queue.receive_message(1)
+    assert msg.message_id == sent.message_id
+    assert msg.message_body == b"hello"
+    queue.delete_message(msg.receipt_handle)
+    assert not mns_stub.queue("test").messages
+
+    with pytest.raises(MNSServerException) as e:
+        queue.receive_message(0)
+    assert e.value.type == "MessageNotExist"
+
+def test_wrong_signature_is_rejected(mns_stub):
+    mns_stub.create_queue("test")
+    queue = Account(mns_stub.url, "id", "another key").get_queue("test")
+    with pytest.raises(MNSServerException) as e:
+        queue.send_message(Message("hello"))
+    assert e.value.type == "SignatureDoesNotMatch"
+
+def test_one_client_from_many_threads(queue):
+    errors = []
+
+    def send(i):
+        try:
+            for j in range(20):
+                queue.send_message(Message("%s-%s" % (i, j)))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=send, args=(i,)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert len(queue.batch_peek_message(16)) == 16
+
+def test_producer_and_consumer(mns_stub, queue):
+    producer = QueueProducer(queue, linger=0.05)
+    futures = [producer.send(Message("message %s" % i)) for i in range(100)]
+    producer.close()
+    assert all(future.result(1).message_id for future in futures)
+    #batched, at most 16 per request
+    assert producer.stats()["Requests"] < 100
+
+    handled = []
+    consumer = QueueConsumer(queue, lambda msg: handled.append(msg.message_body), workers=4,
+                             wait_seconds=1, ack_interval=0.05).start()
+    deadline = time.time() + 10
+    while consumer.stats()["Deleted"] < 100 and time.time() < deadline:
+        time.sleep(0.05)
+    consumer.stop()
+    assert sorted(handled) == sorted(("message %s" % i).encode("utf-8") for i in range(100))
+    assert not mns_stub.queue("test").messages
+
+def test_consumer_acks_during_a_long_poll(queue):
+    for i in range(5):
+        queue.send_message(Message("message %s" % i))
+    consumer = QueueConsumer(queue, lambda msg: None, workers=2, wait_seconds=2, ack_interval=0.1).start()
+    deadline = time.time() + 1
+    while consumer.stats()["Deleted"] < 5 and time.time() < deadline:
+        time.sleep(0.02)
+    #the poll thread is still waiting for more messages
+    assert consumer.stats()["Deleted"] == 5
+    consumer.stop()